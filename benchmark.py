@@ -0,0 +1,610 @@
+"""Замеры производительности тайм-трекера.
+
+Запуск: python benchmark.py <сценарий> [параметры]
+"""
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import worktimer
+
+
+def generate_records(count, start=datetime(2015, 1, 1, 9, 0, 0)):
+    """Синтетическая история: несколько сессий в день подряд"""
+    records = []
+    moment = start
+    for _ in range(count):
+        duration = random.randint(600, 4 * 3600)
+        end = moment + timedelta(seconds=duration)
+        records.append([moment.strftime(worktimer.TIME_FORMAT), end.strftime(worktimer.TIME_FORMAT), float(duration)])
+        moment = end + timedelta(seconds=random.randint(300, 8 * 3600))
+    return records
+
+
+def measure(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def bench_loader(args):
+    """Сравнение загрузчика через strptime и колоночного загрузчика"""
+
+    def strptime_loader(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return [
+            (
+                datetime.strptime(session[0], worktimer.TIME_FORMAT),
+                datetime.strptime(session[1], worktimer.TIME_FORMAT),
+                session[2]
+            )
+            for session in data
+        ]
+
+    def columns_loader(path):
+        sessions = worktimer.SessionJournal(path).load()
+        worktimer.SessionTotals().rebuild(sessions)
+        return sessions
+
+    print(f"{'сессий':>10} {'strptime, с':>12} {'колонки, с':>12} {'ускорение':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.sizes:
+            path = os.path.join(tmp, f"sessions_{count}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(generate_records(count), f, indent=2)
+            old_time, old = measure(strptime_loader, path)
+            new_time, new = measure(columns_loader, path)
+            assert len(old) == len(new) and old[-1] == new[-1]
+            print(f"{count:>10} {old_time:>12.3f} {new_time:>12.3f} {old_time / new_time:>9.1f}x")
+
+
+def peak_rss_mb():
+    """Пиковый RSS процесса в МБ (None, если модуль resource недоступен)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает килобайты, macOS - байты
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def bench_report(args):
+    """Скорость потоковой генерации PDF отчета и пиковая память"""
+    # История целиком в прошлом: все дни закрыты и попадают в кэш разделов
+    sessions = worktimer.SessionColumns.from_records(generate_records(args.sessions, datetime(2000, 1, 1, 9)))
+    rss_before = peak_rss_mb()
+    cache = worktimer.ReportBlockCache()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "report.pdf")
+        elapsed, pages = measure(worktimer.write_report, path, "Company", "employee", "position", sessions,
+                                 block_cache=cache)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        # Повторное построение: закрытые дни берутся из кэша разделов
+        repeated, _ = measure(worktimer.write_report, path, "Company", "employee", "position", sessions,
+                              block_cache=cache)
+    rss_after = peak_rss_mb()
+    print(f"сессий: {len(sessions)}, страниц: {pages}, файл: {size_mb:.1f} МБ")
+    print(f"время: {elapsed:.2f} с, {pages / elapsed:.1f} стр/с")
+    print(f"повторно: {repeated:.2f} с, {pages / repeated:.1f} стр/с "
+          f"(дней из кэша: {cache.hits}, построено: {cache.misses})")
+    if rss_after is not None:
+        print(f"пиковый RSS: {rss_after:.0f} МБ (до отчета {rss_before:.0f} МБ)")
+
+
+def bench_checkpoint(args):
+    """Накладные расходы снимка состояния таймера на один тик"""
+    # Идущая сессия с паузами: снимок строится так же, как в окне
+    now = [0]
+    with tempfile.TemporaryDirectory() as tmp:
+        tracker = worktimer.EmployeeTracker("json", tmp, "Company", "employee", "position", clock=lambda: now[0])
+        for _ in range(args.segments):
+            tracker.start()
+            now[0] += 25 * 60 * 10**9
+            tracker.pause()
+            now[0] += 5 * 60 * 10**9
+        tracker.start()
+        state = tracker.checkpoint_state()
+        assert len(state["segments"]) == args.segments + 1
+
+        checkpoint = worktimer.TimerCheckpoint(os.path.join(tmp, worktimer.CHECKPOINT_FILE))
+        started = time.perf_counter()
+        for _ in range(args.writes):
+            checkpoint.write(tracker.checkpoint_state(), force=True)
+        write_cost = (time.perf_counter() - started) / args.writes
+        assert checkpoint.read()["segments"] == state["segments"]
+
+        # Плановый тик: снимок строится, только если интервал прошел
+        started = time.perf_counter()
+        for _ in range(args.ticks):
+            if checkpoint.due():
+                checkpoint.write(tracker.checkpoint_state())
+        skip_cost = (time.perf_counter() - started) / args.ticks
+
+    # При тике раз в секунду запись происходит раз в CHECKPOINT_INTERVAL тиков
+    per_tick = skip_cost + write_cost / worktimer.CHECKPOINT_INTERVAL
+    print(f"отрезков в снимке: {len(state['segments'])}")
+    print(f"снимок и запись (fsync + rename): {write_cost * 1e6:.0f} мкс")
+    print(f"пропуск по интервалу: {skip_cost * 1e6:.2f} мкс")
+    print(f"в среднем на тик при интервале {worktimer.CHECKPOINT_INTERVAL} с: {per_tick * 1e6:.1f} мкс")
+
+
+def bench_analytics(args):
+    """Расчет статистики (итоги, перцентили, тепловая карта) на больших историях"""
+    print(f"{'сессий':>10} {'статистика, с':>14} {'сессий/с':>12}")
+    for count in args.sizes:
+        sessions = worktimer.SessionColumns.from_records(generate_records(count))
+        elapsed, statistics = measure(worktimer.SessionStatistics, sessions)
+        assert statistics.count == count
+        print(f"{count:>10} {elapsed:>14.3f} {count / elapsed:>12.0f}")
+
+
+def bench_aggregate(args):
+    """Масштабирование сводного отчета по числу сотрудников"""
+    print(f"{'сотрудников':>12} {'сессий':>10} {'время, с':>10} {'мс/сотрудник':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        history = worktimer.SessionColumns.from_records(generate_records(args.sessions))
+        created = 0
+        for count in args.employees:
+            employees = [f"employee_{i}" for i in range(count)]
+            for employee in employees[created:]:
+                worktimer.open_storage(args.storage, tmp, "Company", employee, "position").save(history)
+            created = max(created, count)
+            config_data = {"companies": {"Company": {"positions": ["position"], "employees": employees}}}
+            elapsed, rows = measure(worktimer.aggregate_companies, config_data, args.storage, tmp,
+                                    None, None, args.workers)
+            assert rows[-1][4].count == count * args.sessions
+            print(f"{count:>12} {count * args.sessions:>10} {elapsed:>10.2f} {elapsed / count * 1000:>14.1f}")
+
+
+def bench_transfer(args):
+    """Скорость экспорта и импорта сессий в CSV и колоночном формате"""
+    config_data = {"companies": {"Company": {"positions": ["position"],
+                                             "employees": [f"employee_{i}" for i in range(args.employees)]}}}
+    print(f"{'формат':>10} {'сессий':>10} {'экспорт, зап/с':>16} {'импорт, зап/с':>15} {'повтор, зап/с':>15} {'МБ':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source")
+        os.makedirs(source)
+        history = worktimer.SessionColumns.from_records(generate_records(args.sessions))
+        for employee in config_data["companies"]["Company"]["employees"]:
+            worktimer.open_storage(args.storage, source, "Company", employee, "position").save(history)
+        total = args.sessions * args.employees
+
+        for export_format, writer, reader in (("csv", worktimer.write_sessions_csv, worktimer.read_sessions_csv),
+                                              ("columnar", worktimer.write_columnar, worktimer.read_columnar)):
+            path = os.path.join(tmp, f"export.{export_format}")
+            target = os.path.join(tmp, f"target_{export_format}")
+            os.makedirs(target)
+            chunks = worktimer.iter_employee_chunks(config_data, args.storage, source)
+            export_time, rows = measure(writer, path, chunks)
+            import_time, (read, written) = measure(worktimer.import_sessions, reader(path), args.storage, target)
+            # Повторный импорт того же файла: все записи - дубли
+            repeat_time, (_, duplicates_written) = measure(worktimer.import_sessions, reader(path), args.storage, target)
+            assert rows == read == written == total and duplicates_written == 0
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            print(f"{export_format:>10} {total:>10} {total / export_time:>16.0f} {total / import_time:>15.0f} "
+                  f"{total / repeat_time:>15.0f} {size_mb:>7.1f}")
+
+
+def _stress_writer(storage_kind, data_dir, worker, workers, count):
+    """Процесс стресс-теста: count сессий одного сотрудника вперемешку с другими процессами"""
+    storage = worktimer.open_storage(storage_kind, data_dir, "Company", "employee", "position")
+    latencies = []
+    for i in range(count):
+        # Сессии процессов чередуются во времени, как у двух окон одного сотрудника
+        start = datetime(2025, 1, 1) + timedelta(minutes=10 * (i * workers + worker))
+        session = (start, start + timedelta(minutes=5), 300.0)
+        started = time.perf_counter()
+        worktimer.persist_session(storage, session)
+        latencies.append(time.perf_counter() - started)
+    lock = storage.locked()
+    holds = getattr(lock, "holds", 0)
+    return latencies, holds, getattr(lock, "hold_total", 0.0), getattr(lock, "hold_max", 0.0)
+
+
+def bench_concurrency(args):
+    """Одновременная запись сессий одного сотрудника из нескольких процессов без потерь"""
+    print(f"{'хранилище':>10} {'сессий':>8} {'потеряно':>9} {'зап/с':>8} "
+          f"{'p50, мс':>8} {'p99, мс':>8} {'замок ср., мс':>14} {'замок макс., мс':>16}")
+    for storage_kind in args.storages:
+        with tempfile.TemporaryDirectory() as tmp:
+            started = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=args.processes) as pool:
+                futures = [pool.submit(_stress_writer, storage_kind, tmp, worker, args.processes, args.sessions)
+                           for worker in range(args.processes)]
+                results = [future.result() for future in futures]
+            elapsed = time.perf_counter() - started
+            stored = len(worktimer.open_storage(storage_kind, tmp, "Company", "employee", "position").load())
+        expected = args.processes * args.sessions
+        latencies = sorted(latency for result in results for latency in result[0])
+        holds = sum(result[1] for result in results)
+        hold_mean = sum(result[2] for result in results) / holds * 1000 if holds else 0.0
+        hold_max = max(result[3] for result in results) * 1000
+        print(f"{storage_kind:>10} {expected:>8} {expected - stored:>9} {expected / elapsed:>8.0f} "
+              f"{latencies[len(latencies) // 2] * 1000:>8.2f} {latencies[int(len(latencies) * 0.99)] * 1000:>8.2f} "
+              f"{hold_mean:>14.2f} {hold_max:>16.2f}")
+        assert stored == expected, f"потеряно {expected - stored} сессий"
+
+
+# Запускается в отдельном процессе: время от запуска до первого кадра и до загрузки истории
+STARTUP_PROBE = """
+import json, sys, time
+launched = float(sys.argv[1])
+sys.path.insert(0, sys.argv[2])
+import worktimer
+imported = time.time()
+app = worktimer.StopwatchApp()
+app.update()
+first_frame = time.time()
+while not app.history_loaded:
+    app.update()
+    time.sleep(0.001)
+interactive = time.time()
+sessions = len(app.sessions)
+app.destroy()
+print(json.dumps({"import": imported - launched, "first_frame": first_frame - launched,
+                  "interactive": interactive - launched, "sessions": sessions}))
+"""
+
+
+def bench_startup(args):
+    """Холодный запуск окна: импорт модуля, первый кадр и готовность с загруженной историей"""
+    package_dir = os.path.dirname(os.path.abspath(worktimer.__file__))
+    print(f"{'сессий':>10} {'импорт, мс':>11} {'первый кадр, мс':>16} {'готовность, мс':>15}")
+    for count in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            # Конфигурация по умолчанию: первый сотрудник первой компании
+            config_data = worktimer.load_config()
+            company = config_data.get("default_company", next(iter(config_data["companies"])))
+            employee = config_data["companies"][company]["employees"][0]
+            data_dir = os.path.join(tmp, worktimer.DATA_DIR)
+            os.makedirs(data_dir)
+            with open(os.path.join(data_dir, f"sessions_{worktimer.sanitize_filename(employee)}.json"),
+                      'w', encoding='utf-8') as f:
+                json.dump(generate_records(count), f)
+
+            runs = []
+            for _ in range(args.repeat):
+                result = subprocess.run([sys.executable, "-c", STARTUP_PROBE, repr(time.time()), package_dir],
+                                        cwd=tmp, capture_output=True, text=True)
+                if result.returncode != 0:
+                    print("Не удалось запустить окно (нужен графический дисплей):", file=sys.stderr)
+                    print(result.stderr.strip().splitlines()[-1] if result.stderr else "", file=sys.stderr)
+                    return
+                runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+        # Медиана по запускам
+        middle = sorted(runs, key=lambda run: run["interactive"])[len(runs) // 2]
+        assert middle["sessions"] == count
+        print(f"{count:>10} {middle['import'] * 1000:>11.0f} {middle['first_frame'] * 1000:>16.0f} "
+              f"{middle['interactive'] * 1000:>15.0f}")
+
+
+def generate_names(count):
+    """Синтетический список сотрудников: кириллица и латиница вперемешку, без повторов"""
+    first = ["Иван", "Пётр", "Анна", "Мария", "Сергей", "Ольга", "Алексей", "Елена", "ivan", "anna", "john", "maria"]
+    last = ["Иванов", "Петров", "Сидорова", "Семёнова", "Кузнецов", "Смирнова", "Орлов",
+            "ivanov", "petrov", "smith", "johnson", "garcia"]
+    names = set()
+    while len(names) < count:
+        separator = random.choice([" ", "_"])
+        names.add(f"{random.choice(last)}{separator}{random.choice(first)}{random.randint(1, 99999)}")
+    return sorted(names)
+
+
+def bench_picker(args):
+    """Задержка поиска сотрудника на каждое нажатие клавиши"""
+    names = generate_names(args.names)
+    build_time, name_index = measure(worktimer.NameIndex, names)
+    print(f"имен: {len(names)}, построение индекса: {build_time * 1000:.0f} мс")
+
+    # Набор запросов по буквам, как при вводе в поле
+    queries = []
+    for word in args.queries:
+        queries.extend(word[:length] for length in range(1, len(word) + 1))
+    latencies = []
+    shown = 0
+    for _ in range(args.repeat):
+        for query in queries:
+            started = time.perf_counter()
+            matches = name_index.search(query)
+            visible = [name_index.names[i] for i in matches[:worktimer.PICKER_VISIBLE_ROWS]]
+            latencies.append(time.perf_counter() - started)
+            shown += len(visible)
+    latencies.sort()
+    print(f"нажатий: {len(latencies)}, p50: {latencies[len(latencies) // 2] * 1000:.2f} мс, "
+          f"p99: {latencies[int(len(latencies) * 0.99)] * 1000:.2f} мс, макс.: {latencies[-1] * 1000:.2f} мс, "
+          f"строк в списке: {shown / len(latencies):.1f}")
+    for word in args.queries:
+        print(f"  {word!r}: найдено {len(name_index.search(word))}")
+
+
+class CountingLabel:
+    """Метка без дисплея: считает обращения к Tk вместо отрисовки"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def config(self, **options):
+        self.calls += 1
+
+
+def legacy_clock(labels):
+    """Прежний update_time: все опции каждую секунду при любом состоянии"""
+    session_label, total_label, period_label = labels
+
+    def tick(timer, totals):
+        elapsed = timer.elapsed()
+        session_label.config(text=worktimer.format_time(elapsed))
+        total_label.config(text=worktimer.format_time(totals + elapsed))
+        period_label.config(text=worktimer.format_time(totals + elapsed))
+        session_label.config(fg=worktimer.RUNNING_COLOR if timer.is_running else worktimer.IDLE_COLOR)
+        # after_cancel уже сработавшего тика + after
+        return 2, timer.next_tick_delay()
+    return tick
+
+
+def dirty_clock(labels):
+    """Текущий update_time: ClockView и тик только при работающем таймере"""
+    view = worktimer.ClockView(*labels)
+
+    def tick(timer, totals):
+        elapsed = timer.elapsed()
+        view.render(elapsed, totals + elapsed, totals + elapsed, timer.is_running)
+        if not timer.is_running:
+            return 0, None
+        return 1, timer.next_tick_delay()
+    return tick
+
+
+def count_clock_calls(make_clock, state, seconds):
+    """Вызовы Tk за seconds секунд виртуального времени в состоянии state"""
+    now = [0]
+    timer = worktimer.TimerEngine(clock=lambda: now[0])
+    if state != "idle":
+        timer.start()
+        now[0] = 1_234_567_890  # Сессия уже идет, тики не на границе секунды
+    if state == "paused":
+        timer.pause()
+    labels = [CountingLabel() for _ in range(3)]
+    tick = make_clock(labels)
+    calls, at_ms, delay = 0, 0, 0
+    while at_ms < seconds * 1000:
+        now[0] += delay * 1_000_000
+        scheduled, delay = tick(timer, 3600.0)
+        calls += scheduled
+        if delay is None:
+            break
+        at_ms += delay
+    return calls + sum(label.calls for label in labels)
+
+
+def bench_clock(args):
+    """Обращения к Tk из цикла обновления часов за минуту: до и после проверки изменений"""
+    print(f"{'состояние':>10} {'до, вызовов/мин':>16} {'после, вызовов/мин':>19}")
+    for state in ("idle", "paused", "running"):
+        before = count_clock_calls(legacy_clock, state, args.seconds) * 60 / args.seconds
+        after = count_clock_calls(dirty_clock, state, args.seconds) * 60 / args.seconds
+        print(f"{state:>10} {before:>16.1f} {after:>19.1f}")
+
+
+async def http_call(reader, writer, method, path):
+    """Запрос по открытому keep-alive соединению: (код, тело)"""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: 0\r\n\r\n".encode("ascii"))
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    length = next(int(line.split(":", 1)[1]) for line in lines if line.lower().startswith("content-length:"))
+    return int(lines[0].split(" ")[1]), await reader.readexactly(length)
+
+
+async def load_employee(port, employee, rounds, latencies):
+    """Клиент одного сотрудника: циклы начало - пауза - возобновление - состояние - завершение"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    base = f"/employees/Load/{employee}"
+    steps = [("POST", base + "/start"), ("POST", base + "/pause"), ("POST", base + "/start"),
+             ("GET", base), ("POST", base + "/end")]
+    try:
+        for _ in range(rounds):
+            for method, path in steps:
+                started = time.perf_counter()
+                status, body = await http_call(reader, writer, method, path)
+                latencies.append(time.perf_counter() - started)
+                assert status == 200, (path, status, body)
+    finally:
+        writer.close()
+
+
+async def run_load(port, employees, rounds):
+    latencies = []
+    # Первое обращение загружает историю сотрудника - прогрев вне замера
+    await asyncio.gather(*(load_employee(port, employee, 1, []) for employee in employees))
+    started = time.perf_counter()
+    await asyncio.gather(*(load_employee(port, employee, rounds, latencies) for employee in employees))
+    return time.perf_counter() - started, latencies
+
+
+def bench_server(args):
+    """Нагрузка на HTTP-службу: запросов в секунду и задержки при многих сотрудниках одновременно"""
+    package_dir = os.path.dirname(os.path.abspath(worktimer.__file__))
+    employees = [f"employee{number:04d}" for number in range(args.employees)]
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, worktimer.CONFIG_FILE), 'w', encoding='utf-8') as f:
+            json.dump({"companies": {"Load": {"positions": ["position"], "employees": employees}},
+                       "storage": args.storage}, f)
+        service = subprocess.Popen([sys.executable, os.path.join(package_dir, "server.py"), "--port", "0"],
+                                   cwd=tmp, stdout=subprocess.PIPE, text=True)
+        try:
+            # Служба печатает адрес, когда готова принимать соединения
+            port = int(service.stdout.readline().strip().rsplit(":", 1)[1])
+            elapsed, latencies = asyncio.run(run_load(port, employees, args.rounds))
+        finally:
+            service.terminate()
+            service.wait()
+        sessions = sum(len(worktimer.open_storage(args.storage, os.path.join(tmp, worktimer.DATA_DIR),
+                                                  "Load", employee, "position").load())
+                       for employee in employees)
+    latencies.sort()
+    print(f"сотрудников: {args.employees}, запросов: {len(latencies)}, хранилище: {args.storage}")
+    print(f"{len(latencies) / elapsed:.0f} запр/с, p50: {latencies[len(latencies) // 2] * 1000:.2f} мс, "
+          f"p99: {latencies[int(len(latencies) * 0.99)] * 1000:.2f} мс, макс.: {latencies[-1] * 1000:.2f} мс")
+    # Прогрев и замер: rounds + 1 сессия на сотрудника, все записаны на диск
+    print(f"сессий на диске: {sessions} из {args.employees * (args.rounds + 1)}")
+
+
+def bench_metrics(args):
+    """Цена замеров: span выключенный и включенный, и разбивка построения отчета по этапам"""
+    def loop(metrics):
+        started = time.perf_counter()
+        for _ in range(args.calls):
+            with metrics.span("update_time"):
+                pass
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(args.calls):
+        pass
+    empty = time.perf_counter() - started
+    for enabled in (False, True):
+        cost = (loop(worktimer.Metrics(enabled)) - empty) / args.calls
+        print(f"span {'включен' if enabled else 'выключен'}: {cost * 1e9:.0f} нс на вызов")
+
+    sessions = worktimer.SessionColumns.from_records(generate_records(args.sessions, datetime(2000, 1, 1, 9)))
+    worktimer.METRICS.enabled = True
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            worktimer.write_report(os.path.join(tmp, "report.pdf"), "Company", "employee", "position", sessions)
+        spans = worktimer.METRICS.snapshot()["spans"]
+    finally:
+        worktimer.METRICS.enabled = False
+    print(f"отчет на {len(sessions)} сессий:")
+    for name in ("report.group", "report.layout", "report.statistics", "report.output", "report"):
+        print(f"  {name:<18} {spans[name]['total'] * 1000:8.0f} мс")
+
+
+def bench_retention(args):
+    """Загрузка истории без архива и после переноса старых сессий в архив"""
+    def load(storage, archive, before):
+        # То же, что делает окно: загрузка и пересчет итогов вместе с архивными
+        sessions, rollup = worktimer.load_history(storage, archive, before)
+        totals = worktimer.SessionTotals()
+        totals.rebuild(sessions)
+        totals.add_rollup(rollup)
+        return totals
+
+    # История той же длины, сдвинутая так, чтобы заканчиваться сегодня
+    random.seed(args.sessions)
+    span = worktimer.parse_timestamp(generate_records(args.sessions, worktimer.EPOCH)[-1][1])
+    random.seed(args.sessions)
+    records = generate_records(args.sessions, datetime.now() - timedelta(seconds=span))
+    before = worktimer.retention_cutoff({"retention_days": args.days})
+    print(f"сессий: {args.sessions}, срок хранения: {args.days} дн.")
+    print(f"{'хранилище':>10} {'без архива, с':>14} {'перенос, с':>11} {'с архивом, с':>13} {'ускорение':>10} "
+          f"{'в хранилище':>12} {'месяц отчета, с':>16}")
+    for kind in args.storages:
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = worktimer.open_storage(kind, tmp, "Company", "employee", "position")
+            storage.save(worktimer.SessionColumns.from_records(records))
+            archive = worktimer.HistoryArchive(tmp, "Company", "employee")
+            full, totals = measure(load, storage, archive, None)
+            compaction, _ = measure(worktimer.load_history, storage, archive, before)
+            hot, archived_totals = measure(load, storage, archive, before)
+            assert archived_totals.count == totals.count == args.sessions
+            # Отчет за один архивный месяц читает только его файл
+            month = archive.months()[len(archive.months()) // 2]
+            month_start = datetime(month[0], month[1], 1)
+            lazy, _ = measure(archive.load, month_start, month_start + timedelta(days=31))
+            kept = len(storage.load())
+            print(f"{kind:>10} {full:>14.3f} {compaction:>11.3f} {hot:>13.3f} {full / hot:>9.1f}x "
+                  f"{kept:>12} {lazy:>16.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="scenario", required=True)
+
+    loader = subparsers.add_parser("loader", help="загрузка истории сессий")
+    loader.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    loader.set_defaults(func=bench_loader)
+
+    report = subparsers.add_parser("report", help="генерация PDF отчета")
+    report.add_argument("--sessions", type=int, default=100_000)
+    report.set_defaults(func=bench_report)
+
+    checkpoint = subparsers.add_parser("checkpoint", help="снимок состояния таймера")
+    checkpoint.add_argument("--writes", type=int, default=200)
+    checkpoint.add_argument("--ticks", type=int, default=100_000)
+    checkpoint.add_argument("--segments", type=int, default=8, help="пауз в сессии")
+    checkpoint.set_defaults(func=bench_checkpoint)
+
+    analytics = subparsers.add_parser("analytics", help="статистика по сессиям")
+    analytics.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    analytics.set_defaults(func=bench_analytics)
+
+    aggregate = subparsers.add_parser("aggregate", help="сводный отчет по компаниям")
+    aggregate.add_argument("--employees", type=int, nargs="+", default=[10, 50, 200])
+    aggregate.add_argument("--sessions", type=int, default=5_000)
+    aggregate.add_argument("--storage", choices=["json", "binary", "sqlite"], default="binary")
+    aggregate.add_argument("--workers", type=int, default=None)
+    aggregate.set_defaults(func=bench_aggregate)
+
+    transfer = subparsers.add_parser("transfer", help="экспорт и импорт сессий")
+    transfer.add_argument("--employees", type=int, default=10)
+    transfer.add_argument("--sessions", type=int, default=50_000)
+    transfer.add_argument("--storage", choices=["json", "binary", "sqlite"], default="binary")
+    transfer.set_defaults(func=bench_transfer)
+
+    concurrency = subparsers.add_parser("concurrency", help="запись из нескольких процессов одновременно")
+    concurrency.add_argument("--processes", type=int, default=4)
+    concurrency.add_argument("--sessions", type=int, default=300)
+    concurrency.add_argument("--storages", nargs="+", choices=["json", "binary", "sqlite"],
+                             default=["json", "binary", "sqlite"])
+    concurrency.set_defaults(func=bench_concurrency)
+
+    startup = subparsers.add_parser("startup", help="время запуска окна")
+    startup.add_argument("--sizes", type=int, nargs="+", default=[0, 10_000, 100_000])
+    startup.add_argument("--repeat", type=int, default=5)
+    startup.set_defaults(func=bench_startup)
+
+    picker = subparsers.add_parser("picker", help="поиск сотрудника по мере ввода")
+    picker.add_argument("--names", type=int, default=50_000)
+    picker.add_argument("--queries", nargs="+", default=["Иванов Иван", "семен", "smith_john", "ова_ма", "petr"])
+    picker.add_argument("--repeat", type=int, default=20)
+    picker.set_defaults(func=bench_picker)
+
+    clock = subparsers.add_parser("clock", help="обращения к Tk из цикла обновления часов")
+    clock.add_argument("--seconds", type=int, default=600)
+    clock.set_defaults(func=bench_clock)
+
+    server = subparsers.add_parser("server", help="нагрузка на HTTP-службу")
+    server.add_argument("--employees", type=int, default=200)
+    server.add_argument("--rounds", type=int, default=20)
+    server.add_argument("--storage", choices=["json", "binary", "sqlite"], default="json")
+    server.set_defaults(func=bench_server)
+
+    metrics = subparsers.add_parser("metrics", help="накладные расходы замеров")
+    metrics.add_argument("--calls", type=int, default=1_000_000)
+    metrics.add_argument("--sessions", type=int, default=20_000)
+    metrics.set_defaults(func=bench_metrics)
+
+    retention = subparsers.add_parser("retention", help="загрузка истории с архивом старых сессий и без него")
+    retention.add_argument("--sessions", type=int, default=50_000)
+    retention.add_argument("--days", type=int, default=90)
+    retention.add_argument("--storages", nargs="+", choices=["json", "binary", "sqlite"],
+                           default=["json", "binary", "sqlite"])
+    retention.set_defaults(func=bench_retention)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
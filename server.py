@@ -0,0 +1,281 @@
+"""Локальная HTTP-служба тайм-трекера: учет времени многих сотрудников в одном процессе.
+
+Запуск: python server.py [--host 127.0.0.1] [--port 8765]
+(то же, что python worktimer.py serve ...)
+
+Запросы, ответы - JSON; компания и сотрудник - в URL-кодировке:
+  GET  /employees                                  открытые трекеры
+  GET  /employees/<компания>/<сотрудник>           состояние
+  POST /employees/<компания>/<сотрудник>/start     начало или возобновление сессии
+  POST /employees/<компания>/<сотрудник>/pause     пауза
+  POST /employees/<компания>/<сотрудник>/end       завершение и запись сессии
+  POST /employees/<компания>/<сотрудник>/report?from=ГГГГ-ММ-ДД&to=ГГГГ-ММ-ДД
+  GET  /metrics                                    замеры (при WORKTIMER_METRICS)
+"""
+import asyncio
+import json
+import os
+import signal
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import worktimer
+
+# Предел заголовков запроса: длиннее - 431
+MAX_HEADER_BYTES = 16 * 1024
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+}
+
+class HttpError(Exception):
+    """Ответ с ошибкой: код и сообщение для клиента"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def parse_day(query, name):
+    """Дата из параметра запроса или None"""
+    values = query.get(name)
+    if not values:
+        return None
+    try:
+        return date.fromisoformat(values[0])
+    except ValueError:
+        raise HttpError(400, f"{name}: дата должна быть в формате ГГГГ-ММ-ДД")
+
+class TrackerService:
+    """Трекеры сотрудников, создаваемые по первому запросу.
+
+    Таймеры живут в цикле событий; загрузка истории и запись сессий идут в
+    пуле потоков, по очереди для каждого сотрудника, а отчеты - в пуле
+    процессов, чтобы не занимать GIL службы.
+    """
+
+    def __init__(self, config_path, data_dir, reports_dir, io_workers=None, report_workers=None):
+        self.settings = worktimer.ConfigStore(config_path)
+        self.storage_kind = self.settings.data.get("storage", "json")
+        self.data_dir = data_dir
+        self.reports_dir = reports_dir
+        os.makedirs(self.data_dir, exist_ok=True)
+        os.makedirs(self.reports_dir, exist_ok=True)
+        self.trackers = {}
+        self.locks = {}
+        self.io = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="worktimer-io")
+        self.report_workers = report_workers
+        self.reports = None
+
+    async def run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.io, func, *args)
+
+    def lock(self, key):
+        """Очередь операций с хранилищем одного сотрудника"""
+        lock = self.locks.get(key)
+        if lock is None:
+            lock = self.locks[key] = asyncio.Lock()
+        return lock
+
+    async def watch_config(self):
+        """Перечитывание config.json при изменении, как в окне программы"""
+        error_shown = self.settings.error
+        while True:
+            await asyncio.sleep(worktimer.CONFIG_CHECK_INTERVAL_MS / 1000)
+            if self.settings.reload_if_changed():
+                print("Конфигурация обновлена", file=sys.stderr)
+                error_shown = None
+            elif self.settings.error and self.settings.error != error_shown:
+                # Ошибка выводится один раз, работа продолжается с прежними настройками
+                print(f"Файл конфигурации не применен: {self.settings.error}", file=sys.stderr)
+                error_shown = self.settings.error
+
+    async def tracker(self, company, employee):
+        """Трекер сотрудника с загруженной историей"""
+        key = (company, employee)
+        tracker = self.trackers.get(key)
+        if tracker is not None:
+            return tracker
+        index = self.settings.index
+        if not index.has_employee(company, employee):
+            raise HttpError(404, f"Сотрудника {employee} нет в компании {company}")
+        async with self.lock(key):
+            tracker = self.trackers.get(key)
+            if tracker is None:
+                tracker = await self.run(worktimer.EmployeeTracker, self.storage_kind, self.data_dir,
+                                         company, employee, index.position_of(company, employee))
+                # Конвертация старых JSON-файлов при смене формата - тоже в пуле
+                await self.run(worktimer.migrate_json_history, tracker.storage, self.data_dir, employee)
+                # Сессии старше retention_days при этом уходят в архив
+                tracker.attach_history(*await self.run(
+                    worktimer.METRICS.timed("storage.load", worktimer.load_history), tracker.storage, tracker.archive,
+                    worktimer.retention_cutoff(self.settings.data)))
+                self.trackers[key] = tracker
+        return tracker
+
+    async def start(self, tracker, query):
+        action = tracker.start()
+        if action is None:
+            raise HttpError(409, "Таймер уже запущен")
+        return {"action": action, **tracker.status()}
+
+    async def pause(self, tracker, query):
+        if not tracker.pause():
+            raise HttpError(409, "Таймер не запущен")
+        return {"action": "paused", **tracker.status()}
+
+    async def end(self, tracker, query):
+        finished = tracker.end()
+        if finished is None:
+            raise HttpError(409, "Нет активной сессии")
+        # Ответ уходит после записи: завершенная сессия уже на диске
+        async with self.lock((tracker.company, tracker.employee)):
+            await self.run(worktimer.METRICS.timed("persist_session", worktimer.persist_session),
+                           tracker.storage, *finished)
+        session, _ = finished
+        return {"action": "ended", "duration": session[2], **tracker.status()}
+
+    async def report(self, tracker, query):
+        date_from, date_to = parse_day(query, "from"), parse_day(query, "to")
+        if date_from and date_to and date_to < date_from:
+            raise HttpError(400, "Конец периода раньше его начала")
+        if self.reports is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self.reports = ProcessPoolExecutor(max_workers=self.report_workers)
+        # Процесс читает историю из хранилища и архива: все завершенные сессии уже записаны
+        result = await asyncio.get_running_loop().run_in_executor(
+            self.reports, worktimer.build_employee_report,
+            self.storage_kind, self.data_dir, self.reports_dir, tracker.company, tracker.employee, tracker.position,
+            datetime.combine(date_from, datetime.min.time()) if date_from else None,
+            datetime.combine(date_to + timedelta(days=1), datetime.min.time()) if date_to else None,
+            worktimer.daily_norm_seconds(self.settings.data))
+        if result is None:
+            raise HttpError(404, "Нет сессий за выбранный период")
+        _, _, sessions, pages, filepath = result
+        return {"path": os.path.abspath(filepath), "sessions": sessions, "pages": pages}
+
+    async def dispatch(self, method, target):
+        """Код ответа и данные для запроса"""
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        if parts == ["metrics"] and worktimer.METRICS.enabled:
+            worktimer.METRICS.gauge("trackers", len(self.trackers))
+            return worktimer.METRICS.snapshot()
+        if not parts or parts[0] != "employees" or len(parts) > 4:
+            raise HttpError(404, "Неизвестный адрес")
+        if len(parts) == 1:
+            if method != "GET":
+                raise HttpError(405, "Ожидается GET")
+            return [tracker.status() for tracker in self.trackers.values()]
+        if len(parts) == 2:
+            raise HttpError(404, "Не указан сотрудник")
+        tracker = await self.tracker(parts[1], parts[2])
+        if len(parts) == 3:
+            if method != "GET":
+                raise HttpError(405, "Ожидается GET")
+            return tracker.status()
+        action = {"start": self.start, "pause": self.pause, "end": self.end, "report": self.report}.get(parts[3])
+        if action is None:
+            raise HttpError(404, f"Неизвестное действие {parts[3]}")
+        if method != "POST":
+            raise HttpError(405, "Ожидается POST")
+        return await action(tracker, parse_qs(url.query))
+
+    async def handle(self, reader, writer):
+        """Соединение HTTP/1.1 с keep-alive: запросы обрабатываются по очереди"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.respond(writer, 431, {"error": "Слишком длинные заголовки"}, False)
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ")
+                    headers = dict(line.split(":", 1) for line in lines[1:] if line)
+                    headers = {name.strip().lower(): value.strip() for name, value in headers.items()}
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "Некорректный запрос"}, False)
+                    break
+                if length:
+                    # Тело запросам не нужно, но его нужно дочитать до следующего запроса
+                    await reader.readexactly(length)
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                started = time.perf_counter()
+                try:
+                    status, payload = 200, await self.dispatch(method, target)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except (OSError, sqlite3.Error) as e:
+                    status, payload = 500, {"error": f"Ошибка хранилища: {e}"}
+                except Exception as e:
+                    status, payload = 500, {"error": f"Внутренняя ошибка: {e}"}
+                await self.respond(writer, status, payload, keep_alive)
+                worktimer.METRICS.observe("http.request", time.perf_counter() - started)
+                worktimer.METRICS.count(f"http.{status}")
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+
+    async def close(self):
+        """Остановка: открытые сессии завершаются и записываются, чтобы время не потерялось"""
+        for key, tracker in list(self.trackers.items()):
+            finished = tracker.end()
+            if finished is not None:
+                async with self.lock(key):
+                    await self.run(worktimer.persist_session, tracker.storage, *finished)
+        self.io.shutdown()
+        if self.reports is not None:
+            self.reports.shutdown()
+
+async def serve(host, port, config_path, data_dir, reports_dir):
+    """Работа службы до Ctrl+C или SIGTERM"""
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except NotImplementedError:
+        pass  # Windows: остается Ctrl+C
+    service = TrackerService(config_path, data_dir, reports_dir)
+    if service.settings.error:
+        print(f"Файл {config_path} не применен: {service.settings.error}", file=sys.stderr)
+    server = await asyncio.start_server(service.handle, host, port, limit=MAX_HEADER_BYTES, backlog=1024)
+    address = server.sockets[0].getsockname()
+    print(f"Служба запущена: http://{address[0]}:{address[1]}", flush=True)
+    watcher = asyncio.create_task(service.watch_config())
+    try:
+        async with server:
+            await server.serve_forever()
+    except asyncio.CancelledError:
+        pass  # Остановка по Ctrl+C или SIGTERM
+    finally:
+        watcher.cancel()
+        await service.close()
+
+if __name__ == "__main__":
+    sys.exit(worktimer.main(["serve", *sys.argv[1:]]))
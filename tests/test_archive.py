@@ -0,0 +1,116 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+import worktimer
+
+PROCESSES = 4
+SESSIONS = 40
+
+
+def make_sessions(first_day, days, per_day=2):
+    """Сессии по per_day в день начиная с first_day; каждая вторая с паузой"""
+    sessions = worktimer.SessionColumns()
+    for day in range(days):
+        for i in range(per_day):
+            start = first_day + timedelta(days=day, hours=9 + 3 * i)
+            end = start + timedelta(hours=1)
+            if i % 2:
+                sessions.append((start, end, 3000.0),
+                                [(start, start + timedelta(minutes=20)), (start + timedelta(minutes=30), end)])
+            else:
+                sessions.append((start, end, 3600.0))
+    return sessions
+
+
+def keys(sessions):
+    return list(zip(sessions.starts, sessions.ends))
+
+
+@pytest.mark.parametrize("storage_kind", worktimer.STORAGE_KINDS)
+def test_load_history_moves_old_sessions(tmp_path, storage_kind):
+    storage = worktimer.open_storage(storage_kind, str(tmp_path), "Company", "employee", "position")
+    sessions = make_sessions(datetime(2025, 1, 20), 30)
+    storage.append_many(sessions)
+    archive = worktimer.HistoryArchive(str(tmp_path), "Company", "employee")
+    before = datetime(2025, 2, 10)
+
+    hot, rollup = worktimer.load_history(storage, archive, before)
+
+    old = sessions.select(None, before)
+    assert keys(hot) == keys(sessions.select(before))
+    assert keys(storage.load()) == keys(hot)
+    assert archive.months() == [(2025, 1), (2025, 2)]
+    assert keys(archive.load()) == keys(old)
+    assert list(archive.load().iter_paused()) == list(old.iter_paused())
+    assert rollup.period_count() == len(old)
+    assert rollup.period_total() == sum(old.durations)
+    assert rollup.period_total(datetime(2025, 2, 1), before) == sum(sessions.select(datetime(2025, 2, 1), before).durations)
+    # Отчет за период на границе архива видит обе части
+    date_from, date_to = datetime(2025, 2, 5), datetime(2025, 2, 15)
+    combined = worktimer.report_sessions(hot.select(date_from, date_to), archive, date_from, date_to)
+    assert keys(combined) == keys(sessions.select(date_from, date_to))
+
+    # Повторная загрузка ничего не переносит и отдает те же итоги
+    again, again_rollup = worktimer.load_history(storage, archive, before)
+    assert keys(again) == keys(hot)
+    assert again_rollup.to_dict() == rollup.to_dict()
+
+
+def test_archive_add_after_crash_skips_duplicates(tmp_path):
+    storage = worktimer.open_storage("json", str(tmp_path), "Company", "employee", "position")
+    sessions = make_sessions(datetime(2025, 3, 1), 20)
+    storage.append_many(sessions)
+    archive = worktimer.HistoryArchive(str(tmp_path), "Company", "employee")
+    before = datetime(2025, 3, 15)
+    # Сбой после записи архива, до удаления сессий из хранилища
+    archive.add(sessions.select(None, before))
+
+    hot, rollup = worktimer.load_history(storage, archive, before)
+
+    assert keys(hot) == keys(sessions.select(before))
+    assert keys(archive.load()) == keys(sessions.select(None, before))
+    assert rollup.period_count() == len(sessions.select(None, before))
+
+
+def test_clear_history_removes_archive(tmp_path):
+    storage = worktimer.open_storage("json", str(tmp_path), "Company", "employee", "position")
+    storage.append_many(make_sessions(datetime(2025, 1, 1), 10))
+    archive = worktimer.HistoryArchive(str(tmp_path), "Company", "employee")
+    worktimer.load_history(storage, archive, datetime(2025, 1, 5))
+
+    worktimer.clear_history(storage, archive)
+
+    assert len(storage.load()) == 0
+    assert archive.months() == []
+    assert len(archive.read_rollup()) == 0
+
+
+def test_archive_folders_do_not_collide(tmp_path):
+    first = worktimer.HistoryArchive(str(tmp_path), "Компания", "Иванов")
+    second = worktimer.HistoryArchive(str(tmp_path), "Компания", "Петров")
+    assert first.path != second.path
+    first.add(make_sessions(datetime(2025, 1, 1), 3))
+    assert second.months() == []
+
+
+def add_to_archive(data_dir, worker):
+    """Процесс теста: перенос своей части сессий одного месяца в общий архив"""
+    sessions = worktimer.SessionColumns()
+    for i in range(SESSIONS):
+        start = datetime(2025, 1, 1) + timedelta(minutes=10 * (i * PROCESSES + worker))
+        sessions.append((start, start + timedelta(minutes=5), 300.0))
+        # По одной сессии за раз, чтобы переписывания месячного файла чередовались
+        worktimer.HistoryArchive(data_dir, "Company", "employee").add(sessions.take(i, i + 1))
+
+
+def test_parallel_archive_writers_lose_nothing(tmp_path):
+    with ProcessPoolExecutor(max_workers=PROCESSES) as pool:
+        for future in [pool.submit(add_to_archive, str(tmp_path), worker) for worker in range(PROCESSES)]:
+            future.result()
+
+    archive = worktimer.HistoryArchive(str(tmp_path), "Company", "employee")
+    archived = archive.load()
+    assert len(archived) == len(set(keys(archived))) == PROCESSES * SESSIONS
+    assert archive.read_rollup().period_count() == PROCESSES * SESSIONS
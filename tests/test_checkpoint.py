@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import worktimer
+
+MINUTE = 60 * 10**9
+
+
+class FakeClock:
+    """Монотонные и настенные часы теста, сдвигаемые вручную"""
+
+    def __init__(self):
+        self.ns = 0
+        self.wall = datetime(2025, 1, 1, 9)
+
+    def monotonic(self):
+        return self.ns
+
+    def now(self):
+        return self.wall + timedelta(microseconds=self.ns // 1000)
+
+    def advance(self, minutes):
+        self.ns += minutes * MINUTE
+
+
+def test_segments_follow_pauses():
+    clock = FakeClock()
+    timer = worktimer.TimerEngine(clock.monotonic, clock.now)
+    timer.start()
+    clock.advance(20)
+    timer.pause()
+    clock.advance(10)
+    timer.start()
+    clock.advance(30)
+
+    session, segments = timer.finish()
+
+    assert session == (datetime(2025, 1, 1, 9), datetime(2025, 1, 1, 10), 50 * 60.0)
+    assert segments == [(datetime(2025, 1, 1, 9), datetime(2025, 1, 1, 9, 20)),
+                        (datetime(2025, 1, 1, 9, 30), datetime(2025, 1, 1, 10))]
+    assert not timer.has_session
+
+
+def test_checkpoint_restores_paused_session(tmp_path):
+    clock = FakeClock()
+    tracker = worktimer.EmployeeTracker("json", str(tmp_path), "Компания", "Иванов", "Разработчик",
+                                        clock=clock.monotonic)
+    tracker.timer.wall_clock = clock.now
+    for _ in range(3):
+        tracker.start()
+        clock.advance(25)
+        tracker.pause()
+        clock.advance(5)
+    tracker.start()
+    clock.advance(10)
+    checkpoint = worktimer.TimerCheckpoint(str(tmp_path / worktimer.CHECKPOINT_FILE))
+    assert checkpoint.write(tracker.checkpoint_state())
+    # Плановая запись до конца интервала пропускается
+    assert not checkpoint.write(tracker.checkpoint_state())
+
+    state = checkpoint.read()
+    assert state["is_running"] and state["accumulated_time"] == 85 * 60.0
+    assert len(state["segments"]) == 4
+
+    restored = worktimer.EmployeeTracker("json", str(tmp_path), "Компания", "Иванов", "Разработчик")
+    # Разбор как в StopwatchApp.offer_resume
+    parse = lambda text: datetime.strptime(text, worktimer.TIME_FORMAT)
+    restored.restore(parse(state["session_start"]), state["accumulated_time"],
+                     [(parse(begin), parse(end)) for begin, end in state["segments"]])
+    assert restored.has_session and not restored.is_running
+    session, segments = restored.end()
+    assert session[2] == 85 * 60.0
+    assert [(begin.strftime(worktimer.TIME_FORMAT), end.strftime(worktimer.TIME_FORMAT))
+            for begin, end in segments] == [tuple(pair) for pair in state["segments"]]
+
+
+def test_corrupt_checkpoint_reads_as_none(tmp_path):
+    path = tmp_path / worktimer.CHECKPOINT_FILE
+    path.write_text('{"company": "Компа', encoding="utf-8")
+    assert worktimer.TimerCheckpoint(str(path)).read() is None
@@ -0,0 +1,43 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+import worktimer
+
+PROCESSES = 4
+SESSIONS = 60
+
+
+def write_sessions(storage_kind, data_dir, worker, compact_threshold):
+    """Процесс теста: SESSIONS сессий одного сотрудника вперемешку с другими процессами"""
+    # Низкий порог, чтобы сворачивание журнала шло во время записи других процессов
+    worktimer.JOURNAL_COMPACT_THRESHOLD = compact_threshold
+    storage = worktimer.open_storage(storage_kind, data_dir, "Company", "employee", "position")
+    for i in range(SESSIONS):
+        start = datetime(2025, 1, 1) + timedelta(minutes=10 * (i * PROCESSES + worker))
+        end = start + timedelta(minutes=5)
+        if i % 3:
+            worktimer.persist_session(storage, (start, end, 300.0))
+        else:
+            # Каждая третья сессия с паузой посередине
+            segments = [(start, start + timedelta(minutes=2)), (start + timedelta(minutes=3), end)]
+            worktimer.persist_session(storage, (start, end, 240.0), segments)
+
+
+@pytest.mark.parametrize("storage_kind", worktimer.STORAGE_KINDS)
+def test_parallel_writers_lose_nothing(tmp_path, storage_kind):
+    with ProcessPoolExecutor(max_workers=PROCESSES) as pool:
+        futures = [pool.submit(write_sessions, storage_kind, str(tmp_path), worker, 25)
+                   for worker in range(PROCESSES)]
+        for future in futures:
+            future.result()
+
+    sessions = worktimer.open_storage(storage_kind, str(tmp_path), "Company", "employee", "position").load()
+    keys = set(zip(sessions.starts, sessions.ends))
+    assert len(sessions) == len(keys) == PROCESSES * SESSIONS
+    assert list(sessions.starts) == sorted(sessions.starts)
+    paused = dict(sessions.iter_paused())
+    assert len(paused) == PROCESSES * len(range(0, SESSIONS, 3))
+    for start, segments in paused.items():
+        assert len(segments) == 2 and segments[0][0] == start
@@ -0,0 +1,96 @@
+import copy
+import json
+import os
+
+import pytest
+
+import worktimer
+
+
+def valid_config():
+    data = copy.deepcopy(worktimer.DEFAULT_CONFIG)
+    data["companies"]["WebStead"]["employee_positions"] = {"ivanov_ivan": "Фронтенд-разработчик"}
+    return data
+
+
+def write_config(path, data):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+@pytest.mark.parametrize("change, field", [
+    (lambda data: data.update(companies={}), "companies"),
+    (lambda data: data["companies"]["WebStead"].update(positions=[]), "companies.WebStead.positions"),
+    (lambda data: data["companies"]["WebStead"].update(employees=["a", "a"]), "companies.WebStead.employees"),
+    (lambda data: data["companies"]["WebStead"].update(employees=["a", " "]), "companies.WebStead.employees"),
+    (lambda data: data["companies"]["WebStead"].update(employee_positions={"nobody": "Бэкэнд-разработчик"}),
+     "companies.WebStead.employee_positions"),
+    (lambda data: data["companies"]["WebStead"].update(employee_positions={"dmitryace": "Директор"}),
+     "companies.WebStead.employee_positions.dmitryace"),
+    (lambda data: data.update(default_company="Нет такой"), "default_company"),
+    (lambda data: data.update(storage="csv"), "storage"),
+    (lambda data: data.update(daily_norm_hours=0), "daily_norm_hours"),
+    (lambda data: data.update(daily_norm_hours=True), "daily_norm_hours"),
+    (lambda data: data.update(retention_days=0), "retention_days"),
+    (lambda data: data.update(retention_days=30.5), "retention_days"),
+])
+def test_invalid_config_names_the_field(change, field):
+    data = valid_config()
+    change(data)
+    with pytest.raises(worktimer.ConfigError) as error:
+        worktimer.validate_config(data)
+    assert str(error.value).startswith(field + ":")
+
+
+def test_valid_config_passes():
+    data = valid_config()
+    data.update(storage="sqlite", daily_norm_hours=7.5, retention_days=365)
+    assert worktimer.validate_config(data) is data
+
+
+def test_load_config(tmp_path):
+    path = tmp_path / "config.json"
+    # Без файла - конфигурация по умолчанию, не общий объект
+    data = worktimer.load_config(str(path))
+    assert data == worktimer.DEFAULT_CONFIG and data is not worktimer.DEFAULT_CONFIG
+    path.write_text('{"companies": ', encoding="utf-8")
+    with pytest.raises(worktimer.ConfigError, match="JSON"):
+        worktimer.load_config(str(path))
+
+
+def test_config_index():
+    index = worktimer.ConfigIndex(valid_config())
+    assert index.companies == ["WebStead", "TechSolutions"]
+    assert index.default_company == "WebStead"
+    assert index.has_employee("WebStead", "dmitryace")
+    assert not index.has_employee("TechSolutions", "dmitryace")
+    assert index.position_of("WebStead", "ivanov_ivan") == "Фронтенд-разработчик"
+    assert index.position_of("WebStead", "dmitryace") == "Бэкэнд-разработчик"
+    assert [index.employees["TechSolutions"][i] for i in index.employee_search("TechSolutions").search("sid")] == ["sidorova_anna"]
+
+
+def test_store_keeps_last_valid_config(tmp_path):
+    path = tmp_path / "config.json"
+    data = valid_config()
+    write_config(path, data)
+    store = worktimer.ConfigStore(str(path))
+    assert store.data == data and store.error is None
+    # Без изменений файл не перечитывается
+    assert not store.reload_if_changed()
+
+    broken = valid_config()
+    broken["default_company"] = "Нет такой"
+    write_config(path, broken)
+    os.utime(path, ns=(1, 1))
+    assert not store.reload_if_changed()
+    assert store.data == data and store.error.startswith("default_company:")
+
+    data["companies"]["WebStead"]["employees"].append("new_employee")
+    write_config(path, data)
+    os.utime(path, ns=(2, 2))
+    assert store.reload_if_changed()
+    assert store.error is None and store.index.has_employee("WebStead", "new_employee")
+
+    # Удаленный файл - остается прежняя конфигурация
+    path.unlink()
+    assert not store.reload_if_changed()
+    assert store.index.has_employee("WebStead", "new_employee")
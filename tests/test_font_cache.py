@@ -0,0 +1,38 @@
+import os
+import pickle
+
+import pytest
+
+import worktimer
+
+FONT = os.path.join(worktimer.FONTS_DIR, worktimer.REPORT_FONTS[""])
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    pytest.importorskip("fpdf")
+    monkeypatch.setattr(worktimer, "FONT_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(worktimer, "_font_metrics", {})
+    return tmp_path
+
+
+@pytest.mark.parametrize("content", [
+    b"",
+    b"\x80\x04\x95",
+    pickle.dumps(["not", "metrics"]),
+    pickle.dumps({"name": "DejaVuSans"}),
+    b"garbage that is not a pickle at all",
+])
+def test_corrupt_cache_is_rebuilt(cache_dir, content):
+    metrics, cache_file = worktimer.load_font_metrics(FONT)
+    expected = dict(metrics)
+    with open(cache_file, "wb") as f:
+        f.write(content)
+    worktimer._font_metrics.clear()
+
+    metrics, rebuilt = worktimer.load_font_metrics(FONT)
+
+    assert rebuilt == cache_file
+    assert metrics == expected
+    with open(cache_file, "rb") as f:
+        assert pickle.load(f) == expected
@@ -0,0 +1,89 @@
+import json
+from datetime import datetime, timedelta
+
+import worktimer
+
+
+def session(day, hours=9):
+    start = datetime(2025, 1, 1) + timedelta(days=day, hours=hours)
+    return start, start + timedelta(hours=1), 3600.0
+
+
+def keys(sessions):
+    return list(zip(sessions.starts, sessions.ends))
+
+
+def test_append_and_compact(tmp_path):
+    storage = worktimer.SessionJournal(str(tmp_path / "sessions_employee.json"), fsync=False)
+    for day in range(5):
+        worktimer.persist_session(storage, session(day))
+    assert storage.journal_records == 5
+    before = keys(storage.load())
+
+    storage.compact()
+
+    assert not (tmp_path / "sessions_employee.journal").exists()
+    assert storage.journal_records == 0
+    assert keys(storage.load()) == before
+
+
+def test_crash_after_snapshot_keeps_journal_records_once(tmp_path):
+    storage = worktimer.SessionJournal(str(tmp_path / "sessions_employee.json"), fsync=False)
+    for day in (0, 2, 4):
+        storage.append(session(day))
+    storage.compact()
+    # Журнал с сессией из середины истории и сессией в конце
+    storage.append(session(1))
+    storage.append(session(5))
+    expected = keys(storage.load())
+    journal = (tmp_path / "sessions_employee.journal").read_text(encoding="utf-8")
+
+    # Сбой между заменой снимка и удалением журнала: снимок упорядочен,
+    # поэтому записи журнала оказываются не только в его хвосте
+    storage.write_snapshot(storage.read_records())
+    records = json.loads((tmp_path / "sessions_employee.json").read_text(encoding="utf-8"))
+    records.sort(key=lambda record: record[0])
+    (tmp_path / "sessions_employee.json").write_text(json.dumps(records), encoding="utf-8")
+    (tmp_path / "sessions_employee.journal").write_text(journal, encoding="utf-8")
+
+    reopened = worktimer.SessionJournal(str(tmp_path / "sessions_employee.json"), fsync=False)
+    loaded = reopened.load()
+    assert keys(loaded) == expected
+    assert len(set(keys(loaded))) == len(loaded) == 5
+
+
+def test_torn_journal_line_is_ignored(tmp_path):
+    storage = worktimer.SessionJournal(str(tmp_path / "sessions_employee.json"), fsync=False)
+    storage.append(session(0))
+    storage.append(session(1))
+    with open(tmp_path / "sessions_employee.journal", "a", encoding="utf-8") as f:
+        f.write('["2025-01-03 09:00:00", "2025-01-')
+
+    loaded = worktimer.SessionJournal(str(tmp_path / "sessions_employee.json"), fsync=False).load()
+
+    assert keys(loaded) == [(worktimer.to_timestamp(s[0]), worktimer.to_timestamp(s[1]))
+                            for s in (session(0), session(1))]
+
+
+def test_legacy_array_file_reads_as_snapshot(tmp_path):
+    records = [worktimer.session_to_record(session(day)) for day in range(3)]
+    (tmp_path / "sessions_employee.json").write_text(json.dumps(records), encoding="utf-8")
+
+    loaded = worktimer.SessionJournal(str(tmp_path / "sessions_employee.json")).load()
+
+    assert len(loaded) == 3
+    assert list(loaded.durations) == [3600.0] * 3
+
+
+def test_segments_survive_journal_and_snapshot(tmp_path):
+    storage = worktimer.SessionJournal(str(tmp_path / "sessions_employee.json"), fsync=False)
+    start, end, _ = session(0)
+    segments = [(start, start + timedelta(minutes=20)), (start + timedelta(minutes=40), end)]
+    storage.append((start, end, 2400.0), segments)
+    assert storage.load().segments(0) == segments
+
+    storage.compact()
+
+    loaded = storage.load()
+    assert loaded.segments(0) == segments
+    assert loaded[0] == (start, end, 2400.0)
@@ -0,0 +1,28 @@
+import worktimer
+
+
+def names(index, query):
+    return [index.names[i] for i in index.search(query)]
+
+
+def test_prefix_matches_come_first():
+    index = worktimer.NameIndex(["Петров Иван", "Иванов Пётр", "ivan.sidorov", "Сидоренко Иванна", "Маливанов"])
+    # Совпадения по началу слова упорядочены по совпавшему слову, подстрока - в конце
+    assert names(index, "иван") == ["Петров Иван", "Сидоренко Иванна", "Иванов Пётр", "Маливанов"]
+    assert names(index, "IVAN") == ["ivan.sidorov"]
+    assert names(index, "sidor") == ["ivan.sidorov"]
+
+
+def test_substring_and_yo():
+    index = worktimer.NameIndex(["Семён Петров", "Алексей Семенов", "Фёдор"])
+    assert names(index, "семен") == ["Семён Петров", "Алексей Семенов"]
+    assert names(index, "ёдо") == ["Фёдор"]
+    assert names(index, "  ") == ["Семён Петров", "Алексей Семенов", "Фёдор"]
+
+
+def test_config_index_builds_search_once():
+    config = {"companies": {"Компания": {"employees": ["Иванов", "Петров"], "positions": ["Разработчик"]}}}
+    config_index = worktimer.ConfigIndex(config)
+    first = config_index.employee_search("Компания")
+    assert config_index.employee_search("Компания") is first
+    assert names(first, "пет") == ["Петров"]
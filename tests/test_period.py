@@ -0,0 +1,18 @@
+from datetime import date, datetime
+
+import worktimer
+
+
+def test_period_bounds_follow_today():
+    # Границы считаются от переданного дня: после полуночи "день" сдвигается
+    assert worktimer.period_bounds("day", today=date(2025, 1, 31)) == (datetime(2025, 1, 31), datetime(2025, 2, 1))
+    assert worktimer.period_bounds("day", today=date(2025, 2, 1)) == (datetime(2025, 2, 1), datetime(2025, 2, 2))
+    assert worktimer.period_bounds("week", today=date(2025, 1, 1)) == (datetime(2024, 12, 30), datetime(2025, 1, 6))
+    assert worktimer.period_bounds("month", today=date(2024, 12, 15)) == (datetime(2024, 12, 1), datetime(2025, 1, 1))
+    assert worktimer.period_bounds("last_month", today=date(2025, 1, 15)) == (datetime(2024, 12, 1), datetime(2025, 1, 1))
+
+
+def test_custom_period_includes_last_day():
+    custom = (date(2025, 3, 1), date(2025, 3, 10))
+    assert worktimer.period_bounds("custom", custom) == (datetime(2025, 3, 1), datetime(2025, 3, 11))
+    assert worktimer.period_bounds("all") == (None, None)
@@ -0,0 +1,165 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import worktimer
+
+
+def make_sessions(days, first_day=datetime(2025, 1, 1)):
+    """По две сессии в день; вторая с паузой"""
+    sessions = worktimer.SessionColumns()
+    for day in range(days):
+        start = first_day + timedelta(days=day, hours=9)
+        sessions.append((start, start + timedelta(hours=1), 3600.0))
+        start += timedelta(hours=4)
+        end = start + timedelta(hours=2)
+        sessions.append((start, end, 5400.0),
+                        [(start, start + timedelta(minutes=30)), (start + timedelta(hours=1), end)])
+    return sessions
+
+
+def snapshot(sessions):
+    return [(sessions[i], sessions.segments(i)) for i in range(len(sessions))]
+
+
+@pytest.fixture(params=worktimer.STORAGE_KINDS)
+def storage(request, tmp_path):
+    storage = worktimer.open_storage(request.param, str(tmp_path), "Компания", "Иванов", "Разработчик")
+    yield storage
+    storage.close()
+
+
+def test_save_load_round_trip(storage):
+    sessions = make_sessions(10)
+    storage.save(sessions)
+    assert snapshot(storage.load()) == snapshot(sessions)
+
+
+def test_append_keeps_order_and_segments(storage):
+    sessions = make_sessions(6)
+    # Вперемешку: хранилища обязаны вернуть историю по порядку начала
+    for index in (5, 0, 3, 1, 4, 2, 11, 6, 8, 7, 10, 9):
+        storage.append(sessions[index], sessions.segments(index))
+    assert snapshot(storage.load()) == snapshot(sessions)
+
+
+def test_remove_keeps_other_sessions(storage):
+    sessions = make_sessions(10)
+    storage.append_many(sessions)
+    storage.remove(sessions.take(0, 6))
+    assert snapshot(storage.load()) == snapshot(sessions.take(6, len(sessions)))
+
+
+def test_slice_matches_select(storage):
+    sessions = make_sessions(10)
+    storage.save(sessions)
+    date_from, date_to = datetime(2025, 1, 3), datetime(2025, 1, 6)
+    if not hasattr(storage, "slice"):
+        pytest.skip("выборка по периоду есть только у двоичного и SQLite хранилищ")
+    assert snapshot(storage.slice(date_from, date_to)) == snapshot(sessions.select(date_from, date_to))
+
+
+def test_sqlite_sessions_with_same_start_keep_their_segments(tmp_path):
+    storage = worktimer.open_storage("sqlite", str(tmp_path), "Компания", "Иванов", "Разработчик")
+    start = datetime(2025, 1, 1, 9)
+    sessions = worktimer.SessionColumns()
+    # Два окна начали сессию в одну секунду, у обеих были паузы
+    sessions.append((start, start + timedelta(hours=1), 3000.0),
+                    [(start, start + timedelta(minutes=20)), (start + timedelta(minutes=30), start + timedelta(hours=1))])
+    sessions.append((start, start + timedelta(hours=2), 6000.0),
+                    [(start, start + timedelta(minutes=50)), (start + timedelta(hours=1, minutes=10), start + timedelta(hours=2))])
+
+    storage.save(sessions)
+
+    loaded = storage.load()
+    assert sorted(snapshot(loaded)) == sorted(snapshot(sessions))
+    storage.close()
+
+
+def test_sqlite_index_by_company_employee_start(tmp_path):
+    worktimer.open_storage("sqlite", str(tmp_path), "Компания", "Иванов", "Разработчик").close()
+    with sqlite3.connect(str(tmp_path / worktimer.SQLITE_DB_NAME)) as connection:
+        columns = [row[2] for row in connection.execute(
+            "PRAGMA index_info(sessions_company_employee_start)")]
+    assert columns == ["company", "employee", "start_time"]
+
+
+def test_sqlite_keeps_employees_apart(tmp_path):
+    first = worktimer.open_storage("sqlite", str(tmp_path), "Компания", "Иванов", "Разработчик")
+    second = worktimer.open_storage("sqlite", str(tmp_path), "Компания", "Иванова", "Разработчик")
+    first.save(make_sessions(3))
+    assert len(second.load()) == 0
+    second.save(make_sessions(2))
+    assert len(first.load()) == 6
+    first.close()
+    second.close()
+
+
+@pytest.mark.parametrize("storage_kind", ["binary", "sqlite"])
+def test_json_history_migrates_once(tmp_path, storage_kind):
+    sessions = make_sessions(5)
+    json_storage = worktimer.open_storage("json", str(tmp_path), "Компания", "Ivanov", "Разработчик")
+    json_storage.save(sessions)
+
+    # Открытие без переноса ничего не читает и не конвертирует
+    deferred = worktimer.open_storage(storage_kind, str(tmp_path), "Компания", "Ivanov", "Разработчик", migrate=False)
+    assert deferred.is_empty()
+    assert worktimer.migrate_json_history(deferred, str(tmp_path), "Ivanov")
+    assert snapshot(deferred.load()) == snapshot(sessions)
+    assert os.path.exists(json_storage.snapshot_path + ".migrated")
+    assert not worktimer.migrate_json_history(deferred, str(tmp_path), "Ivanov")
+    deferred.close()
+
+    reopened = worktimer.open_storage(storage_kind, str(tmp_path), "Компания", "Ivanov", "Разработчик")
+    assert snapshot(reopened.load()) == snapshot(sessions)
+    reopened.close()
+
+
+def test_binary_ignores_torn_tail(tmp_path):
+    storage = worktimer.open_storage("binary", str(tmp_path), "Компания", "Ivanov", "Разработчик")
+    sessions = make_sessions(3)
+    storage.save(sessions)
+    with open(storage.path, "ab") as f:
+        f.write(b"\x01\x02\x03")
+    assert snapshot(storage.load()) == snapshot(sessions)
+
+
+def test_export_import_round_trip(tmp_path):
+    source = tmp_path / "source"
+    target = tmp_path / "target"
+    # Файловые хранилища называются по ASCII-части имени, поэтому имена латиницей
+    config_data = {"companies": {"Компания": {"employees": ["Ivanov", "Petrov"], "positions": ["Разработчик"]}}}
+    source.mkdir()
+    expected = {}
+    for offset, employee in enumerate(config_data["companies"]["Компания"]["employees"]):
+        sessions = make_sessions(4, datetime(2025, 1, 1 + offset))
+        worktimer.open_storage("binary", str(source), "Компания", employee, "Разработчик").save(sessions)
+        expected[employee] = snapshot(sessions)
+
+    for name, writer, reader in (("export.csv", worktimer.write_sessions_csv, worktimer.read_sessions_csv),
+                                 ("export.cols", worktimer.write_columnar, worktimer.read_columnar)):
+        path = str(tmp_path / name)
+        rows = writer(path, worktimer.iter_employee_chunks(config_data, "binary", str(source), chunk_size=3))
+        assert rows == 16
+        destination = str(target / name)
+        os.makedirs(destination)
+        assert worktimer.import_sessions(reader(path), "sqlite", destination) == (16, 16)
+        # Повторный импорт - только дубли
+        assert worktimer.import_sessions(reader(path), "sqlite", destination) == (16, 0)
+        for employee, sessions in expected.items():
+            storage = worktimer.open_storage("sqlite", destination, "Компания", employee, "Разработчик")
+            assert snapshot(storage.load()) == sessions
+            storage.close()
+
+
+def test_csv_keeps_segments_and_names(tmp_path):
+    sessions = make_sessions(2)
+    path = str(tmp_path / "export.csv")
+    worktimer.write_sessions_csv(path, [("Компания", "Иванов, Иван", "Разработчик", sessions)])
+    chunks = list(worktimer.read_sessions_csv(path))
+    assert [chunk[:3] for chunk in chunks] == [("Компания", "Иванов, Иван", "Разработчик")]
+    assert snapshot(chunks[0][3]) == snapshot(sessions)
+    with open(path, encoding="utf-8-sig") as f:
+        assert f.readline().strip().split(";") == worktimer.EXPORT_CSV_HEADER
@@ -1,170 +1,3395 @@
 import tkinter as tk
-from datetime import datetime, timedelta
+import argparse
+import copy
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from string import ascii_letters, digits
-from fpdf import FPDF
 import os
 import json
-from tkinter import messagebox, ttk
+import re
+import queue
+import struct
+import threading
+from tkinter import messagebox, simpledialog, ttk
 import unicodedata
 
+# Блокировка файлов между процессами: fcntl на Linux/macOS, msvcrt на Windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
 # Конфигурационный файл
 CONFIG_FILE = "config.json"
 
-# Загрузка конфигурации
-def load_config():
-    default_config = {
-        "companies": {
-            "WebStead": {
-                "positions": ["Бэкэнд-разработчик", "Фронтенд-разработчик"],
-                "employees": ["dmitryace", "ivanov_ivan"]
-            },
-            "TechSolutions": {
-                "positions": ["Системный администратор", "DevOps инженер"],
-                "employees": ["petrov_petr", "sidorova_anna"]
-            }
-        },
-        "default_company": "WebStead"
-    }
-    
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return default_config
-    return default_config
-
-# Класс PDF с поддержкой Unicode
-class UnicodePDF(FPDF):
-    def __init__(self):
-        super().__init__()
-        try:
-            self.add_font('DejaVu', '', r'fonts\DejaVuSans.ttf', uni=True)
-            self.add_font('DejaVu', 'B', r'fonts\DejaVuSans-Bold.ttf', uni=True)
-            self.set_font('DejaVu', '', 12)
-        except:
-            # Fallback if fonts not found
-            self.set_font("Arial", "", 12)
-            
-    def header(self):
-        pass
+# Папки с данными сессий и отчетами
+DATA_DIR = "sessions"
+REPORTS_DIR = "reports"
+
+# Архив старых сессий: папка внутри DATA_DIR, месячные файлы и дневные итоги сотрудника
+ARCHIVE_DIR = "archive"
+ARCHIVE_MONTH_NAME = re.compile(r"(\d{4})-(\d{2})\.jsonl\.gz")
+ROLLUP_FILE = "rollup.json"
+
+# Необязательные замеры: WORKTIMER_METRICS=<файл.json> - счетчики и гистограммы
+# времени операций, WORKTIMER_PROFILE=<файл.prof> - профиль cProfile всего запуска
+METRICS_ENV = "WORKTIMER_METRICS"
+PROFILE_ENV = "WORKTIMER_PROFILE"
+METRICS_STATUS_INTERVAL_MS = 1000
+# Корзины гистограммы - степени двойки микросекунд, последняя открыта сверху (> 30 мин)
+HISTOGRAM_BUCKETS = 32
+
+# Адрес HTTP-службы (server.py) по умолчанию
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+
+# Снимок незавершенной сессии для восстановления после сбоя
+CHECKPOINT_FILE = "timer_state.json"
+
+# Минимальный интервал между плановыми записями снимка, секунды
+CHECKPOINT_INTERVAL = 15
+
+# Период опроса фоновых задач из цикла Tk, миллисекунды
+POLL_INTERVAL_MS = 25
+
+# Шрифты отчета ищутся рядом со скриптом (или exe в сборке PyInstaller), а не в текущей папке
+BASE_DIR = os.path.dirname(sys.executable if getattr(sys, "frozen", False) else os.path.abspath(__file__))
+FONTS_DIR = os.path.join(BASE_DIR, "fonts")
+REPORT_FONTS = {"": "DejaVuSans.ttf", "B": "DejaVuSans-Bold.ttf"}
+
+# Кэш метрик шрифтов на диске, файлы именуются по хэшу содержимого шрифта
+FONT_CACHE_DIR = os.path.join(
+    os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "worktimer", "fonts"
+)
+# Ключи метрик, которые fpdf читает у шрифта; без них кэш считается поврежденным
+FONT_METRICS_KEYS = frozenset(('name', 'type', 'desc', 'up', 'ut', 'originalsize', 'cw'))
+
+# Формат меток времени в файлах сессий
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Начало отсчета для меток времени в колонках (локальное время, без часового пояса)
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+# Количество записей в журнале, после которого он сворачивается в снимок
+JOURNAL_COMPACT_THRESHOLD = 500
+
+# Сколько ждать блокировку файла сессий другим процессом, секунды
+LOCK_TIMEOUT = 10
+
+# Двоичный формат сессий: заголовок и записи фиксированной длины
+# (int64 начало, int64 окончание, float64 длительность)
+BINARY_MAGIC = b"WTSESS\x00\x01"
+BINARY_RECORD = struct.Struct("<qqd")
+
+# Отрезки работы сессий с паузами хранятся рядом в файле .seg:
+# (int64 начало сессии, int64 начало отрезка, int64 конец отрезка)
+SEGMENTS_MAGIC = b"WTSEGS\x00\x01"
+SEGMENT_RECORD = struct.Struct("<qqq")
+
+# Общая база SQLite для всех сотрудников
+SQLITE_DB_NAME = "sessions.db"
+# Базы, схема которых уже проверена этим процессом
+SQLITE_SCHEMA_READY = set()
+
+# Колоночный формат экспорта: группы строк одного сотрудника.
+# Заголовок группы: длина JSON-описания, число сессий, число отрезков;
+# затем описание и колонки (little-endian): начала, окончания,
+# длительности, индекс отрезков, начала и окончания отрезков
+COLUMNAR_MAGIC = b"WTCOLS\x00\x01"
+COLUMNAR_GROUP = struct.Struct("<III")
+EXPORT_CHUNK_SIZE = 50_000
+EXPORT_CSV_HEADER = ["company", "employee", "position", "start", "end", "duration", "segments"]
+
+# Норма рабочего времени в день (часы), ключ daily_norm_hours в config.json
+DAILY_NORM_HOURS = 8
+
+WEEKDAY_NAMES = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
+# Как часто окно проверяет, не изменился ли config.json, миллисекунды
+CONFIG_CHECK_INTERVAL_MS = 2000
+
+STORAGE_KINDS = ("json", "binary", "sqlite")
+
+# Сколько найденных сотрудников передается в выпадающий список за раз
+PICKER_VISIBLE_ROWS = 50
+
+# Разделители слов в именах для поиска по началу слова
+NAME_WORD_SEPARATORS = re.compile(r"[\s_.\-]+")
+
+# Конфигурация, если файла config.json нет
+DEFAULT_CONFIG = {
+    "companies": {
+        "WebStead": {
+            "positions": ["Бэкэнд-разработчик", "Фронтенд-разработчик"],
+            "employees": ["dmitryace", "ivanov_ivan"]
+        },
+        "TechSolutions": {
+            "positions": ["Системный администратор", "DevOps инженер"],
+            "employees": ["petrov_petr", "sidorova_anna"]
+        }
+    },
+    "default_company": "WebStead",
+    "daily_norm_hours": DAILY_NORM_HOURS
+}
+
+class ConfigError(ValueError):
+    """Неверный формат config.json"""
+
+def _check_names(value, path):
+    """Непустой список непустых уникальных строк"""
+    if not isinstance(value, list) or not value:
+        raise ConfigError(f"{path}: ожидается непустой список")
+    seen = set()
+    for name in value:
+        if not isinstance(name, str) or not name.strip():
+            raise ConfigError(f"{path}: имена должны быть непустыми строками, получено {name!r}")
+        if name in seen:
+            raise ConfigError(f"{path}: повторяется {name!r}")
+        seen.add(name)
+
+def validate_config(data):
+    """Проверка схемы конфигурации; ошибка - ConfigError с путем к неверному полю"""
+    if not isinstance(data, dict):
+        raise ConfigError("ожидается JSON-объект")
+    companies = data.get("companies")
+    if not isinstance(companies, dict) or not companies:
+        raise ConfigError("companies: ожидается непустой объект компаний")
+    for company, company_data in companies.items():
+        path = f"companies.{company}"
+        if not isinstance(company_data, dict):
+            raise ConfigError(f"{path}: ожидается объект с positions и employees")
+        _check_names(company_data.get("positions"), f"{path}.positions")
+        _check_names(company_data.get("employees"), f"{path}.employees")
+        assigned = company_data.get("employee_positions", {})
+        if not isinstance(assigned, dict):
+            raise ConfigError(f"{path}.employee_positions: ожидается объект")
+        for employee, position in assigned.items():
+            if employee not in company_data["employees"]:
+                raise ConfigError(f"{path}.employee_positions: сотрудника {employee!r} нет в employees")
+            if position not in company_data["positions"]:
+                raise ConfigError(f"{path}.employee_positions.{employee}: должности {position!r} нет в positions")
+    if "default_company" in data and data["default_company"] not in companies:
+        raise ConfigError(f"default_company: компании {data['default_company']!r} нет в companies")
+    if data.get("storage", "json") not in STORAGE_KINDS:
+        raise ConfigError(f"storage: ожидается одно из {', '.join(STORAGE_KINDS)}")
+    norm = data.get("daily_norm_hours", DAILY_NORM_HOURS)
+    if isinstance(norm, bool) or not isinstance(norm, (int, float)) or not 0 < norm <= 24:
+        raise ConfigError("daily_norm_hours: ожидается число часов от 0 до 24")
+    retention = data.get("retention_days")
+    if retention is not None and (isinstance(retention, bool) or not isinstance(retention, int) or retention < 1):
+        raise ConfigError("retention_days: ожидается целое число дней не меньше 1")
+    return data
+
+def read_config(path):
+    """Чтение и проверка config.json; OSError при ошибке чтения, ConfigError при ошибке формата"""
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            data = json.load(f)
+        except ValueError as e:
+            raise ConfigError(f"не удалось разобрать JSON: {e}") from e
+    return validate_config(data)
+
+# Загрузка конфигурации
+def load_config(path=CONFIG_FILE):
+    """Конфигурация из файла или по умолчанию, если файла нет.
+
+    Ошибки формата не скрываются: выбрасывается ConfigError.
+    """
+    if not os.path.exists(path):
+        return copy.deepcopy(DEFAULT_CONFIG)
+    try:
+        return read_config(path)
+    except OSError as e:
+        raise ConfigError(f"не удалось прочитать {path}: {e}") from e
+
+def search_key(text):
+    """Ключ поиска имени: casefold и "ё" -> "е"; кириллица сохраняется, в отличие от sanitize_filename"""
+    return text.casefold().replace("ё", "е")
+
+class NameIndex:
+    """Инкрементальный поиск по списку имен.
+
+    Начала имен и начала слов внутри имен (после "_", ".", "-" и пробела)
+    лежат в отсортированном списке и ищутся bisect за O(log N). Для
+    запросов от трех символов добавляются совпадения по подстроке через
+    индекс триграмм: пересекаются списки имен для триграмм запроса.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.keys = [search_key(name) for name in self.names]
+        prefixes = []
+        trigrams = {}
+        for index, key in enumerate(self.keys):
+            prefixes.append((key, index))
+            for separator in NAME_WORD_SEPARATORS.finditer(key):
+                if separator.end() < len(key):
+                    prefixes.append((key[separator.end():], index))
+            for position in range(len(key) - 2):
+                postings = trigrams.setdefault(key[position:position + 3], [])
+                # Имена обходятся по порядку, поэтому повтор триграммы в имени - последний элемент
+                if not postings or postings[-1] != index:
+                    postings.append(index)
+        prefixes.sort()
+        self.prefix_keys = [key for key, _ in prefixes]
+        self.prefix_owners = array('i', (index for _, index in prefixes))
+        self.trigrams = {trigram: array('i', postings) for trigram, postings in trigrams.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, query):
+        """Номера подходящих имен: сначала по началу имени или слова, затем по подстроке"""
+        query = search_key(query.strip())
+        if not query:
+            return range(len(self.names))
+        first = bisect_left(self.prefix_keys, query)
+        last = bisect_left(self.prefix_keys, query + "\U0010ffff", first)
+        matches = list(dict.fromkeys(self.prefix_owners[first:last]))
+        if len(query) >= 3:
+            postings = sorted((self.trigrams.get(query[i:i + 3], ()) for i in range(len(query) - 2)), key=len)
+            if postings[0]:
+                candidates = set(postings[0])
+                for other in postings[1:]:
+                    candidates.intersection_update(other)
+                found = set(matches)
+                keys = self.keys
+                extra = [index for index in candidates if index not in found and query in keys[index]]
+                extra.sort(key=keys.__getitem__)
+                matches.extend(extra)
+        return matches
+
+class ConfigIndex:
+    """Готовые списки для комбобоксов и поиск по сотрудникам без обхода конфигурации"""
+
+    def __init__(self, data):
+        companies = data["companies"]
+        self.companies = list(companies)
+        self.default_company = data.get("default_company", self.companies[0])
+        self.positions = {company: list(company_data["positions"]) for company, company_data in companies.items()}
+        self.employees = {company: list(company_data["employees"]) for company, company_data in companies.items()}
+        self.employee_sets = {company: set(employees) for company, employees in self.employees.items()}
+        self.assigned_positions = {
+            (company, employee): position
+            for company, company_data in companies.items()
+            for employee, position in company_data.get("employee_positions", {}).items()
+        }
+        # Поисковые индексы сотрудников строятся при первом поиске в компании
+        self.employee_indexes = {}
+
+    def employee_search(self, company):
+        """NameIndex сотрудников компании"""
+        name_index = self.employee_indexes.get(company)
+        if name_index is None:
+            name_index = self.employee_indexes[company] = NameIndex(self.employees[company])
+        return name_index
+
+    def has_employee(self, company, employee):
+        return employee in self.employee_sets.get(company, ())
+
+    def position_of(self, company, employee):
+        """Должность сотрудника: из employee_positions или первая должность компании"""
+        return self.assigned_positions.get((company, employee), self.positions[company][0])
+
+class ConfigStore:
+    """config.json с проверкой схемы, индексом и перечитыванием при изменении файла.
+
+    Изменение определяется по времени модификации и размеру файла, так
+    что проверка из цикла Tk стоит один os.stat. Если новый файл не
+    проходит проверку, остается прежняя конфигурация, а текст ошибки
+    сохраняется в error.
+    """
+
+    def __init__(self, path=CONFIG_FILE):
+        self.path = path
+        self.signature = None
+        self.error = None
+        self.data = copy.deepcopy(DEFAULT_CONFIG)
+        self.index = ConfigIndex(self.data)
+        self.reload_if_changed()
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload_if_changed(self):
+        """Перечитывание при изменении файла; True, если принята новая конфигурация"""
+        signature = self._signature()
+        if signature == self.signature:
+            return False
+        self.signature = signature
+        if signature is None:
+            # Файл удален - продолжаем с текущей конфигурацией
+            return False
+        try:
+            data = read_config(self.path)
+        except (OSError, ConfigError) as e:
+            self.error = str(e)
+            return False
+        self.error = None
+        self.data = data
+        self.index = ConfigIndex(data)
+        return True
+
+# Кэш начала дня в секундах по строке "YYYY-MM-DD"
+_day_offsets = {}
+
+def parse_timestamp(text):
+    """Быстрый разбор "YYYY-MM-DD HH:MM:SS" в секунды от EPOCH по фиксированным позициям"""
+    day = text[:10]
+    offset = _day_offsets.get(day)
+    if offset is None:
+        offset = (date(int(text[0:4]), int(text[5:7]), int(text[8:10])).toordinal() - EPOCH_ORDINAL) * 86400
+        _day_offsets[day] = offset
+    return offset + int(text[11:13]) * 3600 + int(text[14:16]) * 60 + int(text[17:19])
+
+def to_timestamp(moment):
+    """Конвертация datetime в секунды от EPOCH"""
+    return (moment.toordinal() - EPOCH_ORDINAL) * 86400 + moment.hour * 3600 + moment.minute * 60 + moment.second
+
+def to_datetime(timestamp):
+    """Конвертация секунд от EPOCH в datetime"""
+    return EPOCH + timedelta(seconds=timestamp)
+
+def format_timestamp(timestamp):
+    """Форматирование секунд от EPOCH по TIME_FORMAT"""
+    return to_datetime(timestamp).strftime(TIME_FORMAT)
+
+class Histogram:
+    """Гистограмма длительностей: корзины по степеням двойки микросекунд, сумма, минимум и максимум"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        self.buckets[min(int(seconds * 1e6).bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+
+    def quantile(self, fraction):
+        """Оценка сверху: граница корзины, в которую попадает квантиль (не больше максимума)"""
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min((1 << index) / 1e6, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min or 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            # Верхняя граница корзины в микросекундах -> число замеров
+            "buckets": {str(1 << index): count for index, count in enumerate(self.buckets) if count},
+        }
+
+class _Span:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.started)
+        return False
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NO_SPAN = _NoSpan()
+
+class Metrics:
+    """Счетчики и гистограммы времени операций.
+
+    Включаются переменной окружения WORKTIMER_METRICS; выключенные, все
+    методы возвращаются сразу (span - общий пустой контекст, timed -
+    исходную функцию), поэтому замеры можно оставлять в горячих местах.
+    Потокобезопасны: в них пишут и фоновые потоки.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def span(self, name):
+        """Контекст, время выполнения которого попадает в гистограмму name"""
+        if not self.enabled:
+            return NO_SPAN
+        return _Span(self, name)
+
+    def timed(self, name, func):
+        """Функция, каждый вызов которой замеряется как span name"""
+        if not self.enabled:
+            return func
+        def wrapper(*args, **kwargs):
+            with _Span(self, name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        """Текущее значение (размер кэша, число сессий) - перезаписывается"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "pid": os.getpid(),
+                "saved_at": datetime.now().strftime(TIME_FORMAT),
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "spans": {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())},
+            }
+
+    def dump(self, path):
+        """Запись снимка в JSON (через временный файл, чтобы не оставить обрезанный)"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def status_line(self):
+        """Короткая строка для отладочной панели: медиана и максимум основных операций"""
+        def short(seconds):
+            return f"{seconds * 1000:.0f}мс" if seconds < 10 else f"{seconds:.0f}с"
+        with self.lock:
+            parts = [f"{name} {histogram.count}× p50 {short(histogram.quantile(0.5))} макс {short(histogram.max)}"
+                     for name, histogram in sorted(self.histograms.items())
+                     if name in ("load_sessions", "persist_session", "report", "update_time")]
+        return " | ".join(parts) or "замеров пока нет"
+
+class Profiler:
+    """Профиль cProfile главного потока и задач фоновых потоков в одном файле.
+
+    cProfile следит только за своим потоком, поэтому задачи фоновых
+    потоков профилируются по отдельности и складываются в общую статистику.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.stats = None
+        self.main = None
+
+    def add(self, profile):
+        import pstats
+        with self.lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+
+    def call(self, func, *args, **kwargs):
+        """Выполнение функции фоновой задачи под профилировщиком.
+
+        С Python 3.12 профилировщик в процессе может быть включен только
+        один, и профиль главного потока уже видит вызовы всех потоков -
+        тогда задача выполняется без отдельного профиля.
+        """
+        import cProfile
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            self.add(profile)
+
+    def start(self):
+        import cProfile
+        self.main = cProfile.Profile()
+        self.main.enable()
+
+    def stop(self):
+        """Остановка профиля главного потока и запись общего файла"""
+        self.main.disable()
+        self.add(self.main)
+        with self.lock:
+            self.stats.dump_stats(self.path)
+
+METRICS = Metrics(enabled=bool(os.environ.get(METRICS_ENV)))
+PROFILER = Profiler(os.environ[PROFILE_ENV]) if os.environ.get(PROFILE_ENV) else None
+
+class TaskCancelled(Exception):
+    """Фоновая задача отменена пользователем"""
+
+# Фоновая задача с прогрессом и отменой
+class BackgroundTask:
+    def __init__(self, func, args, kwargs, on_done, on_error):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.on_done = on_done
+        self.on_error = on_error
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.finished = False
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def report_progress(self, fraction):
+        """Вызывается из задачи: обновляет прогресс и прерывает ее при отмене"""
+        self.progress = fraction
+        if self.cancelled.is_set():
+            raise TaskCancelled()
+
+    def run(self):
+        try:
+            if PROFILER is None:
+                self.result = self.func(*self.args, **self.kwargs)
+            else:
+                self.result = PROFILER.call(self.func, *self.args, **self.kwargs)
+        except Exception as e:
+            self.error = e
+        self.finished = True
+
+# Поток, выполняющий задачи по одной в порядке поступления
+class BackgroundWorker:
+    """Фоновый исполнитель задач для Tk-приложения.
+
+    Задачи выполняются в отдельном потоке, а обработчики on_done/on_error
+    вызываются из dispatch, который приложение опрашивает через after,
+    поэтому они всегда работают в главном потоке Tk.
+    """
+
+    def __init__(self, name):
+        self.tasks = queue.Queue()
+        self.finished = queue.Queue()
+        self.pending = 0
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, func, *args, on_done=None, on_error=None, with_progress=False, **kwargs):
+        """Ставит задачу в очередь; with_progress передает в нее progress=task.report_progress"""
+        task = BackgroundTask(func, args, kwargs, on_done, on_error)
+        if with_progress:
+            kwargs["progress"] = task.report_progress
+        self.pending += 1
+        self.tasks.put(task)
+        return task
+
+    def _run(self):
+        while True:
+            task = self.tasks.get()
+            task.run()
+            self.finished.put(task)
+            self.tasks.task_done()
+
+    def dispatch(self):
+        """Вызов обработчиков завершенных задач; возвращает True, если задачи еще есть"""
+        while True:
+            try:
+                task = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            if task.error is None:
+                if task.on_done:
+                    task.on_done(task.result)
+            elif task.on_error:
+                task.on_error(task.error)
+        return self.pending > 0
+
+    def wait_idle(self):
+        """Ожидание выполнения всех поставленных задач"""
+        self.tasks.join()
+
+def persist_session(storage, session, segments=None):
+    """Запись одной сессии и, при необходимости, сворачивание журнала"""
+    storage.append(session, segments)
+    if storage.needs_compaction():
+        storage.compact()
+
+# Таймер сессии на монотонных часах
+class TimerEngine:
+    """Отсчет длительности сессии по time.monotonic_ns().
+
+    Перевод системных часов (NTP, переход на летнее время) не влияет на
+    длительность. Границы отрезков работы (старт, пауза, возобновление)
+    хранятся в array('q') как смещения в наносекундах от начала сессии;
+    настенное время фиксируется только в начале и в конце сессии, а
+    настенные границы отрезков выводятся из смещений.
+    """
+
+    def __init__(self, clock=time.monotonic_ns, wall_clock=datetime.now):
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.reset()
+
+    def reset(self):
+        self.started_at = None
+        self.origin = None
+        self.origin_wall = None
+        self.boundaries = array('q')
+        self.accumulated_ns = 0
+        self.restored_segments = []
+
+    @property
+    def has_session(self):
+        return self.started_at is not None
+
+    @property
+    def is_running(self):
+        # Нечетное число границ - последний отрезок еще открыт
+        return len(self.boundaries) % 2 == 1
+
+    def start(self):
+        """Начало новой сессии или возобновление приостановленной"""
+        if self.is_running:
+            return
+        now = self.clock()
+        if not self.has_session:
+            self.started_at = self.origin_wall = self.wall_clock()
+            self.origin = now
+        self.boundaries.append(now - self.origin)
+
+    def pause(self):
+        if not self.is_running:
+            return
+        offset = self.clock() - self.origin
+        self.accumulated_ns += offset - self.boundaries[-1]
+        self.boundaries.append(offset)
+
+    def elapsed_ns(self):
+        if not self.has_session:
+            return 0
+        if self.is_running:
+            return self.accumulated_ns + (self.clock() - self.origin) - self.boundaries[-1]
+        return self.accumulated_ns
+
+    def elapsed(self):
+        """Длительность сессии в секундах"""
+        return self.elapsed_ns() / 1e9
+
+    def next_tick_delay(self):
+        """Миллисекунды до следующей целой секунды длительности, чтобы показ не дрейфовал"""
+        if not self.is_running:
+            return 1000
+        return 1000 - (self.elapsed_ns() // 1_000_000) % 1000
+
+    def segments(self):
+        """Отрезки работы в виде пар datetime; открытый отрезок заканчивается сейчас"""
+        offsets = list(self.boundaries)
+        if self.is_running:
+            offsets.append(self.clock() - self.origin)
+        wall = [self.origin_wall + timedelta(microseconds=offset // 1000) for offset in offsets]
+        return self.restored_segments + list(zip(wall[::2], wall[1::2]))
+
+    def restore(self, started_at, elapsed, segments=None):
+        """Восстановление приостановленной сессии с уже отработанным временем (секунды)"""
+        self.reset()
+        self.started_at = started_at
+        self.origin = self.clock()
+        self.origin_wall = self.wall_clock()
+        self.accumulated_ns = int(elapsed * 1e9)
+        self.restored_segments = list(segments or [])
+
+    def finish(self):
+        """Завершение сессии: ((начало, окончание, длительность в секундах), отрезки работы)"""
+        self.pause()
+        segments = self.segments()
+        session = (self.started_at, self.wall_clock(), self.accumulated_ns / 1e9)
+        self.reset()
+        return session, segments
+
+# Снимок состояния таймера на диске
+class TimerCheckpoint:
+    """Состояние незавершенной сессии в небольшом JSON-файле.
+
+    Запись атомарная: временный файл, fsync, затем переименование, поэтому
+    после сбоя на диске остается либо старый, либо новый снимок целиком.
+    Плановые записи из цикла обновления ограничены по частоте интервалом.
+    """
+
+    def __init__(self, path, interval=CHECKPOINT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.last_write = None
+
+    def due(self):
+        """Прошел ли интервал с последней записи"""
+        return self.last_write is None or time.monotonic() - self.last_write >= self.interval
+
+    def write(self, state, force=False):
+        """Запись состояния; без force пропускается, если интервал еще не прошел"""
+        if not force and not self.due():
+            return False
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.last_write = time.monotonic()
+        return True
+
+    def read(self):
+        """Сохраненное состояние или None, если снимка нет или он поврежден"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return state if isinstance(state, dict) else None
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.last_write = None
+
+# Размер кэша форматированных длительностей: покрывает все времена суток
+FORMAT_TIME_CACHE_SIZE = 1 << 17
+
+@lru_cache(maxsize=FORMAT_TIME_CACHE_SIZE)
+def _format_whole_seconds(seconds):
+    hours = seconds // 3600
+    minutes = (seconds % 3600) // 60
+    seconds = seconds % 60
+    return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+def format_time(seconds):
+    """Форматирование секунд в ЧЧ:ММ:СС"""
+    return _format_whole_seconds(int(seconds))
+
+def format_clock(timestamp):
+    """Время суток ЧЧ:ММ:СС для секунд от EPOCH без создания datetime"""
+    return _format_whole_seconds(int(timestamp) % 86400)
+
+RUNNING_COLOR = "#006400"  # Темно-зеленый
+IDLE_COLOR = "black"
+
+class ClockView:
+    """Отрисовка часов окна с проверкой изменений.
+
+    Опции виджета передаются в Tk, только если отличаются от последних
+    выставленных; неизменившиеся значения не стоят ни одного вызова.
+    """
+
+    def __init__(self, session_label, total_label, period_label):
+        self.session_label = session_label
+        self.total_label = total_label
+        self.period_label = period_label
+        self.shown = {}
+        self.updates = 0  # Вызовов config
+        self.skipped = 0  # Пропущенных без изменений
+
+    def set(self, widget, **options):
+        shown = self.shown.setdefault(widget, {})
+        changed = {key: value for key, value in options.items() if shown.get(key) != value}
+        if not changed:
+            self.skipped += 1
+            return False
+        widget.config(**changed)
+        shown.update(changed)
+        self.updates += 1
+        return True
+
+    def render(self, elapsed, total, period, running):
+        self.set(self.session_label, text=format_time(elapsed), fg=RUNNING_COLOR if running else IDLE_COLOR)
+        self.set(self.total_label, text=format_time(total))
+        self.set(self.period_label, text=format_time(period))
+
+def session_to_record(session, segments=None):
+    """Конвертация сессии с datetime в сериализуемую запись.
+
+    Отрезки работы добавляются четвертым элементом, только если сессия
+    прерывалась паузами; записи без него читаются как один отрезок.
+    """
+    start_time, end_time, duration = session
+    record = [start_time.strftime(TIME_FORMAT), end_time.strftime(TIME_FORMAT), duration]
+    if segments and len(segments) > 1:
+        record.append([[begin.strftime(TIME_FORMAT), end.strftime(TIME_FORMAT)] for begin, end in segments])
+    return record
+
+def to_raw_segments(segments):
+    """Отрезки работы из пар datetime в пары секунд от EPOCH"""
+    return [(to_timestamp(begin), to_timestamp(end)) for begin, end in segments] if segments else None
+
+# Колоночное хранение истории сессий
+class SessionColumns:
+    """Сессии в виде массивов начала, окончания (секунды от EPOCH) и длительности.
+
+    Ведет себя как список кортежей (начало, окончание, длительность), но
+    объекты datetime создаются только при обращении к элементу. Сессии
+    всегда упорядочены по началу, а cumulative хранит нарастающий итог
+    длительностей, поэтому выборка за период стоит O(log N + k), а сумма
+    за период - O(log N).
+
+    Отрезки работы между паузами лежат в seg_starts/seg_ends; отрезки
+    сессии i занимают позиции [seg_index[i], seg_index[i + 1]). У сессии
+    без пауз один отрезок, совпадающий с ее началом и окончанием.
+    """
+
+    def __init__(self):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.durations = array('d')
+        self.cumulative = array('d')
+        self.seg_index = array('q', [0])
+        self.seg_starts = array('q')
+        self.seg_ends = array('q')
+
+    @classmethod
+    def from_records(cls, records):
+        """Построение колонок из записей файла без создания datetime"""
+        columns = cls()
+        for record in records:
+            start = parse_timestamp(record[0])
+            end = parse_timestamp(record[1])
+            segments = None
+            if len(record) > 3:
+                segments = [(parse_timestamp(begin), parse_timestamp(finish)) for begin, finish in record[3]]
+            columns._push(start, end, record[2], segments)
+        columns.sort()
+        return columns
+
+    @classmethod
+    def from_rows(cls, rows, segments_by_start=None):
+        """Построение колонок из строк (начало, окончание, длительность) и отрезков по началу сессии"""
+        columns = cls()
+        segments_by_start = segments_by_start or {}
+        for start, end, duration in rows:
+            columns._push(start, end, duration, segments_by_start.get(start))
+        columns.sort()
+        return columns
+
+    @classmethod
+    def from_keyed_rows(cls, rows, segments_by_key):
+        """Построение колонок из строк (ключ, начало, окончание, длительность) и отрезков по ключу строки.
+
+        Нужно, когда начала сессий могут совпадать: SQLite связывает отрезки с id сессии.
+        """
+        columns = cls()
+        for key, start, end, duration in rows:
+            columns._push(start, end, duration, segments_by_key.get(key))
+        columns.sort()
+        return columns
+
+    def _push(self, start, end, duration, segments):
+        """Добавление в конец без поддержки порядка и нарастающего итога"""
+        self.starts.append(start)
+        self.ends.append(end)
+        self.durations.append(duration)
+        for begin, finish in segments or ((start, end),):
+            self.seg_starts.append(begin)
+            self.seg_ends.append(finish)
+        self.seg_index.append(len(self.seg_starts))
+
+    def sort(self):
+        """Упорядочивание по началу (если нужно) и пересчет нарастающего итога"""
+        starts = self.starts
+        if any(starts[i] > starts[i + 1] for i in range(len(starts) - 1)):
+            order = sorted(range(len(starts)), key=starts.__getitem__)
+            source = self.copy()
+            self.__init__()
+            for i in order:
+                first, last = source.seg_index[i], source.seg_index[i + 1]
+                self._push(source.starts[i], source.ends[i], source.durations[i],
+                           zip(source.seg_starts[first:last], source.seg_ends[first:last]))
+        self._rebuild_cumulative(0)
+
+    def _rebuild_cumulative(self, first):
+        """Пересчет нарастающего итога начиная с позиции first"""
+        del self.cumulative[first:]
+        running = self.cumulative[-1] if self.cumulative else 0.0
+        for duration in self.durations[first:]:
+            running += duration
+            self.cumulative.append(running)
+
+    def __len__(self):
+        return len(self.durations)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return (to_datetime(self.starts[index]), to_datetime(self.ends[index]), self.durations[index])
+
+    def __iter__(self):
+        for start, end, duration in zip(self.starts, self.ends, self.durations):
+            yield (to_datetime(start), to_datetime(end), duration)
+
+    def append(self, session, segments=None):
+        """Добавление сессии; segments - пары datetime отрезков работы"""
+        start_time, end_time, duration = session
+        self.append_raw(to_timestamp(start_time), to_timestamp(end_time), duration, to_raw_segments(segments))
+
+    def append_raw(self, start, end, duration, segments=None):
+        if not self.starts or start >= self.starts[-1]:
+            self._push(start, end, duration, segments)
+            self.cumulative.append((self.cumulative[-1] if self.cumulative else 0.0) + duration)
+            return
+        # Сессия из прошлого вставляется на свое место по началу
+        position = bisect_left(self.starts, start)
+        segments = list(segments or ((start, end),))
+        seg_position = self.seg_index[position]
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+        self.durations.insert(position, duration)
+        self.seg_starts[seg_position:seg_position] = array('q', (begin for begin, _ in segments))
+        self.seg_ends[seg_position:seg_position] = array('q', (finish for _, finish in segments))
+        self.seg_index.insert(position, seg_position)
+        for i in range(position + 1, len(self.seg_index)):
+            self.seg_index[i] += len(segments)
+        self._rebuild_cumulative(position)
+
+    def segments(self, index):
+        """Отрезки работы сессии в виде пар datetime"""
+        first, last = self.seg_index[index], self.seg_index[index + 1]
+        return [(to_datetime(begin), to_datetime(finish))
+                for begin, finish in zip(self.seg_starts[first:last], self.seg_ends[first:last])]
+
+    def raw_segments(self, index):
+        """Отрезки работы сессии в секундах от EPOCH"""
+        first, last = self.seg_index[index], self.seg_index[index + 1]
+        return list(zip(self.seg_starts[first:last], self.seg_ends[first:last]))
+
+    def pause_total(self):
+        """Время на паузах: длина всех сессий от начала до конца минус отработанное.
+
+        Считается по длительностям, а не по отрезкам, поэтому верно и для
+        старых записей, у которых отрезков нет.
+        """
+        worked = self.cumulative[-1] if self.cumulative else 0.0
+        return max(0.0, sum(self.ends) - sum(self.starts) - worked)
+
+    def without(self, keys):
+        """Сессии, чьих пар (начало, окончание) нет в keys; новые пары добавляются в keys"""
+        fresh = SessionColumns()
+        for index, key in enumerate(zip(self.starts, self.ends)):
+            if key in keys:
+                continue
+            keys.add(key)
+            fresh._push(key[0], key[1], self.durations[index], self.raw_segments(index))
+        fresh._rebuild_cumulative(0)
+        return fresh
+
+    def index_range(self, date_from=None, date_to=None):
+        """Индексы [first, last) сессий, начавшихся в [date_from, date_to)"""
+        first = bisect_left(self.starts, to_timestamp(date_from)) if date_from else 0
+        last = bisect_left(self.starts, to_timestamp(date_to)) if date_to else len(self.starts)
+        return first, max(first, last)
+
+    def select(self, date_from=None, date_to=None):
+        """Сессии, начавшиеся в интервале [date_from, date_to); границы необязательны"""
+        first, last = self.index_range(date_from, date_to)
+        return self.take(first, last)
+
+    def take(self, first, last):
+        """Сессии с индексами [first, last) в новых колонках"""
+        columns = SessionColumns()
+        columns.starts = self.starts[first:last]
+        columns.ends = self.ends[first:last]
+        columns.durations = self.durations[first:last]
+        seg_first, seg_last = self.seg_index[first], self.seg_index[last]
+        columns.seg_index = array('q', (position - seg_first for position in self.seg_index[first:last + 1]))
+        columns.seg_starts = self.seg_starts[seg_first:seg_last]
+        columns.seg_ends = self.seg_ends[seg_first:seg_last]
+        columns._rebuild_cumulative(0)
+        return columns
+
+    def period_total(self, date_from=None, date_to=None):
+        """Суммарная длительность сессий за период по нарастающему итогу"""
+        first, last = self.index_range(date_from, date_to)
+        if first == last:
+            return 0
+        return self.cumulative[last - 1] - (self.cumulative[first - 1] if first else 0.0)
+
+    def copy(self):
+        """Независимая копия колонок"""
+        columns = SessionColumns()
+        columns.starts = self.starts[:]
+        columns.ends = self.ends[:]
+        columns.durations = self.durations[:]
+        columns.cumulative = self.cumulative[:]
+        columns.seg_index = self.seg_index[:]
+        columns.seg_starts = self.seg_starts[:]
+        columns.seg_ends = self.seg_ends[:]
+        return columns
+
+    def extend(self, other):
+        """Добавление всех сессий other; начавшиеся не раньше последней дописываются без вставок"""
+        if self.starts and other.starts and other.starts[0] < self.starts[-1]:
+            for index in range(len(other)):
+                self.append_raw(other.starts[index], other.ends[index], other.durations[index],
+                                other.raw_segments(index))
+            return
+        first = len(self.durations)
+        offset = self.seg_index[-1]
+        self.starts.extend(other.starts)
+        self.ends.extend(other.ends)
+        self.durations.extend(other.durations)
+        self.seg_index.extend(position + offset for position in other.seg_index[1:])
+        self.seg_starts.extend(other.seg_starts)
+        self.seg_ends.extend(other.seg_ends)
+        self._rebuild_cumulative(first)
+
+    def iter_paused(self):
+        """Сессии с паузами: (начало сессии, список отрезков в секундах от EPOCH)"""
+        seg_index = self.seg_index
+        for i, start in enumerate(self.starts):
+            if seg_index[i + 1] - seg_index[i] > 1:
+                yield start, self.raw_segments(i)
+
+    def to_records(self):
+        """Записи для сохранения в файл"""
+        records = []
+        seg_index = self.seg_index
+        for i, (start, end, duration) in enumerate(zip(self.starts, self.ends, self.durations)):
+            record = [format_timestamp(start), format_timestamp(end), duration]
+            if seg_index[i + 1] - seg_index[i] > 1:
+                record.append([[format_timestamp(begin), format_timestamp(finish)]
+                               for begin, finish in self.raw_segments(i)])
+            records.append(record)
+        return records
+
+def sanitize_filename(name):
+    """Очищает имя файла от недопустимых символов"""
+    valid_chars = "-_.() %s%s" % (ascii_letters, digits)
+    cleaned_name = unicodedata.normalize('NFKD', name).encode('ASCII', 'ignore').decode('utf-8')
+    return ''.join(c for c in cleaned_name if c in valid_chars)
+
+# Рекомендательная блокировка файлов сессий между процессами
+class FileLock:
+    """Эксклюзивная блокировка на файле-замке рядом с данными.
+
+    Защищает дописывание и перезапись истории от других процессов (два
+    окна или общий сетевой диск). Повторный захват тем же потоком не блокирует,
+    поэтому методы хранилища могут вызывать друг друга под замком.
+    Ожидание ограничено timeout, после чего выбрасывается TimeoutError.
+    Время удержания накапливается в holds, hold_total и hold_max.
+    """
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self.file = None
+        self.depth = 0
+        self.thread_lock = threading.RLock()
+        self.acquired_at = None
+        self.holds = 0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+
+    def _try_lock(self):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_NBLCK, 1)
+
+    def acquire(self):
+        self.thread_lock.acquire()
+        if self.depth == 0:
+            try:
+                self.file = open(self.path, 'a+b')
+                deadline = time.monotonic() + self.timeout
+                while True:
+                    try:
+                        self._try_lock()
+                        break
+                    except OSError:
+                        if time.monotonic() >= deadline:
+                            raise TimeoutError(f"Файл {self.path} занят другим процессом")
+                        time.sleep(0.002)
+                self.acquired_at = time.perf_counter()
+            except BaseException:
+                if self.file is not None:
+                    self.file.close()
+                    self.file = None
+                self.thread_lock.release()
+                raise
+        self.depth += 1
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            held = time.perf_counter() - self.acquired_at
+            self.holds += 1
+            self.hold_total += held
+            self.hold_max = max(self.hold_max, held)
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+            self.file.close()
+            self.file = None
+        self.thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+class _NoLock:
+    """Заглушка для хранилищ с собственными блокировками (SQLite)"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+NO_LOCK = _NoLock()
+
+# Базовый класс хранилища сессий
+class SessionStorage:
+    """Хранилище истории сессий одного сотрудника.
+
+    load возвращает SessionColumns, append дописывает одну завершенную
+    сессию (с отрезками работы, если были паузы), save полностью
+    перезаписывает историю.
+    """
+
+    def load(self):
+        raise NotImplementedError
+
+    def append(self, session, segments=None):
+        raise NotImplementedError
+
+    def append_many(self, sessions):
+        """Дописывание пачки сессий (SessionColumns); хранилища переопределяют одной записью"""
+        for index in range(len(sessions)):
+            self.append(sessions[index], sessions.segments(index))
+
+    def remove(self, sessions):
+        """Удаление сессий с парами (начало, окончание) из sessions; остальные не затрагиваются.
+
+        По умолчанию - чтение и перезапись под замком; SQLite удаляет строки запросом.
+        """
+        with self.locked():
+            self.save(self.load().without(set(zip(sessions.starts, sessions.ends))))
+
+    def locked(self):
+        """Блокировка хранилища между процессами; файловые хранилища возвращают FileLock"""
+        return NO_LOCK
+
+    def save(self, sessions):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def needs_compaction(self):
+        return False
+
+    def compact(self):
+        """Сворачивание накопленных дописываний; по умолчанию не требуется"""
+
+    def close(self):
+        """Освобождение соединения с базой; файловым хранилищам не требуется"""
+
+# Хранилище сессий: JSON-снимок + журнал добавлений
+class SessionJournal(SessionStorage):
+    """Снимок sessions_<сотрудник>.json и журнал .journal с одной записью на строку.
+
+    Завершение сессии дописывает одну строку в журнал, поэтому стоимость
+    записи не зависит от размера истории. Когда журнал разрастается, он
+    сворачивается в снимок (compact). Старые файлы с JSON-массивом читаются
+    как снимок без журнала, так что миграция не требуется.
+
+    Чтение и запись идут под FileLock на файле .lock, поэтому несколько
+    процессов могут записывать сессии одного сотрудника одновременно:
+    дописывания не теряются при сворачивании журнала другим процессом.
+    """
+
+    def __init__(self, snapshot_path, fsync=True):
+        self.snapshot_path = snapshot_path
+        self.journal_path = os.path.splitext(snapshot_path)[0] + ".journal"
+        self.lock = FileLock(os.path.splitext(snapshot_path)[0] + ".lock")
+        self.fsync = fsync
+        self.journal_records = 0
+
+    def locked(self):
+        return self.lock
+
+    def load(self):
+        with self.lock:
+            records = self.read_records()
+        return SessionColumns.from_records(records)
+
+    def read_records(self):
+        """Чтение всех записей: снимок, затем непримененные строки журнала"""
+        records = []
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+
+        journal = []
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        journal.append(json.loads(line))
+                    except ValueError:
+                        # Оборванная последняя строка после аварийного завершения
+                        break
+
+        if journal:
+            # Если процесс упал между записью снимка и очисткой журнала,
+            # записи журнала уже есть в снимке - пропускаем их. Снимок
+            # упорядочен по началу, поэтому они не обязательно в его хвосте.
+            pending = {tuple(r[:2]) for r in journal}
+            applied = {key for key in (tuple(r[:2]) for r in records) if key in pending}
+            records.extend(r for r in journal if tuple(r[:2]) not in applied)
+        self.journal_records = len(journal)
+        return records
+
+    def append(self, session, segments=None):
+        """Дописывает одну запись в журнал"""
+        line = json.dumps(session_to_record(session, segments), ensure_ascii=False) + "\n"
+        with self.lock, open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(line)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        self.journal_records += 1
+
+    def append_many(self, sessions):
+        """Дописывает пачку записей в журнал одной записью и одним fsync"""
+        lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in sessions.to_records())
+        with self.lock, open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        self.journal_records += len(sessions)
+
+    def needs_compaction(self):
+        return self.journal_records >= JOURNAL_COMPACT_THRESHOLD
+
+    def save(self, sessions):
+        self.write_snapshot(sessions.to_records())
+
+    def compact(self):
+        """Сворачивает журнал в снимок по данным на диске"""
+        with self.lock:
+            self.write_snapshot(self.read_records())
+
+    def write_snapshot(self, records):
+        """Атомарно записывает полный снимок и очищает журнал"""
+        with self.lock:
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(records, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+        self.journal_records = 0
+
+    def clear(self):
+        """Удаляет снимок и журнал"""
+        with self.lock:
+            for path in (self.snapshot_path, self.journal_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        self.journal_records = 0
+
+    def mark_migrated(self):
+        """Переименовывает файлы после переноса в другое хранилище, чтобы не конвертировать их повторно"""
+        with self.lock:
+            for path in (self.snapshot_path, self.journal_path):
+                if os.path.exists(path):
+                    os.replace(path, path + ".migrated")
+
+# Двоичное хранилище сессий с чтением через mmap
+class BinarySessionStorage(SessionStorage):
+    """Файл sessions_<сотрудник>.bin: заголовок BINARY_MAGIC и записи BINARY_RECORD.
+
+    Записи идут в порядке начала сессии, поэтому выборка за период (slice)
+    находится двоичным поиском прямо по отображенному в память файлу.
+    """
+
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.segments_path = os.path.splitext(path)[0] + ".seg"
+        self.lock = FileLock(os.path.splitext(path)[0] + ".lock")
+        self.fsync = fsync
+
+    def locked(self):
+        return self.lock
+
+    def is_empty(self):
+        return not os.path.exists(self.path) or os.path.getsize(self.path) <= len(BINARY_MAGIC)
+
+    def _read_segments(self, date_from=None, date_to=None):
+        """Отрезки сессий с паузами по началу сессии; файл .seg небольшой и читается целиком"""
+        segments = {}
+        if not os.path.exists(self.segments_path):
+            return segments
+        with open(self.segments_path, 'rb') as f:
+            data = f.read()
+        if data[:len(SEGMENTS_MAGIC)] != SEGMENTS_MAGIC:
+            raise ValueError(f"Неизвестный формат файла {self.segments_path}")
+        low = to_timestamp(date_from) if date_from else None
+        high = to_timestamp(date_to) if date_to else None
+        size = len(data) - (len(data) - len(SEGMENTS_MAGIC)) % SEGMENT_RECORD.size
+        for start, begin, finish in SEGMENT_RECORD.iter_unpack(memoryview(data)[len(SEGMENTS_MAGIC):size]):
+            if (low is None or start >= low) and (high is None or start < high):
+                segments.setdefault(start, []).append((begin, finish))
+        return segments
+
+    def _open_map(self):
+        """Отображение файла в память или None для пустого хранилища"""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) <= len(BINARY_MAGIC):
+            return None
+        import mmap
+        with open(self.path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mapped[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+            mapped.close()
+            raise ValueError(f"Неизвестный формат файла {self.path}")
+        return mapped
+
+    def _count(self, mapped):
+        return (len(mapped) - len(BINARY_MAGIC)) // BINARY_RECORD.size
+
+    def _records(self, mapped, first=0, last=None):
+        """Итератор по записям [first, last) отображенного файла"""
+        count = self._count(mapped)
+        last = count if last is None else min(last, count)
+        begin = len(BINARY_MAGIC) + first * BINARY_RECORD.size
+        end = len(BINARY_MAGIC) + last * BINARY_RECORD.size
+        with memoryview(mapped) as view:
+            yield from BINARY_RECORD.iter_unpack(view[begin:end])
+
+    def _bisect(self, mapped, timestamp):
+        """Индекс первой записи с началом не раньше timestamp"""
+        low, high = 0, self._count(mapped)
+        while low < high:
+            middle = (low + high) // 2
+            start = BINARY_RECORD.unpack_from(mapped, len(BINARY_MAGIC) + middle * BINARY_RECORD.size)[0]
+            if start < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def load(self):
+        mapped = self._open_map()
+        if mapped is None:
+            return SessionColumns()
+        with mapped:
+            return SessionColumns.from_rows(self._records(mapped), self._read_segments())
+
+    def slice(self, date_from, date_to):
+        """Сессии, начавшиеся в интервале [date_from, date_to)"""
+        mapped = self._open_map()
+        if mapped is None:
+            return SessionColumns()
+        with mapped:
+            first = self._bisect(mapped, to_timestamp(date_from))
+            last = self._bisect(mapped, to_timestamp(date_to))
+            return SessionColumns.from_rows(self._records(mapped, first, last),
+                                            self._read_segments(date_from, date_to))
+
+    def _append_bytes(self, path, magic, data):
+        with open(path, 'ab') as f:
+            if f.tell() == 0:
+                f.write(magic)
+            f.write(data)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def append(self, session, segments=None):
+        sessions = SessionColumns()
+        sessions.append(session, segments)
+        self.append_many(sessions)
+
+    def append_many(self, sessions):
+        """Дописывание пачки; если она начинается раньше последней записи, файл перезаписывается с сортировкой.
+
+        Проверка порядка и запись идут под замком: другой процесс может
+        дописать более позднюю сессию между ними.
+        """
+        if not sessions:
+            return
+        with self.lock:
+            self._append_sorted(sessions)
+
+    def _append_sorted(self, sessions):
+        mapped = self._open_map()
+        if mapped is not None:
+            with mapped:
+                count = self._count(mapped)
+                last_start = BINARY_RECORD.unpack_from(
+                    mapped, len(BINARY_MAGIC) + (count - 1) * BINARY_RECORD.size)[0] if count else None
+            if last_start is not None and sessions.starts[0] < last_start:
+                merged = self.load()
+                for index in range(len(sessions)):
+                    merged.append_raw(sessions.starts[index], sessions.ends[index], sessions.durations[index],
+                                      sessions.raw_segments(index))
+                self._write_all(merged)
+                return
+        # Отрезки пишутся первыми: без записи сессии они просто не будут прочитаны
+        paused = b"".join(SEGMENT_RECORD.pack(start, begin, finish)
+                          for start, segments in sessions.iter_paused() for begin, finish in segments)
+        if paused:
+            self._append_bytes(self.segments_path, SEGMENTS_MAGIC, paused)
+        self._append_bytes(self.path, BINARY_MAGIC, b"".join(
+            BINARY_RECORD.pack(start, end, duration)
+            for start, end, duration in zip(sessions.starts, sessions.ends, sessions.durations)
+        ))
+
+    def save(self, sessions):
+        """Атомарная перезапись файла целиком"""
+        with self.lock:
+            self._write_all(sessions)
+
+    def _write_all(self, sessions):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(BINARY_MAGIC)
+            pack = BINARY_RECORD.pack
+            f.writelines(
+                pack(start, end, duration)
+                for start, end, duration in zip(sessions.starts, sessions.ends, sessions.durations)
+            )
+            f.flush()
+            os.fsync(f.fileno())
+
+        segments_tmp_path = self.segments_path + ".tmp"
+        with open(segments_tmp_path, 'wb') as f:
+            f.write(SEGMENTS_MAGIC)
+            for start, segments in sessions.iter_paused():
+                f.writelines(SEGMENT_RECORD.pack(start, begin, finish) for begin, finish in segments)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(segments_tmp_path, self.segments_path)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        with self.lock:
+            for path in (self.path, self.segments_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+# Хранилище сессий всех сотрудников в одной базе SQLite
+class SqliteSessionStorage(SessionStorage):
+    """Сессии сотрудника в таблице sessions общей базы.
+
+    Записи различаются по компании, сотруднику и должности в исходном
+    написании, поэтому имена на кириллице не смешиваются, как это бывает
+    с файлами после sanitize_filename.
+    """
+
+    def __init__(self, db_path, company, employee, position):
+        self.db_path = db_path
+        self.company = company
+        self.employee = employee
+        self.position = position
+        import sqlite3
+        # Соединение используется и фоновым потоком записи; задачи выполняются строго по очереди
+        # SQLite блокирует базу сам; timeout - ожидание записи другого процесса
+        created = not os.path.exists(db_path)
+        self.connection = sqlite3.connect(db_path, timeout=LOCK_TIMEOUT, check_same_thread=False)
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        # Схема и режим WAL хранятся в файле базы: процесс проверяет их один раз
+        if created or db_path not in SQLITE_SCHEMA_READY:
+            self._create_schema()
+            SQLITE_SCHEMA_READY.add(db_path)
+
+    def _create_schema(self):
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " id INTEGER PRIMARY KEY,"
+                " company TEXT NOT NULL,"
+                " employee TEXT NOT NULL,"
+                " position TEXT NOT NULL,"
+                " start_time INTEGER NOT NULL,"
+                " end_time INTEGER NOT NULL,"
+                " duration REAL NOT NULL)"
+            )
+            # Все запросы отбирают по компании и сотруднику, затем по началу сессии
+            self.connection.execute("DROP INDEX IF EXISTS sessions_employee_start")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_company_employee_start"
+                " ON sessions (company, employee, start_time)"
+            )
+            # Отрезки работы хранятся только для сессий с паузами
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                " session_id INTEGER NOT NULL REFERENCES sessions (id),"
+                " start_time INTEGER NOT NULL,"
+                " end_time INTEGER NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS segments_session ON segments (session_id)"
+            )
+
+    def _query(self, sql, params=()):
+        return self.connection.execute(
+            sql,
+            (self.employee, self.company) + tuple(params)
+        )
+
+    def is_empty(self):
+        row = self._query("SELECT 1 FROM sessions WHERE employee = ? AND company = ? LIMIT 1").fetchone()
+        return row is None
+
+    def _segments(self, condition="", params=()):
+        """Отрезки сессий сотрудника по id сессии"""
+        segments = {}
+        rows = self._query(
+            "SELECT g.session_id, g.start_time, g.end_time FROM segments g"
+            " JOIN sessions s ON s.id = g.session_id"
+            " WHERE s.employee = ? AND s.company = ?" + condition +
+            " ORDER BY g.session_id, g.start_time",
+            params
+        )
+        for session_id, begin, finish in rows:
+            segments.setdefault(session_id, []).append((begin, finish))
+        return segments
+
+    def load(self):
+        rows = self._query(
+            "SELECT id, start_time, end_time, duration FROM sessions"
+            " WHERE employee = ? AND company = ? ORDER BY start_time"
+        )
+        return SessionColumns.from_keyed_rows(rows.fetchall(), self._segments())
+
+    def slice(self, date_from, date_to):
+        """Сессии, начавшиеся в интервале [date_from, date_to)"""
+        bounds = (to_timestamp(date_from), to_timestamp(date_to))
+        rows = self._query(
+            "SELECT id, start_time, end_time, duration FROM sessions"
+            " WHERE employee = ? AND company = ? AND start_time >= ? AND start_time < ?"
+            " ORDER BY start_time",
+            bounds
+        )
+        return SessionColumns.from_keyed_rows(
+            rows.fetchall(),
+            self._segments(" AND s.start_time >= ? AND s.start_time < ?", bounds)
+        )
+
+    def append(self, session, segments=None):
+        start_time, end_time, duration = session
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO sessions (company, employee, position, start_time, end_time, duration)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (self.company, self.employee, self.position,
+                 to_timestamp(start_time), to_timestamp(end_time), duration)
+            )
+            if segments and len(segments) > 1:
+                self.connection.executemany(
+                    "INSERT INTO segments (session_id, start_time, end_time) VALUES (?, ?, ?)",
+                    ((cursor.lastrowid, begin, finish) for begin, finish in to_raw_segments(segments))
+                )
+
+    def append_many(self, sessions):
+        """Пакетная вставка в одной транзакции"""
+        with self.connection:
+            self._insert_many(sessions)
+
+    def _insert_many(self, sessions):
+        """Вставка пачки в открытой транзакции; сессии с паузами вставляются по одной ради id"""
+        seg_index = sessions.seg_index
+        plain = []
+        for index, (start, end, duration) in enumerate(zip(sessions.starts, sessions.ends, sessions.durations)):
+            row = (self.company, self.employee, self.position, start, end, duration)
+            if seg_index[index + 1] - seg_index[index] == 1:
+                plain.append(row)
+                continue
+            cursor = self.connection.execute(
+                "INSERT INTO sessions (company, employee, position, start_time, end_time, duration)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                row
+            )
+            self.connection.executemany(
+                "INSERT INTO segments (session_id, start_time, end_time) VALUES (?, ?, ?)",
+                ((cursor.lastrowid, begin, finish) for begin, finish in sessions.raw_segments(index))
+            )
+        self.connection.executemany(
+            "INSERT INTO sessions (company, employee, position, start_time, end_time, duration)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            plain
+        )
+
+    def _delete_all(self):
+        self._query(
+            "DELETE FROM segments WHERE session_id IN"
+            " (SELECT id FROM sessions WHERE employee = ? AND company = ?)"
+        )
+        self._query("DELETE FROM sessions WHERE employee = ? AND company = ?")
+
+    def save(self, sessions):
+        """Замена истории сотрудника одной транзакцией с пакетной вставкой"""
+        with self.connection:
+            self._delete_all()
+            self._insert_many(sessions)
+
+    def remove(self, sessions):
+        """Удаление сессий по (начало, окончание) одной транзакцией: дописанные другими процессами остаются"""
+        keys = [(self.employee, self.company, start, end) for start, end in zip(sessions.starts, sessions.ends)]
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM segments WHERE session_id IN (SELECT id FROM sessions"
+                " WHERE employee = ? AND company = ? AND start_time = ? AND end_time = ?)",
+                keys
+            )
+            self.connection.executemany(
+                "DELETE FROM sessions WHERE employee = ? AND company = ? AND start_time = ? AND end_time = ?",
+                keys
+            )
+
+    def clear(self):
+        with self.connection:
+            self._delete_all()
+
+    def close(self):
+        self.connection.close()
+
+def convert_storage(source, target):
+    """Перенос всей истории из одного хранилища в другое"""
+    sessions = source.load()
+    target.save(sessions)
+    return len(sessions)
+
+def open_storage(kind, data_dir, company, employee, position, migrate=True):
+    """Хранилище сессий сотрудника по типу из конфигурации ("json", "binary" или "sqlite").
+
+    При первом переходе на другой формат существующий JSON-файл
+    конвертируется автоматически и помечается как перенесенный. С
+    migrate=False перенос выполняет вызывающий код через migrate_json_history
+    (окно - в фоновом потоке перед загрузкой истории).
+    """
+    base_path = os.path.join(data_dir, f"sessions_{sanitize_filename(employee)}")
+    if kind == "binary":
+        storage = BinarySessionStorage(base_path + ".bin")
+    elif kind == "sqlite":
+        storage = SqliteSessionStorage(os.path.join(data_dir, SQLITE_DB_NAME), company, employee, position)
+    else:
+        return SessionJournal(base_path + ".json")
+    if migrate:
+        migrate_json_history(storage, data_dir, employee)
+    return storage
+
+def migrate_json_history(storage, data_dir, employee):
+    """Перенос JSON-истории сотрудника в пустое хранилище другого формата; True, если перенесена"""
+    if isinstance(storage, SessionJournal):
+        return False
+    json_storage = SessionJournal(os.path.join(data_dir, f"sessions_{sanitize_filename(employee)}.json"))
+    if not (os.path.exists(json_storage.snapshot_path) or os.path.exists(json_storage.journal_path)):
+        return False
+    if not storage.is_empty():
+        return False
+    convert_storage(json_storage, storage)
+    json_storage.mark_migrated()
+    return True
+
+def _little_endian(values):
+    """Байты массива в порядке little-endian независимо от платформы"""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def _read_array(f, typecode, count):
+    values = array(typecode)
+    data = f.read(values.itemsize * count)
+    if len(data) != values.itemsize * count:
+        raise ValueError("Колоночный файл обрезан")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def iter_employee_chunks(config_data, storage_kind, data_dir, chunk_size=EXPORT_CHUNK_SIZE,
+                         company_filter=None, employee_filter=None):
+    """Сессии сотрудников из конфигурации пачками: (компания, сотрудник, должность, SessionColumns).
+
+    В памяти одновременно находится история только одного сотрудника,
+    вместе с архивной.
+    """
+    for company, company_data in config_data["companies"].items():
+        if company_filter and company != company_filter:
+            continue
+        for employee in company_data["employees"]:
+            if employee_filter and employee != employee_filter:
+                continue
+            employee_position = configured_position(company_data, employee)
+            sessions = open_storage(storage_kind, data_dir, company, employee, employee_position).load()
+            sessions = report_sessions(sessions, HistoryArchive(data_dir, company, employee))
+            for first in range(0, len(sessions), chunk_size):
+                yield company, employee, employee_position, sessions.take(first, min(first + chunk_size, len(sessions)))
+
+def write_columnar(path, chunks):
+    """Колоночный экспорт: каждая пачка - группа строк со своими колонками"""
+    rows = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(COLUMNAR_MAGIC)
+        for company, employee, position, sessions in chunks:
+            header = json.dumps({"company": company, "employee": employee, "position": position},
+                                ensure_ascii=False).encode('utf-8')
+            f.write(COLUMNAR_GROUP.pack(len(header), len(sessions), len(sessions.seg_starts)))
+            f.write(header)
+            for values in (sessions.starts, sessions.ends, sessions.durations,
+                           sessions.seg_index, sessions.seg_starts, sessions.seg_ends):
+                f.write(_little_endian(values))
+            rows += len(sessions)
+    os.replace(tmp_path, path)
+    return rows
+
+def read_columnar(path):
+    """Пачки из колоночного файла по одной группе строк"""
+    with open(path, 'rb') as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"Неизвестный формат файла {path}")
+        while True:
+            head = f.read(COLUMNAR_GROUP.size)
+            if not head:
+                return
+            if len(head) != COLUMNAR_GROUP.size:
+                raise ValueError("Колоночный файл обрезан")
+            header_size, rows, segments = COLUMNAR_GROUP.unpack(head)
+            header = json.loads(f.read(header_size).decode('utf-8'))
+            sessions = SessionColumns()
+            sessions.starts = _read_array(f, 'q', rows)
+            sessions.ends = _read_array(f, 'q', rows)
+            sessions.durations = _read_array(f, 'd', rows)
+            sessions.seg_index = _read_array(f, 'q', rows + 1)
+            sessions.seg_starts = _read_array(f, 'q', segments)
+            sessions.seg_ends = _read_array(f, 'q', segments)
+            sessions.sort()
+            yield header["company"], header["employee"], header["position"], sessions
+
+def write_sessions_csv(path, chunks):
+    """Экспорт в CSV: строка на сессию, отрезки - "начало/конец" через "|" для сессий с паузами"""
+    import csv
+    rows = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(EXPORT_CSV_HEADER)
+        for company, employee, position, sessions in chunks:
+            seg_index = sessions.seg_index
+            writer.writerows(
+                (company, employee, position, format_timestamp(start), format_timestamp(end), duration,
+                 "|".join(f"{format_timestamp(begin)}/{format_timestamp(finish)}"
+                          for begin, finish in sessions.raw_segments(index))
+                 if seg_index[index + 1] - seg_index[index] > 1 else "")
+                for index, (start, end, duration) in enumerate(zip(sessions.starts, sessions.ends, sessions.durations))
+            )
+            rows += len(sessions)
+    os.replace(tmp_path, path)
+    return rows
+
+def read_sessions_csv(path, chunk_size=EXPORT_CHUNK_SIZE):
+    """Пачки из CSV: подряд идущие строки одного сотрудника, не больше chunk_size"""
+    import csv
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f, delimiter=';')
+        if next(reader, None) != EXPORT_CSV_HEADER:
+            raise ValueError(f"Неизвестный формат файла {path}")
+        key = None
+        sessions = SessionColumns()
+        for company, employee, position, start, end, duration, segments in reader:
+            if (company, employee, position) != key or len(sessions) >= chunk_size:
+                if sessions:
+                    sessions.sort()
+                    yield (*key, sessions)
+                key = (company, employee, position)
+                sessions = SessionColumns()
+            start = parse_timestamp(start)
+            end = parse_timestamp(end)
+            pairs = None
+            if segments:
+                pairs = [tuple(parse_timestamp(moment) for moment in pair.split("/")) for pair in segments.split("|")]
+            sessions._push(start, end, float(duration), pairs)
+        if sessions:
+            sessions.sort()
+            yield (*key, sessions)
+
+def import_sessions(chunks, storage_kind, data_dir):
+    """Пакетная запись пачек в хранилища с отбрасыванием дублей по (компания, сотрудник, начало, окончание).
+
+    Возвращает (прочитано, записано). Ключи уже записанных сессий
+    загружаются по одному разу на сотрудника.
+    """
+    storages = {}
+    known = {}
+    read = written = 0
+    try:
+        for company, employee, position, sessions in chunks:
+            read += len(sessions)
+            storage = storages.get((company, employee))
+            if storage is None:
+                storage = storages[(company, employee)] = open_storage(storage_kind, data_dir, company, employee, position)
+                existing = report_sessions(storage.load(), HistoryArchive(data_dir, company, employee))
+                known.setdefault((company, employee), set()).update(zip(existing.starts, existing.ends))
+            fresh = sessions.without(known[(company, employee)])
+            if not fresh:
+                continue
+            storage.append_many(fresh)
+            if storage.needs_compaction():
+                storage.compact()
+            written += len(fresh)
+    finally:
+        # У SQLite каждое хранилище держит свое соединение с базой
+        for storage in storages.values():
+            storage.close()
+    return read, written
+
+def detect_export_format(path, requested=None):
+    """Формат файла обмена по ключу --format или расширению"""
+    if requested:
+        return requested
+    return "csv" if path.lower().endswith(".csv") else "columnar"
+
+# Архив старых сессий: в хранилище остается только горячая история
+class DayRollup:
+    """Дневные итоги архивных сессий: номера дней от EPOCH, число сессий и секунды.
+
+    Дни упорядочены, а нарастающие итоги дают сумму за период за O(log N)
+    без чтения самих архивных сессий.
+    """
+
+    def __init__(self, days=None):
+        self.days = array('q')
+        self.counts = array('q')
+        self.seconds = array('d')
+        self.cumulative_counts = array('q')
+        self.cumulative_seconds = array('d')
+        count, seconds = 0, 0.0
+        for day_number in sorted(days or ()):
+            day_count, day_seconds = days[day_number]
+            count += day_count
+            seconds += day_seconds
+            self.days.append(day_number)
+            self.counts.append(day_count)
+            self.seconds.append(day_seconds)
+            self.cumulative_counts.append(count)
+            self.cumulative_seconds.append(seconds)
+
+    def __len__(self):
+        return len(self.days)
+
+    def to_dict(self):
+        """Итоги по номеру дня: [сессий, секунд]"""
+        return {day_number: [count, seconds]
+                for day_number, count, seconds in zip(self.days, self.counts, self.seconds)}
+
+    def day_range(self, date_from=None, date_to=None):
+        """Индексы [first, last) дней периода; границы периодов приходятся на полночь"""
+        first = bisect_left(self.days, to_timestamp(date_from) // 86400) if date_from else 0
+        last = bisect_left(self.days, to_timestamp(date_to) // 86400) if date_to else len(self.days)
+        return first, max(first, last)
+
+    def _period_sum(self, cumulative, date_from, date_to):
+        first, last = self.day_range(date_from, date_to)
+        if first == last:
+            return 0
+        return cumulative[last - 1] - (cumulative[first - 1] if first else 0)
+
+    def period_total(self, date_from=None, date_to=None):
+        """Секунды архивных сессий за период"""
+        return self._period_sum(self.cumulative_seconds, date_from, date_to)
+
+    def period_count(self, date_from=None, date_to=None):
+        """Число архивных сессий за период"""
+        return self._period_sum(self.cumulative_counts, date_from, date_to)
+
+    def first_day(self):
+        return date.fromordinal(EPOCH_ORDINAL + self.days[0])
+
+    def last_day(self):
+        return date.fromordinal(EPOCH_ORDINAL + self.days[-1])
+
+def archive_dirname(name):
+    """Имя папки архива: читаемая ASCII-часть и хеш исходного имени.
+
+    sanitize_filename отбрасывает кириллицу, поэтому без хеша разные
+    сотрудники попали бы в одну папку.
+    """
+    import hashlib
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:12]
+    return f"{sanitize_filename(name).strip() or 'x'}_{digest}"
+
+class HistoryArchive:
+    """Архив сотрудника в archive/<компания>/<сотрудник>: <ГГГГ-ММ>.jsonl.gz и rollup.json.
+
+    Папки называются через archive_dirname, поэтому у разных имен они не совпадают.
+    Перезапись архива идет под файлом-замком <папка сотрудника>.lock рядом с папкой.
+
+    В месячном файле - записи session_to_record по одной на строку в
+    порядке начала, в rollup.json - итоги архива по дням. Итоги маленькие
+    и читаются при каждой загрузке истории, а сами сессии - только когда
+    отчет, статистика или выгрузка запрашивают их месяцы.
+    """
+
+    def __init__(self, data_dir, company, employee):
+        self.root = os.path.join(data_dir, ARCHIVE_DIR)
+        self.path = os.path.join(self.root, archive_dirname(company), archive_dirname(employee))
+        self.rollup_path = os.path.join(self.path, ROLLUP_FILE)
+        self.lock = FileLock(self.path + ".lock")
+
+    def locked(self):
+        """Блокировка архива сотрудника между процессами"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        return self.lock
+
+    def month_path(self, month):
+        return os.path.join(self.path, f"{month[0]:04d}-{month[1]:02d}.jsonl.gz")
+
+    def months(self):
+        """Месяцы (год, месяц), за которые есть файлы, по порядку"""
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            return []
+        matches = (ARCHIVE_MONTH_NAME.fullmatch(name) for name in names)
+        return sorted((int(match[1]), int(match[2])) for match in matches if match)
+
+    def read_rollup(self):
+        """Дневные итоги архива; без архива - пустые"""
+        try:
+            with open(self.rollup_path, 'r', encoding='utf-8') as f:
+                days = json.load(f)
+        except FileNotFoundError:
+            return DayRollup()
+        return DayRollup({int(day_number): totals for day_number, totals in days.items()})
+
+    def read_month(self, month):
+        """Сессии одного месячного файла"""
+        import gzip
+        with gzip.open(self.month_path(month), 'rt', encoding='utf-8') as f:
+            return SessionColumns.from_records(json.loads(line) for line in f if line.strip())
+
+    def load(self, date_from=None, date_to=None):
+        """Архивные сессии, начавшиеся в [date_from, date_to): читаются только файлы месяцев периода"""
+        first = (date_from.year, date_from.month) if date_from else None
+        if date_to:
+            last_moment = date_to - timedelta(seconds=1)
+            last = (last_moment.year, last_moment.month)
+        sessions = SessionColumns()
+        for month in self.months():
+            if (first and month < first) or (date_to and month > last):
+                continue
+            sessions.extend(self.read_month(month).select(date_from, date_to))
+        return sessions
+
+    def add(self, sessions):
+        """Перенос сессий в месячные файлы без дублей; возвращает новые дневные итоги.
+
+        Итоги затронутого месяца пересчитываются по всему его файлу, поэтому
+        сбой между записью месяца и итогов исправляется следующим переносом.
+        """
+        with self.locked():
+            os.makedirs(self.path, exist_ok=True)
+            return self._add(sessions)
+
+    def _add(self, sessions):
+        import gzip
+        rollup = self.read_rollup().to_dict()
+        first = 0
+        while first < len(sessions):
+            moment = to_datetime(sessions.starts[first])
+            month = (moment.year, moment.month)
+            month_start = datetime(moment.year, moment.month, 1)
+            month_end = datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+            last = bisect_left(sessions.starts, to_timestamp(month_end), first)
+            path = self.month_path(month)
+            merged = self.read_month(month) if os.path.exists(path) else SessionColumns()
+            fresh = sessions.take(first, last).without(set(zip(merged.starts, merged.ends)))
+            if fresh:
+                merged.extend(fresh)
+                lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in merged.to_records())
+                self._write(path, gzip.compress(lines.encode("utf-8"), mtime=0))
+            for day_number in range(to_timestamp(month_start) // 86400, to_timestamp(month_end) // 86400):
+                rollup.pop(day_number, None)
+            for start, duration in zip(merged.starts, merged.durations):
+                totals = rollup.setdefault(start // 86400, [0, 0.0])
+                totals[0] += 1
+                totals[1] += duration
+            first = last
+        self._write(self.rollup_path, json.dumps(rollup).encode("utf-8"))
+        return DayRollup(rollup)
+
+    def _write(self, path, data):
+        """Атомарная запись файла архива"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        """Удаление архива сотрудника; корень архива и папки компаний не удаляются"""
+        if os.path.dirname(os.path.dirname(self.path)) != self.root:
+            raise ValueError(f"{self.path}: не папка сотрудника в архиве")
+        if os.path.isdir(self.path):
+            import shutil
+            shutil.rmtree(self.path)
+
+def retention_cutoff(config_data, today=None):
+    """Полночь, раньше которой сессии уходят в архив, по retention_days; None - архивация выключена"""
+    days = config_data.get("retention_days")
+    if days is None:
+        return None
+    return datetime.combine((today or date.today()) - timedelta(days=days), datetime.min.time())
+
+def load_history(storage, archive, before=None):
+    """Загрузка истории с переносом в архив сессий, начатых раньше before.
+
+    Возвращает (сессии хранилища, дневные итоги архива). Архив пишется до
+    удаления сессий из хранилища: после сбоя между этими шагами сессии
+    окажутся в обоих местах, а повторный перенос не создаст дублей. Оба
+    шага идут под замком архива: у SQLite нет замка хранилища, и без него
+    два процесса переписывали бы месячный файл одновременно.
+    """
+    with storage.locked():
+        sessions = storage.load()
+        split = bisect_left(sessions.starts, to_timestamp(before)) if before else 0
+        if not split:
+            return sessions, archive.read_rollup()
+        old = sessions.take(0, split)
+        with archive.locked():
+            rollup = archive.add(old)
+            storage.remove(old)
+    return sessions.take(split, len(sessions)), rollup
+
+def clear_history(storage, archive):
+    """Удаление всей истории сотрудника: хранилища и архива"""
+    with storage.locked(), archive.locked():
+        storage.clear()
+        archive.clear()
+
+def report_sessions(sessions, archive=None, date_from=None, date_to=None):
+    """Сессии хранилища за период (sessions) вместе с архивными за тот же период"""
+    if archive is None:
+        return sessions
+    archived = archive.load(date_from, date_to)
+    if not archived:
+        return sessions
+    archived.extend(sessions)
+    return archived
+
+# Агрегаты по сессиям, обновляемые инкрементально
+class SessionTotals:
+    """Суммарное время: всего, по дням, по неделям и по месяцам"""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.total = 0
+        self.count = 0
+        self.by_day = {}
+        self.by_week = {}
+        self.by_month = {}
+
+    def add(self, session):
+        """Учет одной сессии за O(1)"""
+        start_time, _, duration = session
+        self.add_raw(to_timestamp(start_time), duration)
+
+    def add_raw(self, start, duration):
+        """Учет сессии по началу в секундах от EPOCH"""
+        day = date.fromordinal(EPOCH_ORDINAL + start // 86400)
+        year, week, _ = day.isocalendar()
+        self.total += duration
+        self.count += 1
+        self.by_day[day] = self.by_day.get(day, 0) + duration
+        self.by_week[(year, week)] = self.by_week.get((year, week), 0) + duration
+        self.by_month[(day.year, day.month)] = self.by_month.get((day.year, day.month), 0) + duration
+
+    def rebuild(self, sessions):
+        """Полный пересчет по колонкам сессий"""
+        self.clear()
+        # Сначала суммируем по дням, затем переносим дневные суммы в недели и месяцы
+        by_day_number = {}
+        for start, duration in zip(sessions.starts, sessions.durations):
+            day_number = start // 86400
+            by_day_number[day_number] = by_day_number.get(day_number, 0) + duration
+        for day_number, duration in by_day_number.items():
+            day = date.fromordinal(EPOCH_ORDINAL + day_number)
+            year, week, _ = day.isocalendar()
+            self.by_day[day] = duration
+            self.by_week[(year, week)] = self.by_week.get((year, week), 0) + duration
+            self.by_month[(day.year, day.month)] = self.by_month.get((day.year, day.month), 0) + duration
+        self.total = sum(sessions.durations)
+        self.count = len(sessions)
+
+    def add_rollup(self, rollup):
+        """Учет дневных итогов архива (DayRollup) без чтения архивных сессий"""
+        for day_number, count, seconds in zip(rollup.days, rollup.counts, rollup.seconds):
+            day = date.fromordinal(EPOCH_ORDINAL + day_number)
+            year, week, _ = day.isocalendar()
+            self.total += seconds
+            self.count += count
+            self.by_day[day] = self.by_day.get(day, 0) + seconds
+            self.by_week[(year, week)] = self.by_week.get((year, week), 0) + seconds
+            self.by_month[(day.year, day.month)] = self.by_month.get((day.year, day.month), 0) + seconds
+
+def daily_norm_seconds(config_data):
+    """Дневная норма из конфигурации в секундах"""
+    return float(config_data.get("daily_norm_hours", DAILY_NORM_HOURS)) * 3600
+
+def configured_position(company_data, employee):
+    """Должность сотрудника для пакетных команд: из employee_positions или первая должность компании"""
+    return company_data.get("employee_positions", {}).get(employee, company_data["positions"][0])
+
+def percentile(sorted_values, fraction):
+    """Перцентиль отсортированной последовательности с линейной интерполяцией"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def hour_heatmap(sessions):
+    """Отработанные секунды по дням недели и часам: array('d') из 7 * 24 ячеек.
+
+    Отрезки работы режутся по границам часов. Если длительность сессии
+    меньше суммы ее отрезков (старые записи без пауз), вклад отрезков
+    масштабируется до длительности.
+    """
+    heatmap = array('d', bytes(7 * 24 * 8))
+    seg_index, seg_starts, seg_ends = sessions.seg_index, sessions.seg_starts, sessions.seg_ends
+    for i, duration in enumerate(sessions.durations):
+        first, last = seg_index[i], seg_index[i + 1]
+        span = sum(seg_ends[first:last]) - sum(seg_starts[first:last])
+        scale = min(1.0, duration / span) if span > 0 else 0.0
+        for j in range(first, last):
+            begin, end = seg_starts[j], seg_ends[j]
+            while begin < end:
+                hour_number = begin // 3600
+                chunk_end = min(end, (hour_number + 1) * 3600)
+                # 1 января 1970 года - четверг (индекс 3)
+                weekday = (hour_number // 24 + 3) % 7
+                heatmap[weekday * 24 + hour_number % 24] += (chunk_end - begin) * scale
+                begin = chunk_end
+    return heatmap
+
+class SessionStatistics:
+    """Статистика по колонкам сессий для отчета и окна статистики.
+
+    Итоги по дням, неделям и месяцам, переработка относительно дневной
+    нормы, перцентили длительности сессий и тепловая карта по часам.
+    Все считается проходами по массивам колонок, без datetime на сессию.
+    """
+
+    PERCENTILES = (0.5, 0.75, 0.9, 0.95)
+
+    def __init__(self, sessions, daily_norm=DAILY_NORM_HOURS * 3600):
+        self.daily_norm = daily_norm
+        self.totals = SessionTotals()
+        self.totals.rebuild(sessions)
+        self.count = self.totals.count
+        self.total = self.totals.total
+        self.mean = self.total / self.count if self.count else 0.0
+
+        durations = sorted(sessions.durations)
+        self.shortest = durations[0] if durations else 0.0
+        self.longest = durations[-1] if durations else 0.0
+        self.percentiles = [(fraction, percentile(durations, fraction)) for fraction in self.PERCENTILES]
+
+        # Переработка и недоработка считаются только по отработанным дням
+        by_day = self.totals.by_day
+        self.days = len(by_day)
+        self.overtime_by_day = {day: worked - daily_norm for day, worked in by_day.items() if worked > daily_norm}
+        self.overtime = sum(self.overtime_by_day.values())
+        self.undertime = sum(daily_norm - worked for worked in by_day.values() if worked < daily_norm)
+        self.pause_total = sessions.pause_total()
+
+        self.heatmap = hour_heatmap(sessions)
+
+    def heat(self, weekday, hour):
+        return self.heatmap[weekday * 24 + hour]
+
+class SessionAggregate:
+    """Частичный агрегат сессий, который можно объединять с другими.
+
+    Строится по колонкам одного сотрудника в процессе пула, а в основном
+    процессе складывается в итоги по должности, компании и всем компаниям.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.pause = 0.0
+        self.overtime = 0.0
+        self.days = 0
+        self.first = None
+        self.last = None
+        self.by_month = {}
+
+    @classmethod
+    def from_sessions(cls, sessions, daily_norm=DAILY_NORM_HOURS * 3600):
+        aggregate = cls()
+        if not sessions:
+            return aggregate
+        totals = SessionTotals()
+        totals.rebuild(sessions)
+        aggregate.count = totals.count
+        aggregate.total = totals.total
+        aggregate.pause = sessions.pause_total()
+        aggregate.overtime = sum(worked - daily_norm for worked in totals.by_day.values() if worked > daily_norm)
+        aggregate.days = len(totals.by_day)
+        aggregate.first = sessions.starts[0]
+        aggregate.last = sessions.ends[-1]
+        aggregate.by_month = totals.by_month
+        return aggregate
+
+    def merge(self, other):
+        """Добавление другого агрегата к этому"""
+        self.count += other.count
+        self.total += other.total
+        self.pause += other.pause
+        self.overtime += other.overtime
+        self.days += other.days
+        if other.first is not None and (self.first is None or other.first < self.first):
+            self.first = other.first
+        if other.last is not None and (self.last is None or other.last > self.last):
+            self.last = other.last
+        for month, worked in other.by_month.items():
+            self.by_month[month] = self.by_month.get(month, 0) + worked
+        return self
+
+# Метрики шрифтов, уже загруженные в этом процессе: путь -> ((mtime, размер), метрики, файл кэша)
+_font_metrics = {}
+_font_metrics_lock = threading.Lock()
+
+def build_font_metrics(path):
+    """Разбор TTF-файла в словарь метрик того же вида, что строит fpdf.add_font"""
+    from fpdf.ttfonts import TTFontFile
+    ttf = TTFontFile()
+    ttf.getMetrics(path)
+    desc = {
+        'Ascent': int(round(ttf.ascent, 0)),
+        'Descent': int(round(ttf.descent, 0)),
+        'CapHeight': int(round(ttf.capHeight, 0)),
+        'Flags': ttf.flags,
+        'FontBBox': "[%s %s %s %s]" % tuple(int(round(value, 0)) for value in ttf.bbox[:4]),
+        'ItalicAngle': int(ttf.italicAngle),
+        'StemV': int(round(ttf.stemV, 0)),
+        'MissingWidth': int(round(ttf.defaultWidth, 0)),
+    }
+    return {
+        'name': re.sub('[ ()]', '', ttf.fullName),
+        'type': 'TTF',
+        'desc': desc,
+        'up': round(ttf.underlinePosition),
+        'ut': round(ttf.underlineThickness),
+        'originalsize': os.stat(path).st_size,
+        'cw': ttf.charWidths,
+    }
+
+def load_font_metrics(path):
+    """Метрики шрифта: из памяти процесса, из дискового кэша или разбором файла.
+
+    Кэш в памяти проверяется по времени изменения и размеру файла, дисковый
+    кэш адресуется SHA-1 содержимого, поэтому измененный шрифт разбирается
+    заново. Возвращает (метрики, путь к файлу кэша или None).
+    """
+    import hashlib
+    import pickle
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _font_metrics_lock:
+        cached = _font_metrics.get(path)
+        if cached and cached[0] == signature:
+            return cached[1], cached[2]
+
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        cache_file = os.path.join(FONT_CACHE_DIR, digest + ".pkl")
+        try:
+            with open(cache_file, 'rb') as f:
+                metrics = pickle.load(f)
+            if not isinstance(metrics, dict) or not FONT_METRICS_KEYS <= metrics.keys():
+                raise ValueError(f"{cache_file}: неполные метрики")
+        except Exception:
+            # Кэша нет, он поврежден или записан другой версией - разбираем шрифт заново.
+            # Обрезанный pickle выбрасывает не только UnpicklingError, но и ValueError, KeyError и др.
+            metrics = build_font_metrics(path)
+            try:
+                os.makedirs(FONT_CACHE_DIR, exist_ok=True)
+                tmp_path = cache_file + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump(metrics, f)
+                os.replace(tmp_path, cache_file)
+            except OSError:
+                # Кэш недоступен для записи - работаем только с памятью процесса
+                cache_file = None
+        _font_metrics[path] = (signature, metrics, cache_file)
+        return metrics, cache_file
+
+# Класс PDF создается при первом отчете: импорт fpdf заметно замедляет запуск окна
+class _PdfBuffer:
+    """Выходной буфер FPDF: куски копятся в списке, а не склеиваются в строку на каждой записи.
+
+    fpdf 1.7.2 дописывает документ через self.buffer += ..., что квадратично
+    по размеру файла; от буфера ему нужны только +=, len и encode.
+    """
+
+    def __init__(self, text=""):
+        self.chunks = [text]
+        self.length = len(text)
+
+    def __iadd__(self, text):
+        self.chunks.append(text)
+        self.length += len(text)
+        return self
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        return "".join(self.chunks)
+
+    def encode(self, encoding):
+        return str(self).encode(encoding)
+
+class _FontSubset(list):
+    """Подмножество символов шрифта без повторов.
+
+    fpdf добавляет в него каждый символ каждой ячейки, а при сохранении
+    проверяет вхождение для всех символов шрифта - на больших отчетах
+    это основная часть времени записи файла.
+    """
+
+    def __init__(self, codes=()):
+        super().__init__()
+        self.seen = set()
+        for code in codes:
+            self.append(code)
+
+    def append(self, code):
+        if code not in self.seen:
+            self.seen.add(code)
+            super().append(code)
+
+    def __contains__(self, code):
+        return code in self.seen
+
+_unicode_pdf_class = None
+
+def new_report_pdf():
+    """Новый документ UnicodePDF; fpdf импортируется при первом вызове"""
+    global _unicode_pdf_class
+    if _unicode_pdf_class is None:
+        from fpdf import FPDF
+
+        # Класс PDF с поддержкой Unicode
+        class UnicodePDF(FPDF):
+            def __init__(self):
+                super().__init__()
+                self.buffer = _PdfBuffer(self.buffer)
+                try:
+                    for style, filename in REPORT_FONTS.items():
+                        self.add_cached_font('DejaVu', style, os.path.join(FONTS_DIR, filename))
+                    self.set_font('DejaVu', '', 12)
+                except:
+                    # Fallback if fonts not found
+                    self.set_font("Arial", "", 12)
+    
+            def add_cached_font(self, family, style, path):
+                """Аналог add_font(..., uni=True) для fpdf 1.7.2, берущий метрики из load_font_metrics"""
+                metrics, cache_file = load_font_metrics(path)
+                fontkey = family.lower() + style
+                if fontkey in self.fonts:
+                    return
+                self.fonts[fontkey] = {
+                    'i': len(self.fonts) + 1, 'type': metrics['type'],
+                    'name': metrics['name'], 'desc': metrics['desc'],
+                    'up': metrics['up'], 'ut': metrics['ut'],
+                    'cw': metrics['cw'],
+                    'ttffile': path, 'fontkey': fontkey,
+                    # Номера символов 0-31 (и цифры для нумерации страниц) всегда входят в подмножество
+                    'subset': _FontSubset(range(0, 57 if hasattr(self, 'str_alias_nb_pages') else 32)),
+                    'unifilename': cache_file,
+                }
+                self.font_files[fontkey] = {'length1': metrics['originalsize'], 'type': "TTF", 'ttffile': path}
+                self.font_files[path] = {'type': "TTF"}
+            
+            def header(self):
+                pass
+
+        _unicode_pdf_class = UnicodePDF
+    return _unicode_pdf_class()
+
+# Цветовая палитра отчета
+REPORT_TITLE_COLOR = (40, 60, 150)     # Темно-синий
+REPORT_ACCENT_COLOR = (220, 50, 50)    # Красный акцент
+REPORT_HEADER_COLOR = (50, 120, 50)    # Зеленый для заголовков
+REPORT_SUMMARY_COLOR = (180, 80, 180)  # Фиолетовый для итогов
+REPORT_SEGMENT_COLOR = (110, 110, 110)  # Серый для отрезков работы
+
+# Цвета для плашек дней (чередование)
+REPORT_DAY_COLORS = [
+    (200, 230, 255),  # Голубой
+    (255, 230, 200),  # Персиковый
+    (230, 255, 200)   # Салатовый
+]
+REPORT_TEXT_COLORS = [
+    (0, 50, 100),    # Темно-синий
+    (100, 50, 0),    # Коричневый
+    (0, 100, 50)     # Темно-зеленый
+]
+
+# Разметка раздела дня: рассчитывается один раз для всех дней отчета
+REPORT_BLACK = (0, 0, 0)
+REPORT_DAY_FONT = ("DejaVu", "B", 14)
+REPORT_HEADING_FONT = ("DejaVu", "B", 11)
+REPORT_ROW_FONT = ("DejaVu", "", 10)
+REPORT_SEGMENT_FONT = ("DejaVu", "", 8)
+REPORT_TOTAL_FONT = ("DejaVu", "B", 10)
+REPORT_COLUMN_WIDTHS = (65, 65, 50)
+REPORT_TOTAL_CAPTION_WIDTH = REPORT_COLUMN_WIDTHS[0] + REPORT_COLUMN_WIDTHS[1]
+REPORT_HEADINGS = ("Начало работы", "Окончание работы", "Длительность")
+REPORT_ROW_HEIGHT = 8
+REPORT_SEGMENT_HEIGHT = 6
+
+# Число закрытых дней, разделы которых хранятся между построениями отчетов
+REPORT_BLOCK_CACHE_DAYS = 10000
+
+class ReportStyle:
+    """Шрифт и цвет текста PDF: вызовы fpdf только при смене стиля.
+
+    Подряд идущие строки одного стиля не стоят ни одного вызова; fpdf сам
+    восстанавливает стиль на новой странице, поэтому запомненное верно и
+    после автоматического разрыва.
+    """
+
+    def __init__(self, pdf):
+        self.pdf = pdf
+        self.font = None
+        self.color = None
+
+    def apply(self, font, color=REPORT_BLACK):
+        if font != self.font:
+            self.pdf.set_font(*font)
+            self.font = font
+        if color != self.color:
+            self.pdf.set_text_color(*color)
+            self.color = color
+
+def build_day_block(sessions, day, day_indices):
+    """Готовый раздел дня: подписи, строки сессий (с отрезками) и итог - только строки"""
+    starts, ends, durations = sessions.starts, sessions.ends, sessions.durations
+    seg_index, seg_starts, seg_ends = sessions.seg_index, sessions.seg_starts, sessions.seg_ends
+    date_str = day.strftime("%Y-%m-%d")
+    rows = []
+    day_total_time = 0
+    for index in day_indices:
+        duration = durations[index]
+        day_total_time += duration
+        first, last = seg_index[index], seg_index[index + 1]
+        segments = ()
+        # Отрезки работы сессии, прерывавшейся паузами
+        if last - first > 1:
+            segments = tuple((format_clock(begin), format_clock(end), format_time(end - begin))
+                             for begin, end in zip(seg_starts[first:last], seg_ends[first:last]))
+        rows.append((format_clock(starts[index]), format_clock(ends[index]), format_time(duration), segments))
+    return f"Дата: {date_str}", rows, f"Итого за {date_str}:", format_time(day_total_time)
+
+class ReportBlockCache:
+    """Разделы закрытых дней между построениями отчетов (LRU).
+
+    День до сегодняшнего уже не пополняется таймером, но мог измениться
+    импортом или слиянием, поэтому ключ включает сводку его сессий.
+    Сегодняшний день всегда строится заново.
+    """
+
+    def __init__(self, capacity=REPORT_BLOCK_CACHE_DAYS):
+        self.capacity = capacity
+        self.blocks = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def block(self, sessions, day, day_indices, today=None):
+        if day >= (today or date.today()):
+            return build_day_block(sessions, day, day_indices)
+        first, last = day_indices.start, day_indices.stop
+        key = (day, last - first, sessions.starts[first], sessions.ends[last - 1],
+               sum(sessions.durations[first:last]), sessions.seg_index[last] - sessions.seg_index[first])
+        with self.lock:
+            block = self.blocks.get(key)
+            if block is not None:
+                self.blocks.move_to_end(key)
+                self.hits += 1
+                return block
+        block = build_day_block(sessions, day, day_indices)
+        with self.lock:
+            self.misses += 1
+            self.blocks[key] = block
+            if len(self.blocks) > self.capacity:
+                self.blocks.popitem(last=False)
+        return block
+
+    def clear(self):
+        with self.lock:
+            self.blocks.clear()
+
+REPORT_BLOCKS = ReportBlockCache()
+
+def report_filename(employee, company, report_date=None):
+    """Имя файла отчета без недопустимых символов"""
+    report_date = report_date or datetime.now().strftime("%Y-%m-%d")
+    filename = f"{employee}_{company}_worktime_report_{report_date}.pdf"
+    return "".join(c for c in filename if c.isalnum() or c in " _-().")
+
+def iter_report_days(sessions):
+    """Дни от новых к старым: (дата, range индексов сессий дня в порядке начала).
+
+    Сессии упорядочены по началу, поэтому сессии дня занимают непрерывный
+    диапазон; datetime создаются только при выводе строк дня.
+    """
+    starts = sessions.starts
+    last = len(sessions)
+    while last > 0:
+        day_number = starts[last - 1] // 86400
+        first = bisect_left(starts, day_number * 86400, 0, last)
+        yield date.fromordinal(EPOCH_ORDINAL + day_number), range(first, last)
+        last = first
+
+def write_report_statistics(pdf, statistics):
+    """Разделы статистики на странице сводки: длительности, переработка, месяцы и часы"""
+    def section(title):
+        pdf.ln(6)
+        pdf.set_font("DejaVu", "B", 12)
+        pdf.set_text_color(*REPORT_SUMMARY_COLOR)
+        pdf.cell(0, 8, title, 0, 1)
+
+    def row(caption, value):
+        pdf.set_font("DejaVu", "", 10)
+        pdf.set_text_color(0, 0, 0)
+        pdf.cell(80, 7, caption)
+        pdf.cell(0, 7, value, 0, 1)
+
+    section("Длительность сессий")
+    row("Самая короткая:", format_time(statistics.shortest))
+    for fraction, value in statistics.percentiles:
+        row(f"{int(fraction * 100)}-й перцентиль:", format_time(value))
+    row("Самая длинная:", format_time(statistics.longest))
+
+    section(f"Норма {format_time(statistics.daily_norm)} в день")
+    row("Рабочих дней:", str(statistics.days))
+    row("Дней с переработкой:", str(len(statistics.overtime_by_day)))
+    row("Переработка:", format_time(statistics.overtime))
+    row("Недоработка:", format_time(statistics.undertime))
+
+    section("По месяцам")
+    for (year, month), worked in sorted(statistics.totals.by_month.items(), reverse=True):
+        row(f"{year}-{month:02d}:", format_time(worked))
+
+    # Тепловая карта: строки - дни недели, столбцы - часы
+    section("Отработанное время по часам")
+    peak = max(statistics.heatmap) or 1
+    pdf.set_font("DejaVu", "", 6)
+    pdf.set_text_color(0, 0, 0)
+    pdf.cell(10, 5, "")
+    for hour in range(24):
+        pdf.cell(7.5, 5, str(hour), 0, 0, "C")
+    pdf.ln()
+    for weekday, name in enumerate(WEEKDAY_NAMES):
+        pdf.cell(10, 5, name)
+        for hour in range(24):
+            level = statistics.heat(weekday, hour) / peak
+            pdf.set_fill_color(*(int(255 - (255 - c) * level) for c in REPORT_TITLE_COLOR))
+            pdf.cell(7.5, 5, "", 1, 0, "C", 1)
+        pdf.ln()
+
+def write_report(filepath, company, employee, position, sessions, progress=None, period=None,
+                 daily_norm=DAILY_NORM_HOURS * 3600, block_cache=REPORT_BLOCKS):
+    """Потоковое построение PDF отчета: дни выводятся по мере обхода истории.
+
+    progress, если задан, вызывается с долей обработанных сессий после
+    каждого дня и может прервать построение исключением. period - подпись
+    отчетного периода, daily_norm - дневная норма в секундах для расчета
+    переработки. Строки закрытых дней берутся из block_cache (None - без
+    кэша). Возвращает число страниц.
+
+    Время этапов попадает в METRICS: report.group - разбиение на дни и
+    форматирование строк, report.layout - ячейки разделов дней,
+    report.statistics - страница сводки, report.output - запись файла.
+    """
+    started = time.perf_counter()
+    # Используем кастомный класс PDF с поддержкой Unicode
+    pdf = new_report_pdf()
+    pdf.add_page()
+    
+    # Заголовок отчета
+    pdf.set_font("DejaVu", "B", 20)
+    pdf.set_text_color(*REPORT_TITLE_COLOR)
+    pdf.cell(0, 15, "Отчет по рабочим часам", 0, 1, "C")
+    
+    # Информация о компании и сотруднике
+    details = [("Компания:", company), ("Сотрудник:", employee), ("Должность:", position)]
+    if period:
+        details.append(("Период:", period))
+    for caption, value in details:
+        pdf.set_font("DejaVu", "B", 9)
+        pdf.cell(50, 6, caption, 0, 0)
+        pdf.set_font("DejaVu", "", 9)
+        pdf.cell(0, 6, value, 0, 1)
+    
+    pdf.set_font("DejaVu", "B", 9)
+    pdf.cell(50, 6, "Дата формирования:", 0, 0)
+    pdf.set_font("DejaVu", "", 9)
+    # Форматирование даты в две строки при необходимости
+    pdf.multi_cell(0, 6, datetime.now().strftime('%Y-%m-%d'), 0, 1)
+    
+    pdf.ln(5)
+    
+    # Счетчик для индикатора прогресса
+    total_sessions = 0
+    
+    style = ReportStyle(pdf)
+    start_width, end_width, duration_width = REPORT_COLUMN_WIDTHS
+    today = date.today()
+    days_started = mark = time.perf_counter()
+    grouping = 0.0
+    for i, (day, day_indices) in enumerate(iter_report_days(sessions)):
+        color_idx = i % len(REPORT_DAY_COLORS)
+        if block_cache is None:
+            block = build_day_block(sessions, day, day_indices)
+        else:
+            block = block_cache.block(sessions, day, day_indices, today)
+        day_caption, rows, total_caption, day_total = block
+        grouping += time.perf_counter() - mark
+
+        # Заголовок дня с цветной плашкой
+        style.apply(REPORT_DAY_FONT, REPORT_TEXT_COLORS[color_idx])
+        pdf.set_fill_color(*REPORT_DAY_COLORS[color_idx])
+        pdf.cell(0, 10, day_caption, 0, 1, "L", 1)
+        pdf.ln(3)
+
+        # Заголовки таблицы
+        style.apply(REPORT_HEADING_FONT)
+        pdf.cell(start_width, REPORT_ROW_HEIGHT, REPORT_HEADINGS[0], 1, 0, "C")
+        pdf.cell(end_width, REPORT_ROW_HEIGHT, REPORT_HEADINGS[1], 1, 0, "C")
+        pdf.cell(duration_width, REPORT_ROW_HEIGHT, REPORT_HEADINGS[2], 1, 1, "C")
+
+        for start, end, duration, segments in rows:
+            style.apply(REPORT_ROW_FONT)
+            pdf.cell(start_width, REPORT_ROW_HEIGHT, start, 1, 0, "C")
+            pdf.cell(end_width, REPORT_ROW_HEIGHT, end, 1, 0, "C")
+            pdf.cell(duration_width, REPORT_ROW_HEIGHT, duration, 1, 1, "C")
+
+            # Отрезки работы под строкой сессии
+            if segments:
+                style.apply(REPORT_SEGMENT_FONT, REPORT_SEGMENT_COLOR)
+                for begin, finish, worked in segments:
+                    pdf.cell(start_width, REPORT_SEGMENT_HEIGHT, begin, "LR", 0, "C")
+                    pdf.cell(end_width, REPORT_SEGMENT_HEIGHT, finish, "LR", 0, "C")
+                    pdf.cell(duration_width, REPORT_SEGMENT_HEIGHT, worked, "LR", 1, "C")
+
+        # Итог за день
+        style.apply(REPORT_TOTAL_FONT, REPORT_HEADER_COLOR)
+        pdf.cell(REPORT_TOTAL_CAPTION_WIDTH, REPORT_ROW_HEIGHT, total_caption, 1, 0, "R")
+        style.apply(REPORT_TOTAL_FONT)
+        pdf.cell(duration_width, REPORT_ROW_HEIGHT, day_total, 1, 1, "C")
+        pdf.ln(8)
+
+        total_sessions += len(day_indices)
+        if progress:
+            progress(total_sessions / len(sessions))
+        mark = time.perf_counter()
+    METRICS.observe("report.group", grouping)
+    METRICS.observe("report.layout", time.perf_counter() - days_started - grouping)
+    
+    # Общий итог
+    summary_started = time.perf_counter()
+    pdf.add_page()
+    pdf.set_font("DejaVu", "B", 16)
+    pdf.set_fill_color(230, 230, 255)  # Лавандовый фон
+    pdf.set_text_color(*REPORT_SUMMARY_COLOR)  # Фиолетовый текст
+    pdf.cell(0, 10, "Сводка по отчету", 0, 1, "C", 1)
+    pdf.ln(12)
+    
+    statistics = SessionStatistics(sessions, daily_norm)
+    for caption, value in (("Всего сессий:", str(statistics.count)),
+                           ("Общее время:", format_time(statistics.total)),
+                           ("Средняя длительность:", format_time(statistics.mean)),
+                           ("Время на паузах:", format_time(statistics.pause_total))):
+        pdf.set_font("DejaVu", "B", 12)
+        pdf.set_text_color(*REPORT_ACCENT_COLOR)  # Красный
+        pdf.cell(80, 10, caption)
+        pdf.set_text_color(0, 0, 0)  # Черный
+        pdf.cell(0, 10, value, 0, 1)
+    write_report_statistics(pdf, statistics)
+    METRICS.observe("report.statistics", time.perf_counter() - summary_started)
+    
+    # Сохранение файла
+    with METRICS.span("report.output"):
+        pdf.output(filepath)
+    METRICS.observe("report", time.perf_counter() - started)
+    METRICS.count("report.sessions", len(sessions))
+    return pdf.page
+
+def write_archived_report(filepath, company, employee, position, sessions, archive=None,
+                          date_from=None, date_to=None, **options):
+    """write_report по сессиям хранилища и архивным за тот же период; архив читается здесь, в фоне"""
+    return write_report(filepath, company, employee, position,
+                        report_sessions(sessions, archive, date_from, date_to), **options)
+
+def write_aggregate_report(filepath, rows, period=None):
+    """Сводный PDF по компаниям: строки сотрудников, итоги должностей и компаний, помесячная таблица.
+
+    rows - результат aggregate_companies.
+    """
+    pdf = new_report_pdf()
+    pdf.add_page()
+
+    pdf.set_font("DejaVu", "B", 20)
+    pdf.set_text_color(*REPORT_TITLE_COLOR)
+    pdf.cell(0, 15, "Сводный отчет по компаниям", 0, 1, "C")
+    details = [("Дата формирования:", datetime.now().strftime('%Y-%m-%d'))]
+    if period:
+        details.append(("Период:", period))
+    for caption, value in details:
+        pdf.set_font("DejaVu", "B", 9)
+        pdf.set_text_color(0, 0, 0)
+        pdf.cell(50, 6, caption, 0, 0)
+        pdf.set_font("DejaVu", "", 9)
+        pdf.cell(0, 6, value, 0, 1)
+    pdf.ln(5)
+
+    widths = (55, 50, 20, 35, 30)
+    def table_row(values, style="", fill=None):
+        pdf.set_font("DejaVu", style, 9)
+        if fill:
+            pdf.set_fill_color(*fill)
+        for width, value, align in zip(widths, values, "LLCCC"):
+            pdf.cell(width, 7, value, 1, 0, align, 1 if fill else 0)
+        pdf.ln()
+
+    color_idx = 0
+    for level, company, position, employee, aggregate in rows:
+        values = (employee, position, str(aggregate.count), format_time(aggregate.total), format_time(aggregate.overtime))
+        if level == "company_header":
+            pdf.ln(3)
+            pdf.set_font("DejaVu", "B", 13)
+            pdf.set_fill_color(*REPORT_DAY_COLORS[color_idx % len(REPORT_DAY_COLORS)])
+            pdf.set_text_color(*REPORT_TEXT_COLORS[color_idx % len(REPORT_TEXT_COLORS)])
+            pdf.cell(0, 9, company, 0, 1, "L", 1)
+            color_idx += 1
+            pdf.set_text_color(0, 0, 0)
+            table_row(("Сотрудник", "Должность", "Сессий", "Время", "Переработка"), "B")
+        elif level == "employee":
+            table_row(values)
+        elif level == "position":
+            table_row((f"Итого: {position}", "", *values[2:]), "B", (245, 245, 245))
+        elif level == "company":
+            pdf.set_text_color(*REPORT_HEADER_COLOR)
+            table_row((f"Итого: {company}", "", *values[2:]), "B", (235, 245, 235))
+            pdf.set_text_color(0, 0, 0)
+        elif level == "all":
+            pdf.ln(5)
+            pdf.set_text_color(*REPORT_SUMMARY_COLOR)
+            table_row(("Всего по компаниям", "", *values[2:]), "B", (230, 230, 255))
+            pdf.set_text_color(0, 0, 0)
+
+    # Помесячные итоги компаний
+    companies = [(company, aggregate) for level, company, _, _, aggregate in rows if level == "company"]
+    months = sorted({month for _, aggregate in companies for month in aggregate.by_month}, reverse=True)
+    if months:
+        pdf.add_page()
+        pdf.set_font("DejaVu", "B", 16)
+        pdf.set_text_color(*REPORT_SUMMARY_COLOR)
+        pdf.cell(0, 10, "Итоги по месяцам", 0, 1, "C")
+        pdf.ln(5)
+        column = min(40, 160 / len(companies))
+        pdf.set_font("DejaVu", "B", 9)
+        pdf.set_text_color(0, 0, 0)
+        pdf.cell(30, 7, "Месяц", 1, 0, "C")
+        for company, _ in companies:
+            pdf.cell(column, 7, company, 1, 0, "C")
+        pdf.ln()
+        pdf.set_font("DejaVu", "", 9)
+        for year, month in months:
+            pdf.cell(30, 7, f"{year}-{month:02d}", 1, 0, "C")
+            for _, aggregate in companies:
+                pdf.cell(column, 7, format_time(aggregate.by_month.get((year, month), 0)), 1, 0, "C")
+            pdf.ln()
+
+    pdf.output(filepath)
+    return pdf.page
+
+def write_aggregate_csv(filepath, rows):
+    """Сводка в CSV: строка на сотрудника и итоговые строки, столбцы месяцев в часах"""
+    import csv
+    months = sorted({month for *_, aggregate in rows for month in aggregate.by_month})
+    # Точка с запятой и BOM - чтобы Excel с русской локалью открывал файл без мастера импорта
+    with open(filepath, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(["уровень", "компания", "должность", "сотрудник", "сессий", "дней", "часов",
+                         "часов на паузах", "переработка, часов", "первая сессия", "последняя сессия"]
+                        + [f"{year}-{month:02d}" for year, month in months])
+        for level, company, position, employee, aggregate in rows:
+            if level == "company_header":
+                continue
+            writer.writerow([
+                level, company, position, employee, aggregate.count, aggregate.days,
+                round(aggregate.total / 3600, 2), round(aggregate.pause / 3600, 2),
+                round(aggregate.overtime / 3600, 2),
+                format_timestamp(aggregate.first) if aggregate.first is not None else "",
+                format_timestamp(aggregate.last) if aggregate.last is not None else "",
+            ] + [round(aggregate.by_month.get(month, 0) / 3600, 2) for month in months])
+
+# Варианты отчетного периода: ключ и подпись в интерфейсе
+PERIODS = [
+    ("all", "Вся история"),
+    ("day", "Сегодня"),
+    ("week", "Эта неделя"),
+    ("month", "Этот месяц"),
+    ("last_month", "Прошлый месяц"),
+    ("custom", "Произвольный..."),
+]
+
+def period_bounds(kind, custom=None, today=None):
+    """Границы периода [начало, конец) в виде datetime; None - без ограничения"""
+    today = today or date.today()
+    if kind == "day":
+        first, last = today, today + timedelta(days=1)
+    elif kind == "week":
+        first = today - timedelta(days=today.weekday())
+        last = first + timedelta(days=7)
+    elif kind == "month":
+        first = today.replace(day=1)
+        last = (first + timedelta(days=32)).replace(day=1)
+    elif kind == "last_month":
+        last = today.replace(day=1)
+        first = (last - timedelta(days=1)).replace(day=1)
+    elif kind == "custom" and custom:
+        first, last = custom[0], custom[1] + timedelta(days=1)
+    else:
+        return None, None
+    return datetime.combine(first, datetime.min.time()), datetime.combine(last, datetime.min.time())
+
+def period_caption(sessions, date_from=None, date_to=None, rollup=None):
+    """Подпись периода и суффикс имени файла отчета; (None, None) для всей истории.
+
+    rollup - итоги архива, если в периоде есть архивные сессии: они старше сессий хранилища.
+    """
+    if not (date_from or date_to):
+        return None, None
+    if date_from:
+        first = date_from.date()
+    else:
+        first = rollup.first_day() if rollup else to_datetime(sessions.starts[0]).date()
+    if date_to:
+        last = (date_to - timedelta(days=1)).date()
+    else:
+        last = to_datetime(sessions.starts[-1]).date() if sessions else rollup.last_day()
+    return f"{first} - {last}", f"{first}_{last}"
+
+class EmployeeTracker:
+    """Учет времени одного сотрудника без GUI: таймер, история сессий и итоги.
+
+    Окно (StopwatchApp) и HTTP-служба (server.py) оборачивают его. Запись в
+    хранилище и построение отчетов выполняет вызывающий код - в своем
+    фоновом потоке или пуле; сам объект не потокобезопасен.
+    """
+
+    def __init__(self, storage_kind, data_dir, company, employee, position, clock=time.monotonic_ns):
+        self.storage_kind = storage_kind
+        self.data_dir = data_dir
+        self.timer = TimerEngine(clock)
+        self.sessions = SessionColumns()
+        self.rollup = DayRollup()
+        self.totals = SessionTotals()
+        self.history_loaded = False
+        self.select(company, employee, position)
+
+    @property
+    def has_session(self):
+        return self.timer.has_session
+
+    @property
+    def is_running(self):
+        return self.timer.is_running
+
+    def select(self, company, employee, position):
+        """Выбор сотрудника и должности; историю нового сотрудника нужно загрузить заново.
+
+        Перенос старых JSON-файлов откладывается до загрузки истории
+        (migrate_json_history), прежнее хранилище закрывает вызывающий код.
+        """
+        self.company = company
+        self.employee = employee
+        self.position = position
+        self.storage = open_storage(self.storage_kind, self.data_dir, company, employee, position, migrate=False)
+        self.archive = HistoryArchive(self.data_dir, company, employee)
+
+    def reset_history(self):
+        """Пустая история на время загрузки; завершенные за это время сессии сохранит attach_history"""
+        self.sessions = SessionColumns()
+        self.rollup = DayRollup()
+        self.totals.clear()
+        self.history_loaded = False
+
+    def attach_history(self, sessions, rollup=None):
+        """Подстановка загруженной истории и дневных итогов архива, пересчет итогов"""
+        # Сессии, завершенные во время загрузки, записаны после чтения - добавляем их
+        pending = self.sessions
+        for index in range(len(pending)):
+            sessions.append_raw(pending.starts[index], pending.ends[index], pending.durations[index],
+                                pending.raw_segments(index))
+        self.sessions = sessions
+        self.rollup = rollup or DayRollup()
+        self.totals.rebuild(sessions)
+        self.totals.add_rollup(self.rollup)
+        self.history_loaded = True
+
+    def load(self, before=None):
+        """Синхронная загрузка истории; сессии, начатые раньше before, переносятся в архив"""
+        self.reset_history()
+        migrate_json_history(self.storage, self.data_dir, self.employee)
+        self.attach_history(*load_history(self.storage, self.archive, before))
+
+    def period_total(self, date_from=None, date_to=None):
+        """Сумма за период по сессиям хранилища и дневным итогам архива за O(log N)"""
+        return self.sessions.period_total(date_from, date_to) + self.rollup.period_total(date_from, date_to)
+
+    def start(self):
+        """Запуск или возобновление таймера: "started", "resumed" или None, если он уже идет"""
+        if self.is_running:
+            return None
+        action = "resumed" if self.has_session else "started"
+        self.timer.start()
+        return action
+
+    def pause(self):
+        """Приостановка таймера; False, если он не идет"""
+        if not self.is_running:
+            return False
+        self.timer.pause()
+        return True
+
+    def end(self):
+        """Завершение сессии: (сессия, отрезки) уже в истории и итогах; None без сессии.
+
+        В хранилище сессию записывает вызывающий код через persist_session.
+        """
+        if not self.has_session:
+            return None
+        # Начало и окончание - настенное время, длительность - по монотонным часам
+        session, segments = self.timer.finish()
+        self.sessions.append(session, segments)
+        self.totals.add(session)
+        return session, segments
+
+    def clear(self):
+        """Очистка истории в памяти; файлы очищает вызывающий код через clear_history"""
+        self.sessions = SessionColumns()
+        self.rollup = DayRollup()
+        self.totals.clear()
+
+    def checkpoint_state(self):
+        """Снимок текущей сессии для TimerCheckpoint"""
+        return {
+            "company": self.company,
+            "employee": self.employee,
+            "position": self.position,
+            "session_start": self.timer.started_at.strftime(TIME_FORMAT),
+            "accumulated_time": self.timer.elapsed(),
+            "is_running": self.is_running,
+            "segments": [[begin.strftime(TIME_FORMAT), end.strftime(TIME_FORMAT)]
+                         for begin, end in self.timer.segments()],
+            "saved_at": datetime.now().strftime(TIME_FORMAT),
+        }
+
+    def restore(self, session_start, accumulated_time, segments=None):
+        """Восстановление сессии из снимка на паузе: время после снимка не засчитывается"""
+        self.timer.restore(session_start, accumulated_time, segments)
+
+    def status(self):
+        """Состояние для внешних клиентов: сериализуемый словарь"""
+        elapsed = self.timer.elapsed()
+        return {
+            "company": self.company,
+            "employee": self.employee,
+            "position": self.position,
+            "has_session": self.has_session,
+            "is_running": self.is_running,
+            "session_start": self.timer.started_at.strftime(TIME_FORMAT) if self.has_session else None,
+            "elapsed": round(elapsed, 3),
+            "total": round(self.totals.total + elapsed, 3),
+            "sessions": self.totals.count,
+            "archived": self.totals.count - len(self.sessions),
+            "history_loaded": self.history_loaded,
+        }
+
+    def select_period(self, date_from=None, date_to=None):
+        """Сессии хранилища за период, архив (если часть периода в нем) и подпись периода.
+
+        Возвращает (сессии, архив или None, подпись, суффикс) или None без
+        сессий. Выборка - новые колонки, а архивные сессии добавляет
+        report_sessions в фоновом потоке, поэтому учет новых сессий не ждет.
+        """
+        sessions = self.sessions.select(date_from, date_to)
+        archived = self.rollup.period_count(date_from, date_to) > 0
+        if not sessions and not archived:
+            return None
+        period, suffix = period_caption(sessions, date_from, date_to, self.rollup if archived else None)
+        return sessions, self.archive if archived else None, period, suffix
+
+    def prepare_report(self, reports_dir, date_from=None, date_to=None):
+        """Выборка и имя файла отчета за период: (путь, сессии, архив, подпись) или None без сессий.
+
+        write_report(путь, ..., report_sessions(сессии, архив, ...)) можно
+        выполнять в другом потоке, не мешая учету новых сессий.
+        """
+        selection = self.select_period(date_from, date_to)
+        if selection is None:
+            return None
+        sessions, archive, period, report_date = selection
+        filepath = os.path.join(reports_dir, report_filename(self.employee, self.company, report_date))
+        return filepath, sessions, archive, period
 
 class StopwatchApp(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("Профессиональный тайм-трекер")
-        self.geometry("500x500")
+        self.geometry("500x560")
         self.resizable(False, False)
         self.configure(bg="#f0f0f0")
-        
-        # Загрузка конфигурации
-        self.config_data = load_config()
-        self.companies = list(self.config_data["companies"].keys())
-        
+
+        # Загрузка конфигурации; при изменении файла она перечитывается без перезапуска
+        self.settings = ConfigStore(CONFIG_FILE)
+        self.config_data = self.settings.data
+        self.config_error_shown = None
+
         # Текущие значения
-        self.current_company = self.config_data.get("default_company", self.companies[0])
-        self.current_position = self.config_data["companies"][self.current_company]["positions"][0]
-        self.current_employee = self.config_data["companies"][self.current_company]["employees"][0]
-        
+        index = self.settings.index
+        self.current_company = index.default_company
+        self.current_employee = index.employees[self.current_company][0]
+        self.current_position = index.position_of(self.current_company, self.current_employee)
+
         # Инициализация переменных состояния
-        self.has_session = False
-        self.is_running = False
-        self.accumulated_time = 0
-        self.last_start_time = None
-        self.sessions = []
-        
+        self.tick_job = None
+
+        # Выбранный период и кэш суммы за него
+        self.period_kind = "all"
+        self.custom_period = None
+        self.period_total = 0
+        self.period_includes_now = True
+        # День, на который посчитаны границы периода, и пересчет в ближайшую полночь
+        self.period_day = None
+        self.period_job = None
+
         # Создаем папки для данных
-        self.data_dir = "sessions"
-        self.reports_dir = "reports"
+        self.data_dir = DATA_DIR
+        self.reports_dir = REPORTS_DIR
         os.makedirs(self.data_dir, exist_ok=True)
         os.makedirs(self.reports_dir, exist_ok=True)
-        
-        # Файл данных будет создан при выборе сотрудника
-        self.data_file = None
-        self.update_data_file()
-        
-        # Загрузка сохраненных сессий
+
+        # Фоновые потоки: запись сессий, построение отчетов и поисковых индексов сотрудников.
+        # Индекс не ждет в очереди за PDF отчетом, а загрузка истории - за индексом
+        self.io_worker = BackgroundWorker("worktimer-io")
+        self.report_worker = BackgroundWorker("worktimer-report")
+        self.index_worker = BackgroundWorker("worktimer-index")
+        self.report_task = None
+        self.polling_workers = False
+
+        # Снимок состояния таймера для восстановления после сбоя
+        self.checkpoint = TimerCheckpoint(os.path.join(self.data_dir, CHECKPOINT_FILE))
+
+        # Таймер и история текущего сотрудника; хранилище меняется при выборе сотрудника
+        self.storage_kind = self.config_data.get("storage", "json")
+        self.tracker = EmployeeTracker(self.storage_kind, self.data_dir, self.current_company,
+                                       self.current_employee, self.current_position)
+
+        # История загружается в фоне после первой отрисовки окна
+        self.load_generation = 0
         self.load_sessions()
-        
+
         # Стили для элементов
         self.style = ttk.Style()
         self.style.configure("TButton", font=("Arial", 10), padding=6)
         self.style.configure("Title.TLabel", font=("Arial", 14, "bold"), background="#f0f0f0")
         self.style.configure("Time.TLabel", font=("Courier New", 18, "bold"), background="#f0f0f0")
         self.style.configure("TCombobox", padding=5)
-        
+
         # Создание элементов GUI
         self.create_widgets()
-        
+
         # Запуск цикла обновления времени
         self.update_time()
-        
+
         # Обработка закрытия окна
         self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Ошибка в config.json показывается, но окно работает с настройками по умолчанию
+        if self.settings.error:
+            self.after_idle(self.report_config_error)
+        self.after(CONFIG_CHECK_INTERVAL_MS, self.check_config)
+
+        # Предложение восстановить сессию, прерванную сбоем, - когда окно уже нарисовано
+        self.after_idle(self.offer_resume)
     
-    def update_data_file(self):
-        """Обновляет путь к файлу данных на основе текущего сотрудника"""
-        self.data_file = os.path.join(
-            self.data_dir, 
-            f"sessions_{self.sanitize_filename(self.current_employee)}.json"
-        )
+    @property
+    def timer(self):
+        return self.tracker.timer
+    
+    @property
+    def sessions(self):
+        return self.tracker.sessions
+    
+    @property
+    def totals(self):
+        return self.tracker.totals
+    
+    @property
+    def storage(self):
+        return self.tracker.storage
+    
+    @property
+    def history_loaded(self):
+        return self.tracker.history_loaded
+    
+    @property
+    def has_session(self):
+        return self.tracker.has_session
+    
+    @property
+    def is_running(self):
+        return self.tracker.is_running
+    
+    def save_checkpoint(self, force=False):
+        """Запись снимка текущей сессии (с ограничением частоты, если не force)"""
+        if not force and not self.checkpoint.due():
+            return
+        try:
+            self.checkpoint.write(self.tracker.checkpoint_state(), force=force)
+        except OSError as e:
+            self.status_var.set(f"Не удалось сохранить состояние таймера: {e}")
+    
+    def offer_resume(self):
+        """Восстановление незавершенной сессии из снимка по согласию пользователя"""
+        state = self.checkpoint.read()
+        if state is None:
+            return
+        try:
+            company = state["company"]
+            employee = state["employee"]
+            session_start = datetime.strptime(state["session_start"], TIME_FORMAT)
+            accumulated_time = float(state["accumulated_time"])
+            # Снимки без отрезков (старые версии) восстанавливаются без разбивки на отрезки
+            segments = [(datetime.strptime(begin, TIME_FORMAT), datetime.strptime(end, TIME_FORMAT))
+                        for begin, end in state.get("segments", [])]
+        except (KeyError, TypeError, ValueError):
+            self.checkpoint.clear()
+            return
+
+        index = self.settings.index
+        if not index.has_employee(company, employee):
+            messagebox.showwarning("Незавершенная сессия",
+                                   f"Найдена незавершенная сессия сотрудника {employee} ({company}), "
+                                   "но его больше нет в конфигурации. Сессия не будет восстановлена.")
+            self.checkpoint.clear()
+            return
+
+        if not messagebox.askyesno("Незавершенная сессия",
+                                   f"Найдена незавершенная сессия сотрудника {employee} ({company}): "
+                                   f"{format_time(accumulated_time)} на {state.get('saved_at', '?')}.\n"
+                                   "Восстановить ее?"):
+            self.checkpoint.clear()
+            return
+
+        # Переключаемся на сотрудника и должность из снимка
+        switched = company != self.current_company or employee != self.current_employee
+        if switched:
+            self.current_company = company
+            self.company_var.set(company)
+            self.position_combobox['values'] = index.positions[company]
+            self.fill_employee_choices()
+            self.current_employee = employee
+            self.employee_var.set(employee)
+            self.current_position = index.position_of(company, employee)
+        if state.get("position") in index.positions[company]:
+            self.current_position = state["position"]
+        self.position_var.set(self.current_position)
+        self.update_data_file()
+        if switched:
+            self.load_sessions()
+
+        # Сессия восстанавливается на паузе: время после последнего снимка не засчитывается
+        self.tracker.restore(session_start, accumulated_time, segments)
+        self.start_button.config(state="enabled")
+        self.pause_button.config(state="disabled")
+        self.end_button.config(state="enabled")
+        self.save_checkpoint(force=True)
+        self.update_time()
+        self.status_var.set(f"Сессия восстановлена на паузе | Сотрудник: {self.current_employee}")
+    
+    def check_config(self):
+        """Перечитывание config.json, если файл изменился"""
+        if self.settings.reload_if_changed():
+            self.apply_config()
+        elif self.settings.error and self.settings.error != self.config_error_shown:
+            self.report_config_error()
+        self.after(CONFIG_CHECK_INTERVAL_MS, self.check_config)
     
-    def sanitize_filename(self, name):
-        """Очищает имя файла от недопустимых символов"""
-        valid_chars = "-_.() %s%s" % (ascii_letters, digits)
-        cleaned_name = unicodedata.normalize('NFKD', name).encode('ASCII', 'ignore').decode('utf-8')
-        return ''.join(c for c in cleaned_name if c in valid_chars)
+    def report_config_error(self):
+        """Показ ошибки config.json один раз на каждую новую ошибку"""
+        self.config_error_shown = self.settings.error
+        messagebox.showwarning("Конфигурация",
+                               f"Файл {CONFIG_FILE} не применен:\n{self.settings.error}\n\n"
+                               "Используются прежние настройки.")
+    
+    def apply_config(self):
+        """Обновление списков и выбора после перечитывания конфигурации"""
+        index = self.settings.index
+        self.config_data = self.settings.data
+        self.config_error_shown = None
+        self.company_combobox['values'] = index.companies
+        if index.has_employee(self.current_company, self.current_employee):
+            self.position_combobox['values'] = index.positions[self.current_company]
+            self.fill_employee_choices()
+            if self.current_position not in index.positions[self.current_company] and not self.has_session:
+                self.current_position = index.position_of(self.current_company, self.current_employee)
+                self.position_var.set(self.current_position)
+                self.update_data_file()
+        elif not self.has_session:
+            # Текущего сотрудника убрали из конфигурации - переходим к компании по умолчанию
+            self.current_company = index.default_company
+            self.current_employee = index.employees[self.current_company][0]
+            self.current_position = index.position_of(self.current_company, self.current_employee)
+            self.company_var.set(self.current_company)
+            self.position_var.set(self.current_position)
+            self.employee_var.set(self.current_employee)
+            self.position_combobox['values'] = index.positions[self.current_company]
+            self.fill_employee_choices()
+            self.update_data_file()
+            self.load_sessions()
+        # Во время активной сессии выбор не меняется, пока сессия не завершится
+        self.refresh_period_total()
+        self.update_time()
+        self.status_var.set(f"Конфигурация обновлена | Сотрудник: {self.current_employee}")
+    
+    def update_data_file(self):
+        """Обновляет хранилище сессий на основе текущего сотрудника"""
+        previous = self.storage
+        self.tracker.select(self.current_company, self.current_employee, self.current_position)
+        # Прежнее хранилище закрывается после уже поставленных в очередь записей
+        self.run_in_background(self.io_worker, previous.close)
     
     def create_widgets(self):
         """Создание элементов интерфейса"""
         # Шапка приложения
         self.header_frame = tk.Frame(self, bg="#2c6fbb", height=45)
         self.header_frame.pack(fill="x", padx=10, pady=(10, 5))
-        
+
         self.title_label = tk.Label(self.header_frame, 
                                    text="Профессиональный тайм-трекер", 
                                    fg="white", 
                                    bg="#2c6fbb",
                                    font=("Arial", 16, "bold"))
         self.title_label.pack(pady=10)
-        
+
         # Панель выбора компании, должности и сотрудника
         self.select_frame = tk.Frame(self, bg="#e6f2ff", bd=1, relief="groove")
         self.select_frame.pack(fill="x", padx=15, pady=5)
-        
+
         # Выбор компании
         self.company_frame = tk.Frame(self.select_frame, bg="#e6f2ff")
         self.company_frame.pack(fill="x", padx=10, pady=2)
-        
+
         self.company_label = tk.Label(self.company_frame, 
                                      text="Компания:", 
                                      font=("Arial", 9, "bold"),
                                      bg="#e6f2ff")
         self.company_label.pack(side="left")
-        
+
         self.company_var = tk.StringVar(value=self.current_company)
         self.company_combobox = ttk.Combobox(
             self.company_frame, 
             textvariable=self.company_var,
-            values=self.companies,
+            values=self.settings.index.companies,
             state="readonly",
             width=25
         )
         self.company_combobox.pack(side="left", padx=5)
         self.company_combobox.bind("<<ComboboxSelected>>", self.on_company_selected)
-        
+
         # Выбор должности
         self.position_frame = tk.Frame(self.select_frame, bg="#e6f2ff")
         self.position_frame.pack(fill="x", padx=10, pady=2)
-        
+
         self.position_label = tk.Label(self.position_frame, 
                                      text="Должность:", 
                                      font=("Arial", 9, "bold"),
                                      bg="#e6f2ff")
         self.position_label.pack(side="left")
-        
+
         # Автоматическое обновление должностей при выборе компании
-        positions = self.config_data["companies"][self.current_company]["positions"]
+        positions = self.settings.index.positions[self.current_company]
         self.position_var = tk.StringVar(value=self.current_position)
         self.position_combobox = ttk.Combobox(
             self.position_frame, 
@@ -175,103 +3400,154 @@ class StopwatchApp(tk.Tk):
         )
         self.position_combobox.pack(side="left", padx=5)
         self.position_combobox.bind("<<ComboboxSelected>>", self.on_position_selected)
-        
+
         # Выбор сотрудника
         self.employee_frame = tk.Frame(self.select_frame, bg="#e6f2ff")
-        self.employee_frame.pack(fill="x", padx=10, pady=(2, 5))
-        
+        self.employee_frame.pack(fill="x", padx=10, pady=2)
+
         self.employee_label = tk.Label(self.employee_frame, 
                                      text="Сотрудник:", 
                                      font=("Arial", 9, "bold"),
                                      bg="#e6f2ff")
         self.employee_label.pack(side="left")
-        
-        # Автоматическое обновление сотрудников при выборе компании
-        employees = self.config_data["companies"][self.current_company]["employees"]
+
+        # Поле с поиском: в списке только первые PICKER_VISIBLE_ROWS совпадений
         self.employee_var = tk.StringVar(value=self.current_employee)
         self.employee_combobox = ttk.Combobox(
             self.employee_frame, 
             textvariable=self.employee_var,
-            values=employees,
-            state="readonly",
+            height=12,
             width=25
         )
         self.employee_combobox.pack(side="left", padx=5)
         self.employee_combobox.bind("<<ComboboxSelected>>", self.on_employee_selected)
-        
+        self.employee_combobox.bind("<KeyRelease>", self.on_employee_typed)
+        self.employee_combobox.bind("<Return>", self.on_employee_entered)
+        # Не по FocusOut: раскрытый список забирает фокус у поля
+        self.employee_combobox.bind("<Escape>", self.reset_employee_picker)
+
+        self.employee_hint = tk.Label(self.employee_frame, 
+                                     text="", 
+                                     font=("Arial", 8),
+                                     fg="#666666",
+                                     bg="#e6f2ff")
+        self.employee_hint.pack(side="left")
+        self.fill_employee_choices()
+
+        # Выбор периода для итогов и отчета
+        self.period_frame = tk.Frame(self.select_frame, bg="#e6f2ff")
+        self.period_frame.pack(fill="x", padx=10, pady=(2, 5))
+
+        self.period_label = tk.Label(self.period_frame, 
+                                   text="Период:", 
+                                   font=("Arial", 9, "bold"),
+                                   bg="#e6f2ff")
+        self.period_label.pack(side="left")
+
+        self.period_var = tk.StringVar(value=dict(PERIODS)[self.period_kind])
+        self.period_combobox = ttk.Combobox(
+            self.period_frame, 
+            textvariable=self.period_var,
+            values=[name for _, name in PERIODS],
+            state="readonly",
+            width=25
+        )
+        self.period_combobox.pack(side="left", padx=5)
+        self.period_combobox.bind("<<ComboboxSelected>>", self.on_period_selected)
+
         # Панель времени
         self.time_frame = tk.Frame(self, bg="#f0f0f0")
         self.time_frame.pack(pady=(15, 10))
-        
+
         # Текущая сессия
         self.session_label = tk.Label(self.time_frame, 
                                     text="Текущая сессия:", 
                                     font=("Arial", 10, "bold"),
                                     bg="#f0f0f0")
         self.session_label.grid(row=0, column=0, sticky="e", padx=5)
-        
+
         self.current_session_label = tk.Label(self.time_frame, 
                                              text="00:00:00", 
                                              font=("Courier New", 18, "bold"),
                                              bg="#f0f0f0")
         self.current_session_label.grid(row=0, column=1, sticky="w")
-        
+
         # Общее время
         self.total_label = tk.Label(self.time_frame, 
                                    text="Общее время:", 
                                    font=("Arial", 10, "bold"),
                                    bg="#f0f0f0")
         self.total_label.grid(row=1, column=0, sticky="e", padx=5, pady=(10, 0))
-        
+
         self.total_time_label = tk.Label(self.time_frame, 
                                         text="00:00:00", 
                                         font=("Courier New", 18, "bold"),
                                         bg="#f0f0f0")
         self.total_time_label.grid(row=1, column=1, sticky="w", pady=(10, 0))
-        
+
+        # Время за выбранный период
+        self.period_total_caption = tk.Label(self.time_frame, 
+                                          text="За период:", 
+                                          font=("Arial", 10, "bold"),
+                                          bg="#f0f0f0")
+        self.period_total_caption.grid(row=2, column=0, sticky="e", padx=5, pady=(10, 0))
+
+        self.period_time_label = tk.Label(self.time_frame, 
+                                        text="00:00:00", 
+                                        font=("Courier New", 18, "bold"),
+                                        bg="#f0f0f0")
+        self.period_time_label.grid(row=2, column=1, sticky="w", pady=(10, 0))
+        self.clock_view = ClockView(self.current_session_label, self.total_time_label, self.period_time_label)
+
         # Кнопки управления
         self.button_frame = tk.Frame(self, bg="#f0f0f0")
         self.button_frame.pack(pady=10)
-        
+
         self.start_button = ttk.Button(self.button_frame, 
                                      text="Старт", 
                                      command=self.start_timer,
                                      width=10)
         self.start_button.grid(row=0, column=0, padx=5)
-        
+
         self.pause_button = ttk.Button(self.button_frame, 
                                       text="Пауза", 
                                       command=self.pause_timer,
                                       state="disabled",
                                       width=10)
         self.pause_button.grid(row=0, column=1, padx=5)
-        
+
         self.end_button = ttk.Button(self.button_frame, 
                                     text="Завершить сессию", 
                                     command=self.end_timer,
                                     state="disabled",
                                     width=15)
         self.end_button.grid(row=0, column=2, padx=5)
-        
+
         # Кнопки данных
         self.data_frame = tk.Frame(self, bg="#f0f0f0")
         self.data_frame.pack(pady=(5, 10))
-        
+
         self.clear_button = ttk.Button(self.data_frame,
                                       text="Очистить все данные",
                                       command=self.clear_data,
                                       width=19)
         self.clear_button.grid(row=0, column=0, padx=5)
-        
+
         self.report_button = ttk.Button(self.data_frame, 
                                        text="Создать отчет PDF", 
                                        command=self.generate_report,
                                        width=19)
         self.report_button.grid(row=0, column=1, padx=5)
-        
+
+        self.stats_button = ttk.Button(self.data_frame, 
+                                      text="Статистика", 
+                                      command=self.show_statistics,
+                                      width=12)
+        self.stats_button.grid(row=0, column=2, padx=5)
+
         # Статус бар
         self.status_var = tk.StringVar()
-        self.status_var.set(f"Готов | Сессий: {len(self.sessions)} | Сотрудник: {self.current_employee}")
+        self.status_var.set(f"Загрузка истории... | Сотрудник: {self.current_employee}")
         self.status_bar = tk.Label(self, 
                                   textvariable=self.status_var, 
                                   bd=1, 
@@ -280,6 +3556,33 @@ class StopwatchApp(tk.Tk):
                                   bg="#e0e0e0",
                                   font=("Arial", 9))
         self.status_bar.pack(side="bottom", fill="x", padx=5, pady=2)
+
+        # Отладочная строка замеров - только при WORKTIMER_METRICS
+        if METRICS.enabled:
+            self.geometry("500x580")
+            self.metrics_var = tk.StringVar(value=METRICS.status_line())
+            self.metrics_bar = tk.Label(self,
+                                        textvariable=self.metrics_var,
+                                        anchor="w",
+                                        fg="#666666",
+                                        bg="#f0f0f0",
+                                        font=("Courier New", 8))
+            self.metrics_bar.pack(side="bottom", fill="x", padx=5)
+            self.after(METRICS_STATUS_INTERVAL_MS, self.refresh_metrics)
+    
+    def publish_metrics(self):
+        """Текущие значения для снимка замеров"""
+        METRICS.gauge("sessions", len(self.sessions))
+        METRICS.gauge("clock.updates", self.clock_view.updates)
+        METRICS.gauge("clock.skipped", self.clock_view.skipped)
+        METRICS.gauge("report_cache.hits", REPORT_BLOCKS.hits)
+        METRICS.gauge("report_cache.misses", REPORT_BLOCKS.misses)
+    
+    def refresh_metrics(self):
+        """Обновление отладочной строки замеров"""
+        self.publish_metrics()
+        self.metrics_var.set(METRICS.status_line())
+        self.after(METRICS_STATUS_INTERVAL_MS, self.refresh_metrics)
     
     def on_company_selected(self, event):
         """Обработчик выбора компании"""
@@ -294,27 +3597,138 @@ class StopwatchApp(tk.Tk):
                     self.company_var.set(self.current_company)
                     return
             
+            # Списки для комбобоксов берутся из индекса конфигурации
+            index = self.settings.index
             self.current_company = new_company
-            self.current_position = self.config_data["companies"][new_company]["positions"][0]
+            self.current_employee = index.employees[new_company][0]
+            self.current_position = index.position_of(new_company, self.current_employee)
             self.position_var.set(self.current_position)
-            self.position_combobox['values'] = self.config_data["companies"][new_company]["positions"]
+            self.position_combobox['values'] = index.positions[new_company]
             
-            self.current_employee = self.config_data["companies"][new_company]["employees"][0]
             self.employee_var.set(self.current_employee)
-            self.employee_combobox['values'] = self.config_data["companies"][new_company]["employees"]
+            self.fill_employee_choices()
             
             # Обновляем файл данных и загружаем сессии
             self.update_data_file()
             self.load_sessions()
-            self.status_var.set(f"Компания изменена | Сессий: {len(self.sessions)} | Сотрудник: {self.current_employee}")
+            self.update_time()
+            self.status_var.set(f"Компания изменена | Загрузка истории... | Сотрудник: {self.current_employee}")
     
     def on_position_selected(self, event):
         """Обработчик выбора должности"""
         self.current_position = self.position_var.get()
+        self.update_data_file()
+    
+    def on_period_selected(self, event):
+        """Обработчик выбора периода"""
+        kind = {name: key for key, name in PERIODS}[self.period_var.get()]
+        if kind == "custom":
+            custom = self.ask_custom_period()
+            if custom is None:
+                self.period_var.set(dict(PERIODS)[self.period_kind])
+                return
+            self.custom_period = custom
+        self.period_kind = kind
+        self.refresh_period_total()
+        self.update_time()
+        date_from, date_to = self.current_period()
+        first, last = self.sessions.index_range(date_from, date_to)
+        caption = period_caption(self.sessions, date_from, date_to)[0] or "вся история"
+        self.status_var.set(f"Период: {caption} | Сессий: {last - first}")
+    
+    def ask_custom_period(self):
+        """Запрос границ произвольного периода; None при отмене или ошибке"""
+        first = simpledialog.askstring("Произвольный период", "Начало периода (ГГГГ-ММ-ДД):", parent=self)
+        if not first:
+            return None
+        last = simpledialog.askstring("Произвольный период", "Конец периода включительно (ГГГГ-ММ-ДД):", parent=self)
+        if not last:
+            return None
+        try:
+            first, last = date.fromisoformat(first.strip()), date.fromisoformat(last.strip())
+        except ValueError:
+            messagebox.showerror("Ошибка", "Дата должна быть в формате ГГГГ-ММ-ДД.")
+            return None
+        if last < first:
+            messagebox.showerror("Ошибка", "Конец периода раньше его начала.")
+            return None
+        return first, last
+    
+    def current_period(self):
+        """Границы выбранного периода"""
+        return period_bounds(self.period_kind, self.custom_period)
+    
+    def refresh_period_total(self):
+        """Пересчет суммы за выбранный период за O(log N)"""
+        date_from, date_to = self.current_period()
+        self.period_total = self.tracker.period_total(date_from, date_to)
+        now = datetime.now()
+        self.period_includes_now = (date_from is None or now >= date_from) and (date_to is None or now < date_to)
+        self.period_day = now.date()
+        self.schedule_period_rollover(now)
+    
+    def schedule_period_rollover(self, now):
+        """Пересчет периода в ближайшую полночь: "день", "неделя" и "месяц" сдвигаются и без действий пользователя"""
+        if self.period_job is not None:
+            self.after_cancel(self.period_job)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        self.period_job = self.after(int((midnight - now).total_seconds() * 1000) + 1, self.period_rollover)
+    
+    def period_rollover(self):
+        self.period_job = None
+        self.refresh_period_total()
+        self.update_time()
+    
+    def fill_employee_choices(self, query=""):
+        """Список сотрудников текущей компании по запросу: в комбобокс попадает только видимая часть"""
+        index = self.settings.index
+        if not query:
+            employees = index.employees[self.current_company]
+            self.employee_combobox['values'] = employees[:PICKER_VISIBLE_ROWS]
+            self.employee_hint.config(text="")
+            # Индекс большой компании строится заранее в фоне, чтобы первое нажатие не ждало
+            if len(employees) > PICKER_VISIBLE_ROWS and self.current_company not in index.employee_indexes:
+                self.run_in_background(self.index_worker, index.employee_search, self.current_company)
+            return range(len(employees))
+        name_index = index.employee_search(self.current_company)
+        matches = name_index.search(query)
+        self.employee_combobox['values'] = [name_index.names[i] for i in matches[:PICKER_VISIBLE_ROWS]]
+        if len(matches) > PICKER_VISIBLE_ROWS:
+            self.employee_hint.config(text=f"найдено {len(matches)}, уточните")
+        else:
+            self.employee_hint.config(text=f"найдено {len(matches)}")
+        return matches
+    
+    def on_employee_typed(self, event):
+        """Поиск сотрудника по мере ввода"""
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab", "Left", "Right"):
+            return
+        self.fill_employee_choices(self.employee_var.get())
+    
+    def on_employee_entered(self, event):
+        """Enter: выбор точно совпавшего или единственного найденного сотрудника"""
+        text = self.employee_var.get()
+        index = self.settings.index
+        if not index.has_employee(self.current_company, text):
+            matches = self.fill_employee_choices(text)
+            if len(matches) != 1:
+                return
+            self.employee_var.set(index.employee_search(self.current_company).names[matches[0]])
+        self.on_employee_selected(event)
+    
+    def reset_employee_picker(self, event=None):
+        """Возврат поля к выбранному сотруднику, если ввод не завершен выбором"""
+        if self.employee_var.get() != self.current_employee:
+            self.employee_var.set(self.current_employee)
+        self.fill_employee_choices()
     
     def on_employee_selected(self, event):
         """Обработчик выбора сотрудника"""
         new_employee = self.employee_var.get()
+        if not self.settings.index.has_employee(self.current_company, new_employee):
+            self.reset_employee_picker()
+            return
+        self.employee_hint.config(text="")
         if new_employee != self.current_employee:
             # Завершаем текущую сессию при смене сотрудника
             if self.has_session:
@@ -330,306 +3744,309 @@ class StopwatchApp(tk.Tk):
             # Обновляем файл данных и загружаем сессии
             self.update_data_file()
             self.load_sessions()
-            self.status_var.set(f"Сотрудник изменен | Сессий: {len(self.sessions)} | Сотрудник: {self.current_employee}")
+            self.update_time()
+            self.status_var.set(f"Сотрудник изменен | Загрузка истории... | Сотрудник: {self.current_employee}")
     
-    def load_sessions(self):
-        """Загрузка сессий из JSON файла"""
-        self.sessions = []
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Конвертация строковых меток времени в объекты datetime
-                    self.sessions = [
-                        (
-                            datetime.strptime(session[0], "%Y-%m-%d %H:%M:%S"), 
-                            datetime.strptime(session[1], "%Y-%m-%d %H:%M:%S"),
-                            session[2]
-                        )
-                        for session in data
-                    ]
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось загрузить сессии: {str(e)}")
-                self.sessions = []
+    def run_in_background(self, worker, func, *args, **kwargs):
+        """Постановка задачи в фоновый поток и запуск опроса результатов"""
+        task = worker.submit(func, *args, **kwargs)
+        if not self.polling_workers:
+            self.polling_workers = True
+            self.after(POLL_INTERVAL_MS, self.poll_workers)
+        return task
     
-    def save_sessions(self):
-        """Сохранение сессий в JSON файл"""
-        try:
-            # Конвертация объектов datetime в строки
-            data = [
-                (
-                    start_time.strftime("%Y-%m-%d %H:%M:%S"), 
-                    end_time.strftime("%Y-%m-%d %H:%M:%S"),
-                    duration
-                )
-                for start_time, end_time, duration in self.sessions
-            ]
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось сохранить сессии: {str(e)}")
+    def poll_workers(self):
+        """Обработка завершенных фоновых задач и вывод прогресса отчета"""
+        busy = False
+        for worker in (self.io_worker, self.report_worker, self.index_worker):
+            busy = worker.dispatch() or busy
+        if self.report_task is not None and not self.report_task.finished:
+            self.status_var.set(f"Формирование отчета: {int(self.report_task.progress * 100)}%")
+        if busy:
+            self.after(POLL_INTERVAL_MS, self.poll_workers)
+        else:
+            self.polling_workers = False
+    
+    def show_storage_error(self, message):
+        """Обработчик ошибок фоновой записи"""
+        return lambda e: messagebox.showerror("Ошибка", f"{message}: {str(e)}")
+    
+    def load_sessions(self, before=None):
+        """Загрузка сессий из хранилища в фоновом потоке.
+
+        Задача встает в очередь записи, поэтому читает все уже поставленные
+        в нее сессии. Сессии, начатые раньше before (по умолчанию - границы
+        retention_days), при этом переносятся в архив. Итоги заполняются в
+        finish_loading.
+        """
+        self.load_generation += 1
+        generation = self.load_generation
+        self.load_started = time.perf_counter()
+        self.tracker.reset_history()
+        self.refresh_period_total()
+        # Конвертация старых JSON-файлов при смене формата - тоже в фоне, перед чтением
+        self.run_in_background(self.io_worker, migrate_json_history, self.storage, self.data_dir,
+                               self.current_employee,
+                               on_error=self.show_storage_error("Не удалось перенести сессии из JSON"))
+        self.run_in_background(
+            self.io_worker, METRICS.timed("storage.load", load_history),
+            self.storage, self.tracker.archive, before or retention_cutoff(self.config_data),
+            on_done=lambda history: self.finish_loading(generation, *history),
+            on_error=lambda e: self.finish_loading(generation, SessionColumns(), None, e)
+        )
     
-    def format_time(self, seconds):
-        """Форматирование секунд в ЧЧ:ММ:СС"""
-        seconds = int(seconds)
-        hours = seconds // 3600
-        minutes = (seconds % 3600) // 60
-        seconds = seconds % 60
-        return f"{hours:02}:{minutes:02}:{seconds:02}"
+    def finish_loading(self, generation, sessions, rollup, error=None):
+        """Подстановка загруженной истории и пересчет итогов"""
+        if generation != self.load_generation:
+            # Пока шла загрузка, выбрали другого сотрудника
+            return
+        if error is not None:
+            messagebox.showerror("Ошибка", f"Не удалось загрузить сессии: {str(error)}")
+        self.tracker.attach_history(sessions, rollup)
+        self.refresh_period_total()
+        # Сколько пользователь ждал историю: с очередью записи и подстановкой
+        METRICS.observe("load_sessions", time.perf_counter() - self.load_started)
+        METRICS.gauge("sessions", len(self.sessions))
+        self.status_var.set(f"Готов | Сессий: {self.totals.count} | Сотрудник: {self.current_employee}")
+        self.update_time()
+    
+    def history_loading(self):
+        """Сообщение, если история еще загружается; True - действие нужно отложить"""
+        if self.history_loaded:
+            return False
+        messagebox.showinfo("Загрузка", "История сессий еще загружается, попробуйте через несколько секунд.")
+        return True
+    
+    def store_session(self, session, segments=None):
+        """Запись завершенной сессии в хранилище (O(1) вне зависимости от истории) и пересчет периода"""
+        self.run_in_background(self.io_worker, METRICS.timed("persist_session", persist_session), self.storage, session, segments,
+                               on_error=self.show_storage_error("Не удалось сохранить сессию"))
+        self.refresh_period_total()
     
     def start_timer(self):
         """Запуск или возобновление таймера"""
-        if not self.has_session:
-            # Начало новой сессии
-            self.has_session = True
-            self.accumulated_time = 0
-            self.is_running = True
-            self.last_start_time = datetime.now()
-            self.start_button.config(state="disabled")
-            self.pause_button.config(state="enabled")
-            self.end_button.config(state="enabled")
-            self.status_var.set("Сессия начата")
-        elif not self.is_running:
-            # Возобновление приостановленной сессии
-            self.is_running = True
-            self.last_start_time = datetime.now()
-            self.start_button.config(state="disabled")
-            self.pause_button.config(state="enabled")
-            self.status_var.set("Сессия возобновлена")
+        action = self.tracker.start()
+        if action is None:
+            return
+        self.start_button.config(state="disabled")
+        self.pause_button.config(state="enabled")
+        self.end_button.config(state="enabled")
+        self.save_checkpoint(force=True)
+        # Окно могло простоять без событий с прошлого дня
+        self.refresh_period_total()
+        self.update_time()
+        self.status_var.set("Сессия начата" if action == "started" else "Сессия возобновлена")
     
     def pause_timer(self):
         """Приостановка таймера"""
-        if self.has_session and self.is_running:
-            self.is_running = False
-            elapsed = datetime.now() - self.last_start_time
-            self.accumulated_time += elapsed.total_seconds()
+        if self.tracker.pause():
             self.start_button.config(state="enabled")
             self.pause_button.config(state="disabled")
+            self.save_checkpoint(force=True)
+            self.update_time()
             self.status_var.set("Сессия приостановлена")
     
     def end_timer(self):
         """Завершение текущей сессии"""
-        if self.has_session:
-            start_time = self.last_start_time
-            if self.is_running:
-                elapsed = datetime.now() - start_time
-                self.accumulated_time += elapsed.total_seconds()
-                self.is_running = False
-            
-            end_time = datetime.now()
-            self.sessions.append((start_time, end_time, self.accumulated_time))
-            self.save_sessions()
+        finished = self.tracker.end()
+        if finished is not None:
+            self.store_session(*finished)
+            try:
+                self.checkpoint.clear()
+            except OSError:
+                pass
             
-            self.has_session = False
-            self.accumulated_time = 0
             self.start_button.config(state="enabled")
             self.pause_button.config(state="disabled")
             self.end_button.config(state="disabled")
-            self.status_var.set(f"Сессия завершена. Всего сессий: {len(self.sessions)}")
+            self.update_time()
+            self.status_var.set(f"Сессия завершена. Всего сессий: {self.totals.count}")
     
     def update_time(self):
-        """Обновление отображения времени каждую секунду"""
-        if self.has_session:
+        """Обновление отображения времени на границах секунд длительности сессии.
+
+        Тик планируется только при работающем таймере: без сессии и на паузе
+        показ меняется лишь по событиям, которые сами вызывают этот метод.
+        """
+        with METRICS.span("update_time"):
+            if self.tick_job is not None:
+                self.after_cancel(self.tick_job)
+                self.tick_job = None
+            elapsed = self.timer.elapsed()
             if self.is_running:
-                elapsed = self.accumulated_time + (datetime.now() - self.last_start_time).total_seconds()
-            else:
-                elapsed = self.accumulated_time
-        else:
-            elapsed = 0
-        total_elapsed = sum(session[2] for session in self.sessions) + elapsed
-        
-        # Обновление форматированного времени
-        self.current_session_label.config(text=self.format_time(elapsed))
-        self.total_time_label.config(text=self.format_time(total_elapsed))
-        
-        # Визуальная индикация работающего таймера
-        if self.is_running:
-            self.current_session_label.config(fg="#006400")  # Темно-зеленый
-        else:
-            self.current_session_label.config(fg="black")
-        
-        self.after(1000, self.update_time)
+                self.save_checkpoint()
+                # Таймер Tk мог сработать позже полуночи (сон компьютера) - границы периода сверяются на тике
+                if date.today() != self.period_day:
+                    self.refresh_period_total()
+            total_elapsed = self.totals.total + elapsed
+            period_elapsed = self.period_total + (elapsed if self.period_includes_now else 0)
+
+            self.clock_view.render(elapsed, total_elapsed, period_elapsed, self.is_running)
+
+            if self.is_running:
+                self.tick_job = self.after(self.timer.next_tick_delay(), self.tick)
+
+    def tick(self):
+        """Срабатывание таймера обновления: отменять уже сработавший тик не нужно"""
+        self.tick_job = None
+        self.update_time()
     
     def clear_data(self):
-        """Очистка всех сохраненных сессий"""
-        if not self.sessions:
+        """Очистка сохраненных сессий: перенос в архив или удаление вместе с архивом"""
+        if self.history_loading():
+            return
+        if not self.totals.count:
             messagebox.showinfo("Информация", "Нет сессий для очистки.")
             return
-            
+
+        archive = messagebox.askyesnocancel(
+            "Очистка данных",
+            "Перенести сессии в архив вместо удаления?\n\n"
+            "Да - сессии уйдут из рабочей истории, но останутся в итогах и отчетах.\n"
+            "Нет - удалить все данные сессий."
+        )
+        if archive is None:
+            return
+        if archive:
+            if not self.sessions:
+                messagebox.showinfo("Информация", "Все сессии уже в архиве.")
+                return
+            # Перезагрузка с границей архива после всех сессий переносит их целиком
+            self.load_sessions(before=datetime.max)
+            self.status_var.set(f"Перенос сессий в архив... | Сотрудник: {self.current_employee}")
+            return
+
         if messagebox.askyesno("Подтверждение", 
-                              "Вы уверены, что хотите удалить все данные сессий?\nЭто действие невозможно отменить."):
-            self.sessions = []
-            try:
-                if os.path.exists(self.data_file):
-                    os.remove(self.data_file)
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось удалить файл данных: {str(e)}")
+                              "Вы уверены, что хотите удалить все данные сессий вместе с архивом?\n"
+                              "Это действие невозможно отменить."):
+            self.tracker.clear()
+            self.refresh_period_total()
+            self.run_in_background(self.io_worker, clear_history, self.storage, self.tracker.archive,
+                                   on_error=self.show_storage_error("Не удалось удалить файл данных"))
             
             self.status_var.set(f"Данные очищены | Сессий: 0")
             self.update_time()
             messagebox.showinfo("Успех", "Все данные сессий были очищены.")
     
     def generate_report(self):
-        """Генерация PDF отчета по рабочим часам с группировкой по днями цветными элементами"""
-        if not self.sessions:
+        """Генерация PDF отчета по рабочим часам в фоновом потоке"""
+        if self.report_task is not None:
+            # Повторное нажатие во время построения отменяет отчет
+            self.report_task.cancel()
+            self.status_var.set("Отмена формирования отчета...")
+            return
+
+        if self.history_loading():
+            return
+        if not self.totals.count:
             messagebox.showinfo("Нет данных", "Нет записанных сессий для генерации отчета.")
             return
-        
-        try:
-            # Создаем имя файла отчета
-            report_date = datetime.now().strftime("%Y-%m-%d")
-            filename = f"{self.current_employee}_{self.current_company}_worktime_report_{report_date}.pdf"
-            filename = "".join(c for c in filename if c.isalnum() or c in " _-().")
-            filepath = os.path.join(self.reports_dir, filename)
-            
-            # Используем кастомный класс PDF с поддержкой Unicode
-            pdf = UnicodePDF()
-            pdf.add_page()
-            
-            # Цветовая палитра
-            title_color = (40, 60, 150)     # Темно-синий
-            accent_color = (220, 50, 50)    # Красный акцент
-            header_color = (50, 120, 50)    # Зеленый для заголовков
-            summary_color = (180, 80, 180)  # Фиолетовый для итогов
-            
-            # Заголовок отчета
-            pdf.set_font("DejaVu", "B", 20)
-            pdf.set_text_color(*title_color)
-            pdf.cell(0, 15, "Отчет по рабочим часам", 0, 1, "C")
-            
-            # Информация о компании и сотруднике
-            pdf.set_font("DejaVu", "B", 9)  # Уменьшен размер шрифта
-            pdf.cell(50, 6, "Компания:", 0, 0)  # Уменьшена ширина ячейки
-            pdf.set_font("DejaVu", "", 9)
-            pdf.cell(0, 6, self.current_company, 0, 1)
-            
-            pdf.set_font("DejaVu", "B", 9)
-            pdf.cell(50, 6, "Сотрудник:", 0, 0)
-            pdf.set_font("DejaVu", "", 9)
-            pdf.cell(0, 6, self.current_employee, 0, 1)
-            
-            pdf.set_font("DejaVu", "B", 9)
-            pdf.cell(50, 6, "Должность:", 0, 0)
-            pdf.set_font("DejaVu", "", 9)
-            pdf.cell(0, 6, self.current_position, 0, 1)
-            
-            pdf.set_font("DejaVu", "B", 9)
-            pdf.cell(50, 6, "Дата формирования:", 0, 0)
-            pdf.set_font("DejaVu", "", 9)
-            # Форматирование даты в две строки при необходимости
-            date_str = datetime.now().strftime('%Y-%m-%d')
-            pdf.multi_cell(0, 6, date_str, 0, 1)
-            
-            pdf.ln(5)
-            
-            # Группировка сессий по дате
-            sessions_by_date = {}
-            for session in self.sessions:
-                date_str = session[0].strftime("%Y-%m-%d")
-                if date_str not in sessions_by_date:
-                    sessions_by_date[date_str] = []
-                sessions_by_date[date_str].append(session)
-            
-            # Сортировка дат
-            sorted_dates = sorted(sessions_by_date.keys(), reverse=True)
-            
-            # Общие счетчики
-            total_time = 0
-            total_sessions = 0
-            
-            # Цвета для плашек дней (чередование)
-            day_colors = [
-                (200, 230, 255),  # Голубой
-                (255, 230, 200),  # Персиковый
-                (230, 255, 200)   # Салатовый
-            ]
-            text_colors = [
-                (0, 50, 100),    # Темно-синий
-                (100, 50, 0),    # Коричневый
-                (0, 100, 50)     # Темно-зеленый
-            ]
-            
-            for i, date_str in enumerate(sorted_dates):
-                color_idx = i % len(day_colors)
-                date_sessions = sessions_by_date[date_str]
-                total_sessions += len(date_sessions)
-                
-                # Заголовок дня с цветной плашкой
-                pdf.set_font("DejaVu", "B", 14)
-                pdf.set_fill_color(*day_colors[color_idx])
-                pdf.set_text_color(*text_colors[color_idx])
-                pdf.cell(0, 10, f"Дата: {date_str}", 0, 1, "L", 1)
-                pdf.ln(3)
-                
-                # Счетчики дня
-                day_total_time = 0
-                
-                # Заголовки таблицы
-                pdf.set_font("DejaVu", "B", 11)
-                pdf.set_text_color(0, 0, 0)  # Черный
-                pdf.cell(65, 8, "Начало работы", 1, 0, "C")
-                pdf.cell(65, 8, "Окончание работы", 1, 0, "C")
-                pdf.cell(50, 8, "Длительность", 1, 1, "C")
-                
-                for session in date_sessions:
-                    start_time, end_time, duration = session
-                    
-                    # Подсчет общего времени дня
-                    day_total_time += duration
-                    total_time += duration
-                    
-                    # Добавление информации о сессии
-                    pdf.set_font("DejaVu", "", 10)
-                    pdf.set_text_color(0, 0, 0)  # Черный
-                    pdf.cell(65, 8, start_time.strftime("%H:%M:%S"), 1, 0, "C")
-                    pdf.cell(65, 8, end_time.strftime("%H:%M:%S"), 1, 0, "C")
-                    pdf.cell(50, 8, self.format_time(duration), 1, 1, "C")
-                
-                # Итог за день
-                pdf.set_font("DejaVu", "B", 10)
-                pdf.set_text_color(*header_color)  # Зеленый
-                pdf.cell(130, 8, f"Итого за {date_str}:", 1, 0, "R")
-                pdf.set_text_color(0, 0, 0)  # Черный
-                pdf.cell(50, 8, self.format_time(day_total_time), 1, 1, "C")
-                pdf.ln(8)
-            
-            # Общий итог
-            pdf.add_page()
-            pdf.set_font("DejaVu", "B", 16)
-            pdf.set_fill_color(230, 230, 255)  # Лавандовый фон
-            pdf.set_text_color(*summary_color)  # Фиолетовый текст
-            pdf.cell(0, 10, "Сводка по отчету", 0, 1, "C", 1)
-            pdf.ln(12)
-            
-            pdf.set_font("DejaVu", "B", 12)
-            pdf.set_text_color(*accent_color)  # Красный
-            pdf.cell(80, 10, "Всего сессий:")
-            pdf.set_text_color(0, 0, 0)  # Черный
-            pdf.cell(0, 10, str(total_sessions), 0, 1)
-            
-            pdf.set_font("DejaVu", "B", 12)
-            pdf.set_text_color(*accent_color)  # Красный
-            pdf.cell(80, 10, "Общее время:")
-            pdf.set_text_color(0, 0, 0)  # Черный
-            pdf.cell(0, 10, self.format_time(total_time), 0, 1)
-            
-            pdf.set_font("DejaVu", "B", 12)
-            pdf.set_text_color(*accent_color)  # Красный
-            pdf.cell(80, 10, "Средняя длительность:")
-            pdf.set_text_color(0, 0, 0)  # Черный
-            avg = total_time / total_sessions if total_sessions > 0 else 0
-            pdf.cell(0, 10, self.format_time(avg), 0, 1)
-            
-            # Сохранение файла
-            pdf.output(filepath)
-            
+
+        # Выборка за период - новые колонки, поэтому отчет не зависит от новых сессий
+        with METRICS.span("report.select"):
+            job = self.tracker.prepare_report(self.reports_dir, *self.current_period())
+        if job is None:
+            messagebox.showinfo("Нет данных", "Нет сессий за выбранный период.")
+            return
+        filepath, sessions, archive, period = job
+        date_from, date_to = self.current_period()
+        filename = os.path.basename(filepath)
+
+        def on_done(pages):
+            self.finish_report()
             # Сообщение об успехе
             self.status_var.set(f"Отчет сгенерирован: {filename}")
             messagebox.showinfo("Успех", 
                             f"PDF отчет успешно сгенерирован!\n\n"
                             f"Файл сохранен в:\n{os.path.abspath(filepath)}")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось сгенерировать PDF отчет:\n{str(e)}")
+
+        def on_error(e):
+            self.finish_report()
+            if isinstance(e, TaskCancelled):
+                self.status_var.set("Формирование отчета отменено")
+            else:
+                messagebox.showerror("Ошибка", f"Не удалось сгенерировать PDF отчет:\n{str(e)}")
+
+        self.report_task = self.run_in_background(
+            self.report_worker, write_archived_report,
+            filepath, self.current_company, self.current_employee,
+            self.current_position, sessions, archive, date_from, date_to,
+            on_done=on_done, on_error=on_error, with_progress=True, period=period,
+            daily_norm=daily_norm_seconds(self.config_data)
+        )
+        self.report_button.config(text="Отменить отчет")
+        self.status_var.set("Формирование отчета: 0%")
+    
+    def show_statistics(self):
+        """Расчет статистики за выбранный период в фоне и показ в отдельном окне"""
+        if self.history_loading():
+            return
+        date_from, date_to = self.current_period()
+        selection = self.tracker.select_period(date_from, date_to)
+        if selection is None:
+            messagebox.showinfo("Нет данных", "Нет сессий за выбранный период.")
+            return
+        sessions, archive, period, _ = selection
+        caption = period or "Вся история"
+        self.run_in_background(
+            self.report_worker, METRICS.timed("statistics", lambda: SessionStatistics(
+                report_sessions(sessions, archive, date_from, date_to), daily_norm_seconds(self.config_data))),
+            on_done=lambda statistics: self.open_statistics_window(statistics, caption),
+            on_error=lambda e: messagebox.showerror("Ошибка", f"Не удалось рассчитать статистику:\n{e}")
+        )
+        self.status_var.set("Расчет статистики...")
+    
+    def open_statistics_window(self, statistics, caption):
+        """Окно статистики: итоги, перцентили, переработка и тепловая карта по часам"""
+        self.status_var.set(f"Статистика | Сотрудник: {self.current_employee}")
+        window = tk.Toplevel(self)
+        window.title(f"Статистика - {self.current_employee}")
+        window.configure(bg="#f0f0f0")
+        window.resizable(False, False)
+
+        tk.Label(window, text=f"{self.current_employee} ({self.current_company}) | {caption}",
+                 font=("Arial", 11, "bold"), bg="#f0f0f0").pack(padx=10, pady=(10, 5))
+
+        table = tk.Frame(window, bg="#f0f0f0")
+        table.pack(padx=10, pady=5)
+        rows = [
+            ("Сессий:", str(statistics.count)),
+            ("Общее время:", format_time(statistics.total)),
+            ("Средняя длительность:", format_time(statistics.mean)),
+            ("Время на паузах:", format_time(statistics.pause_total)),
+        ]
+        rows += [(f"{int(fraction * 100)}-й перцентиль:", format_time(value))
+                 for fraction, value in statistics.percentiles]
+        rows += [
+            ("Самая длинная:", format_time(statistics.longest)),
+            (f"Переработка (норма {format_time(statistics.daily_norm)}):", format_time(statistics.overtime)),
+            ("Недоработка:", format_time(statistics.undertime)),
+        ]
+        for row, (name, value) in enumerate(rows):
+            tk.Label(table, text=name, font=("Arial", 9, "bold"), bg="#f0f0f0").grid(row=row, column=0, sticky="e", padx=5)
+            tk.Label(table, text=value, font=("Courier New", 10), bg="#f0f0f0").grid(row=row, column=1, sticky="w")
+
+        # Тепловая карта: строки - дни недели, столбцы - часы
+        cell, left, top = 16, 28, 16
+        canvas = tk.Canvas(window, width=left + 24 * cell + 2, height=top + 7 * cell + 2,
+                           bg="white", highlightthickness=0)
+        canvas.pack(padx=10, pady=(5, 10))
+        peak = max(statistics.heatmap) or 1
+        for hour in range(0, 24, 3):
+            canvas.create_text(left + hour * cell + cell / 2, top / 2, text=str(hour), font=("Arial", 7))
+        for weekday, name in enumerate(WEEKDAY_NAMES):
+            y = top + weekday * cell
+            canvas.create_text(left / 2, y + cell / 2, text=name, font=("Arial", 8))
+            for hour in range(24):
+                level = statistics.heat(weekday, hour) / peak
+                color = "#%02x%02x%02x" % tuple(int(255 - (255 - c) * level) for c in REPORT_TITLE_COLOR)
+                x = left + hour * cell
+                canvas.create_rectangle(x, y, x + cell, y + cell, fill=color, outline="#d0d0d0")
+    
+    def finish_report(self):
+        """Возврат кнопки отчета в исходное состояние"""
+        self.report_task = None
+        self.report_button.config(text="Создать отчет PDF")
     
     def on_close(self):
         """Обработка события закрытия окна"""
@@ -637,9 +4054,350 @@ class StopwatchApp(tk.Tk):
             if messagebox.askyesno("Активная сессия", 
                                   "У вас есть активная сессия. Завершить ее перед выходом?"):
                 self.end_timer()
-        
+            else:
+                # Сессия останется в снимке, и ее можно будет восстановить при следующем запуске
+                self.save_checkpoint(force=True)
+
+        if self.report_task is not None:
+            self.report_task.cancel()
+        # Не закрываемся, пока сессии не записаны на диск
+        self.io_worker.wait_idle()
+        if METRICS.enabled:
+            self.publish_metrics()
         self.destroy()
 
+def build_employee_report(storage_kind, data_dir, reports_dir, company, employee, position,
+                          date_from=None, date_to=None, daily_norm=DAILY_NORM_HOURS * 3600):
+    """Отчет одного сотрудника без GUI; выполняется в процессе пула.
+
+    Возвращает (сотрудник, компания, сессий, страниц, путь к файлу) или
+    None, если за период нет сессий.
+    """
+    sessions = open_storage(storage_kind, data_dir, company, employee, position).load()
+    sessions = report_sessions(sessions.select(date_from, date_to), HistoryArchive(data_dir, company, employee),
+                               date_from, date_to)
+    if not sessions:
+        return None
+    
+    period, report_date = period_caption(sessions, date_from, date_to)
+    filepath = os.path.join(reports_dir, report_filename(employee, company, report_date))
+    pages = write_report(filepath, company, employee, position, sessions, period=period, daily_norm=daily_norm)
+    return employee, company, len(sessions), pages, filepath
+
+def run_batch_reports(args):
+    """Команда report: PDF отчеты по всем выбранным сотрудникам в пуле процессов"""
+    config_data = load_config()
+    storage_kind = config_data.get("storage", "json")
+    date_from = datetime.combine(args.date_from, datetime.min.time()) if args.date_from else None
+    date_to = datetime.combine(args.date_to + timedelta(days=1), datetime.min.time()) if args.date_to else None
+    
+    jobs = []
+    for company, company_data in config_data["companies"].items():
+        if args.company and company != args.company:
+            continue
+        for employee in company_data["employees"]:
+            if args.employee and employee != args.employee:
+                continue
+            jobs.append((storage_kind, args.data_dir, args.output, company, employee,
+                         configured_position(company_data, employee),
+                         date_from, date_to, daily_norm_seconds(config_data)))
+    if not jobs:
+        print("Нет сотрудников, подходящих под условия отбора", file=sys.stderr)
+        return 1
+    
+    from concurrent.futures import ProcessPoolExecutor
+    os.makedirs(args.output, exist_ok=True)
+    started = time.perf_counter()
+    reports = 0
+    failures = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(build_employee_report, *job) for job in jobs]
+        for job, future in zip(jobs, futures):
+            company, employee = job[3], job[4]
+            try:
+                result = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"{company} / {employee}: ошибка - {e}", file=sys.stderr)
+                continue
+            if result is None:
+                print(f"{company} / {employee}: нет сессий")
+                continue
+            reports += 1
+            _, _, sessions_count, pages, filepath = result
+            print(f"{company} / {employee}: {sessions_count} сессий, {pages} стр. -> {filepath}")
+    elapsed = time.perf_counter() - started
+    
+    print(f"Отчетов: {reports}, ошибок: {failures}, время: {elapsed:.2f} с, "
+          f"{reports / elapsed if elapsed else 0:.2f} отчетов/с")
+    return 1 if failures else 0
+
+def aggregate_employee(storage_kind, data_dir, company, employee, position,
+                       date_from=None, date_to=None, daily_norm=DAILY_NORM_HOURS * 3600):
+    """Агрегат сессий одного сотрудника; выполняется в процессе пула"""
+    storage = open_storage(storage_kind, data_dir, company, employee, position)
+    if not (date_from or date_to):
+        sessions = storage.load()
+    elif hasattr(storage, "slice"):
+        # Бинарное хранилище и SQLite читают только сессии периода
+        sessions = storage.slice(date_from or EPOCH, date_to or datetime.max)
+    else:
+        sessions = storage.load().select(date_from, date_to)
+    sessions = report_sessions(sessions, HistoryArchive(data_dir, company, employee), date_from, date_to)
+    return SessionAggregate.from_sessions(sessions, daily_norm)
+
+def aggregate_companies(config_data, storage_kind, data_dir, date_from=None, date_to=None,
+                        workers=None, company_filter=None):
+    """Один проход по хранилищам всех сотрудников в пуле процессов и свертка агрегатов.
+
+    Возвращает строки (уровень, компания, должность, сотрудник, агрегат)
+    в порядке вывода: "company_header", затем "employee" и "position" по
+    должностям, "company" и в конце "all". Должность сотрудника берется
+    из конфигурации (первая должность компании или employee_positions).
+    """
+    daily_norm = daily_norm_seconds(config_data)
+    jobs = []
+    for company, company_data in config_data["companies"].items():
+        if company_filter and company != company_filter:
+            continue
+        for employee in company_data["employees"]:
+            jobs.append((storage_kind, data_dir, company, employee, configured_position(company_data, employee),
+                         date_from, date_to, daily_norm))
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Процессы получают сотрудников пачками, чтобы накладные расходы не росли с их числом
+        chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 4))
+        aggregates = list(pool.map(aggregate_employee, *zip(*jobs), chunksize=chunksize)) if jobs else []
+
+    rows = []
+    grand_total = SessionAggregate()
+    current_company = None
+    by_position = {}
+    company_total = None
+
+    def close_company():
+        for position, position_total in by_position.items():
+            rows.append(("position", current_company, position, "", position_total))
+        rows.append(("company", current_company, "", "", company_total))
+        grand_total.merge(company_total)
+
+    for job, aggregate in zip(jobs, aggregates):
+        company, employee, position = job[2], job[3], job[4]
+        if company != current_company:
+            if current_company is not None:
+                close_company()
+            current_company = company
+            by_position = {}
+            company_total = SessionAggregate()
+            rows.append(("company_header", company, "", "", company_total))
+        rows.append(("employee", company, position, employee, aggregate))
+        by_position.setdefault(position, SessionAggregate()).merge(aggregate)
+        company_total.merge(aggregate)
+    if current_company is not None:
+        close_company()
+    rows.append(("all", "", "", "", grand_total))
+    return rows
+
+def run_aggregate(args):
+    """Команда aggregate: сводный PDF и CSV по всем компаниям из конфигурации"""
+    config_data = load_config()
+    storage_kind = config_data.get("storage", "json")
+    date_from = datetime.combine(args.date_from, datetime.min.time()) if args.date_from else None
+    date_to = datetime.combine(args.date_to + timedelta(days=1), datetime.min.time()) if args.date_to else None
+
+    started = time.perf_counter()
+    rows = aggregate_companies(config_data, storage_kind, args.data_dir, date_from, date_to,
+                               args.workers, args.company)
+    employees = sum(1 for row in rows if row[0] == "employee")
+    if not employees:
+        print("Нет сотрудников, подходящих под условия отбора", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.output, exist_ok=True)
+    period = None
+    suffix = datetime.now().strftime("%Y-%m-%d")
+    if args.date_from or args.date_to:
+        period = f"{args.date_from or '...'} - {args.date_to or '...'}"
+        suffix = f"{args.date_from or 'start'}_{args.date_to or 'end'}"
+    base_path = os.path.join(args.output, f"aggregate_report_{suffix}")
+    pages = write_aggregate_report(base_path + ".pdf", rows, period)
+    write_aggregate_csv(base_path + ".csv", rows)
+    elapsed = time.perf_counter() - started
+
+    grand_total = rows[-1][4]
+    print(f"Сотрудников: {employees}, сессий: {grand_total.count}, время: {format_time(grand_total.total)}")
+    print(f"PDF ({pages} стр.): {base_path}.pdf")
+    print(f"CSV: {base_path}.csv")
+    print(f"Построено за {elapsed:.2f} с, {employees / elapsed if elapsed else 0:.1f} сотрудников/с")
+    return 0
+
+def run_export(args):
+    """Команда export: все сессии из хранилища в CSV или колоночный файл"""
+    config_data = load_config()
+    storage_kind = config_data.get("storage", "json")
+    chunks = iter_employee_chunks(config_data, storage_kind, args.data_dir, args.chunk_size,
+                                  args.company, args.employee)
+    export_format = detect_export_format(args.path, args.format)
+    started = time.perf_counter()
+    try:
+        if export_format == "csv":
+            rows = write_sessions_csv(args.path, chunks)
+        else:
+            rows = write_columnar(args.path, chunks)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка экспорта: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - started
+    print(f"Экспортировано сессий: {rows} -> {args.path} ({elapsed:.2f} с, "
+          f"{rows / elapsed if elapsed else 0:.0f} записей/с)")
+    return 0
+
+def run_import(args):
+    """Команда import: сессии из CSV или колоночного файла в хранилище без дублей"""
+    config_data = load_config()
+    storage_kind = config_data.get("storage", "json")
+    os.makedirs(args.data_dir, exist_ok=True)
+    if detect_export_format(args.path, args.format) == "csv":
+        chunks = read_sessions_csv(args.path, args.chunk_size)
+    else:
+        chunks = read_columnar(args.path)
+    started = time.perf_counter()
+    try:
+        read, written = import_sessions(chunks, storage_kind, args.data_dir)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка импорта: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - started
+    print(f"Прочитано сессий: {read}, записано: {written}, дублей: {read - written} "
+          f"({elapsed:.2f} с, {read / elapsed if elapsed else 0:.0f} записей/с)")
+    return 0
+
+def run_archive(args):
+    """Команда archive: перенос старых сессий выбранных сотрудников в архив"""
+    import sqlite3
+    config_data = load_config()
+    storage_kind = config_data.get("storage", "json")
+    days = args.days if args.days is not None else config_data.get("retention_days")
+    if days is None or days < 1:
+        print("Укажите срок хранения: --days или retention_days в config.json", file=sys.stderr)
+        return 1
+    before = retention_cutoff({"retention_days": days})
+    started = time.perf_counter()
+    employees = kept = archived = 0
+    for company, company_data in config_data["companies"].items():
+        if args.company and company != args.company:
+            continue
+        for employee in company_data["employees"]:
+            if args.employee and employee != args.employee:
+                continue
+            storage = open_storage(storage_kind, args.data_dir, company, employee,
+                                   configured_position(company_data, employee))
+            try:
+                sessions, rollup = load_history(storage, HistoryArchive(args.data_dir, company, employee), before)
+            except (OSError, ValueError, sqlite3.Error) as e:
+                print(f"{company} / {employee}: ошибка - {e}", file=sys.stderr)
+                return 1
+            archived_count = rollup.cumulative_counts[-1] if rollup else 0
+            print(f"{company} / {employee}: в хранилище {len(sessions)}, в архиве {archived_count}")
+            employees += 1
+            kept += len(sessions)
+            archived += archived_count
+    if not employees:
+        print("Нет сотрудников, подходящих под условия отбора", file=sys.stderr)
+        return 1
+    print(f"Граница архива: {before:%Y-%m-%d}, сотрудников: {employees}, в хранилищах: {kept}, "
+          f"в архиве: {archived} ({time.perf_counter() - started:.2f} с)")
+    return 0
+
+def run_server(args):
+    """Команда serve: HTTP-служба учета времени для многих сотрудников"""
+    import asyncio
+    import server
+    try:
+        asyncio.run(server.serve(args.host, args.port, CONFIG_FILE, args.data_dir, args.output))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def main(argv=None):
+    """Без аргументов запускает GUI, с командой - работает без окна"""
+    parser = argparse.ArgumentParser(description="Профессиональный тайм-трекер")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    report = subparsers.add_parser("report", help="PDF отчеты по сотрудникам без запуска GUI")
+    report.add_argument("--company", help="только сотрудники этой компании")
+    report.add_argument("--employee", help="только этот сотрудник")
+    report.add_argument("--from", dest="date_from", type=date.fromisoformat, help="начало периода, ГГГГ-ММ-ДД")
+    report.add_argument("--to", dest="date_to", type=date.fromisoformat, help="конец периода включительно, ГГГГ-ММ-ДД")
+    report.add_argument("--workers", type=int, default=None, help="число процессов (по умолчанию по числу ядер)")
+    report.add_argument("--data-dir", default=DATA_DIR, help="папка с сессиями")
+    report.add_argument("--output", default=REPORTS_DIR, help="папка для отчетов")
+    report.set_defaults(func=run_batch_reports)
+    
+    aggregate = subparsers.add_parser("aggregate", help="сводный PDF и CSV по всем компаниям")
+    aggregate.add_argument("--company", help="только эта компания")
+    aggregate.add_argument("--from", dest="date_from", type=date.fromisoformat, help="начало периода, ГГГГ-ММ-ДД")
+    aggregate.add_argument("--to", dest="date_to", type=date.fromisoformat, help="конец периода включительно, ГГГГ-ММ-ДД")
+    aggregate.add_argument("--workers", type=int, default=None, help="число процессов (по умолчанию по числу ядер)")
+    aggregate.add_argument("--data-dir", default=DATA_DIR, help="папка с сессиями")
+    aggregate.add_argument("--output", default=REPORTS_DIR, help="папка для отчетов")
+    aggregate.set_defaults(func=run_aggregate)
+    
+    export = subparsers.add_parser("export", help="выгрузка сессий в CSV или колоночный файл")
+    export.add_argument("path", help="файл выгрузки (.csv - CSV, иначе колоночный формат)")
+    export.add_argument("--format", choices=["csv", "columnar"], help="формат вместо определения по расширению")
+    export.add_argument("--company", help="только сотрудники этой компании")
+    export.add_argument("--employee", help="только этот сотрудник")
+    export.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="сессий в пачке")
+    export.add_argument("--data-dir", default=DATA_DIR, help="папка с сессиями")
+    export.set_defaults(func=run_export)
+    
+    import_ = subparsers.add_parser("import", help="загрузка сессий из CSV или колоночного файла")
+    import_.add_argument("path", help="файл выгрузки")
+    import_.add_argument("--format", choices=["csv", "columnar"], help="формат вместо определения по расширению")
+    import_.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="сессий в пачке (для CSV)")
+    import_.add_argument("--data-dir", default=DATA_DIR, help="папка с сессиями")
+    import_.set_defaults(func=run_import)
+    
+    archive = subparsers.add_parser("archive", help="перенос сессий старше срока хранения в архив")
+    archive.add_argument("--days", type=int, help="срок хранения в днях вместо retention_days из config.json")
+    archive.add_argument("--company", help="только сотрудники этой компании")
+    archive.add_argument("--employee", help="только этот сотрудник")
+    archive.add_argument("--data-dir", default=DATA_DIR, help="папка с сессиями")
+    archive.set_defaults(func=run_archive)
+    
+    serve = subparsers.add_parser("serve", help="локальная HTTP-служба учета времени (server.py)")
+    serve.add_argument("--host", default=SERVER_HOST, help="адрес (по умолчанию только локальный)")
+    serve.add_argument("--port", type=int, default=SERVER_PORT, help="порт, 0 - любой свободный")
+    serve.add_argument("--data-dir", default=DATA_DIR, help="папка с сессиями")
+    serve.add_argument("--output", default=REPORTS_DIR, help="папка для отчетов")
+    serve.set_defaults(func=run_server)
+    
+    args = parser.parse_args(argv)
+    # Замеры и профиль пишутся при выходе, в том числе после ошибки
+    if PROFILER is not None:
+        PROFILER.start()
+    try:
+        if args.command is None:
+            app = StopwatchApp()
+            app.mainloop()
+            return 0
+        try:
+            return args.func(args)
+        except ConfigError as e:
+            print(f"Ошибка в {CONFIG_FILE}: {e}", file=sys.stderr)
+            return 1
+    finally:
+        if PROFILER is not None:
+            PROFILER.stop()
+        if METRICS.enabled:
+            METRICS.dump(os.environ[METRICS_ENV])
+
 if __name__ == "__main__":
-    app = StopwatchApp()
-    app.mainloop()
\ No newline at end of file
+    # Нужно для пула процессов в сборке PyInstaller под Windows; multiprocessing
+    # импортируется только в сборке, чтобы не замедлять обычный запуск
+    if getattr(sys, "frozen", False):
+        from multiprocessing import freeze_support
+        freeze_support()
+    sys.exit(main())
\ No newline at end of file